@@ -0,0 +1,191 @@
+"""無介面批次剪輯
+
+以一部範例影片的剪輯風格處理多部目標影片，進度以 JSON 日誌行輸出到標準輸出，
+不需要 Tk，適合在伺服器上批次執行。
+
+用法 (在專案根目錄執行):
+    python batch.py 範例影片 目標影片1 [目標影片2 ...] --output-dir 輸出資料夾
+        [--density 1.0] [--priority 0.7] [--model yolov8n.pt] [--fast-scan]
+        [--save-style 風格檔.npz] [--profile] [--decoder ffmpeg] [--decode-size 1280] [--workers 4]
+
+    以已儲存的風格檔取代範例影片 (所有位置參數都是目標影片):
+    python batch.py --style 風格檔.npz 目標影片1 [目標影片2 ...] --output-dir 輸出資料夾
+
+    合併資料夾中多部範例影片的風格 (所有位置參數都是目標影片):
+    python batch.py --style-dir 範例資料夾 目標影片1 [目標影片2 ...] --output-dir 輸出資料夾
+        [--example-workers 4]
+"""
+import argparse
+import os
+import sys
+
+from core.detection import load_object_model
+from core.frame_source import BACKENDS
+from core.headless import HeadlessSession
+from core.style_library import StyleLibrary
+from core.style_profile import StyleProfile
+from core.video_processor import VideoProcessor
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="以範例影片的剪輯風格批次處理目標影片")
+    parser.add_argument("videos", nargs="+", help="範例影片路徑與目標影片路徑 (使用 --style 時只有目標影片)")
+    parser.add_argument("--style", help="已儲存的風格檔 (.npz 或 .json)，取代範例影片分析")
+    parser.add_argument("--style-dir", help="範例影片資料夾，同時分析所有影片並合併為一個風格")
+    parser.add_argument("--example-workers", type=int, help="同時分析的範例影片數 (--style-dir)，預設自動決定")
+    parser.add_argument("--save-style", help="將範例影片的分析結果儲存為風格檔")
+    parser.add_argument("-o", "--output-dir", required=True, help="輸出資料夾")
+    parser.add_argument("--density", type=float, default=1.0, help="剪輯密度倍率")
+    parser.add_argument("--priority", type=float, default=0.7, help="物件優先度")
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLO 模型")
+    parser.add_argument("--no-detection", action="store_true", help="分析範例影片時不使用物件檢測")
+    parser.add_argument("--important", help="以逗號分隔的重要物件類別，預設使用範例影片分析結果")
+    parser.add_argument("--example-rotation", type=int, default=0, choices=(0, 90, 180, 270), help="範例影片旋轉角度")
+    parser.add_argument("--target-rotation", type=int, default=0, choices=(0, 90, 180, 270), help="目標影片旋轉角度")
+    parser.add_argument("--fast-scan", action="store_true", help="對目標影片使用兩階段快速掃描")
+    parser.add_argument("--suffix", default="_edited", help="輸出檔名後綴")
+    parser.add_argument("--cache-dir", help="分析快取資料夾")
+    parser.add_argument("--no-cache", action="store_true", help="不使用分析快取")
+    parser.add_argument("--decoder", default="opencv", choices=BACKENDS, help="分析時的解碼後端")
+    parser.add_argument("--decode-size", type=int, default=1280,
+                        help="ffmpeg 解碼端縮放後的最大長邊，0 表示原始解析度")
+    parser.add_argument("--workers", type=int, default=1, help="分段平行分析的進程數 (長影片適用)")
+    parser.add_argument("--profile", action="store_true", help="記錄各處理階段的耗時，每次分析或套用後輸出 profile 日誌")
+    args = parser.parse_args(argv)
+
+    if args.style and args.style_dir:
+        parser.error("--style 和 --style-dir 不能同時使用")
+    if args.style or args.style_dir:
+        args.example, args.targets = None, args.videos
+    else:
+        if len(args.videos) < 2:
+            parser.error("需要範例影片和至少一部目標影片")
+        args.example, args.targets = args.videos[0], args.videos[1:]
+    return args
+
+
+def output_path_for(target_path, output_dir, suffix):
+    """目標影片對應的輸出路徑"""
+    name = os.path.splitext(os.path.basename(target_path))[0]
+    return os.path.join(output_dir, f"{name}{suffix}.mp4")
+
+
+def log_profile(session, processor):
+    """啟用 --profile 時輸出最近一次分析或套用的階段耗時"""
+    report = processor.last_profile_report
+    if processor.profiler.enabled and report:
+        session.log("profile", wall_seconds=report["wall_seconds"], stages=report["stages"])
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    processor = VideoProcessor(cache_dir=args.cache_dir)
+    processor.profiler.enabled = args.profile
+    processor.decode_backend = args.decoder
+    processor.decode_max_size = args.decode_size or None
+    processor.analysis_workers = args.workers
+    session = HeadlessSession()
+
+    # 模型只加載一次，供所有影片共用 (套用剪輯風格時一定需要物件檢測)
+    session.log("model_loading", model=args.model)
+    try:
+        session.object_model = load_object_model(args.model)
+    except Exception as e:
+        session.log("error", stage="model", message=f"加載物件檢測模型失敗: {str(e)}")
+        return 1
+
+    if args.style:
+        # 載入已儲存的風格
+        session.context = {"style": args.style, "stage": "load_style"}
+        try:
+            profile = StyleProfile.load(args.style)
+        except Exception as e:
+            session.log("error", message=f"載入風格失敗: {str(e)}")
+            return 1
+        profile.apply_to(session)
+    elif args.style_dir:
+        # 同時分析資料夾中的範例影片並合併風格
+        session.context = {"folder": args.style_dir, "stage": "analyze"}
+        session.log("start")
+        library = StyleLibrary(processor, args.example_workers)
+        try:
+            profile = library.analyze(
+                args.style_dir, session.object_model,
+                use_object_detection=not args.no_detection,
+                rotation=args.example_rotation,
+                use_cache=not args.no_cache,
+                progress_callback=lambda path, event: session.log("progress", video=path, **event.to_dict())
+            )
+        except Exception as e:
+            session.log("error", message=str(e))
+            return 1
+        for path, message in library.errors.items():
+            session.log("error", video=path, message=message)
+        session.log("library", **{key: round(value, 3) for key, value in library.stats.items()})
+        profile.apply_to(session)
+    else:
+        # 分析範例影片
+        session.context = {"video": args.example, "stage": "analyze"}
+        session.log("start")
+        try:
+            profile = processor.analyze_example_video(
+                args.example, session,
+                use_object_detection=not args.no_detection,
+                rotation=args.example_rotation,
+                use_cache=not args.no_cache
+            )
+        except Exception as e:
+            session.log("error", message=str(e))
+            return 1
+        log_profile(session, processor)
+
+    if args.important:
+        profile.important_objects = [name.strip() for name in args.important.split(",") if name.strip()]
+        session.important_objects = list(profile.important_objects)
+    session.log("analyzed", cut_points=len(profile.cut_points),
+                cutting_density=profile.cutting_density,
+                important_objects=profile.important_objects)
+
+    if args.save_style:
+        profile.save(args.save_style)
+        session.log("style_saved", path=args.save_style)
+
+    # 依序處理每部目標影片，單一影片失敗不影響其他影片
+    session.target_rotation = args.target_rotation
+    failures = 0
+    for target_path in args.targets:
+        output_path = output_path_for(target_path, args.output_dir, args.suffix)
+        session.context = {"video": target_path, "stage": "apply"}
+        session.log("start")
+        try:
+            processor.apply_cutting_style(
+                target_path, session,
+                object_priority=args.priority,
+                density_factor=args.density,
+                fast_scan=args.fast_scan,
+                profile=profile
+            )
+            log_profile(session, processor)
+            session.log("cuts", cuts=[round(cut, 3) for cut in session.final_cuts])
+
+            session.context["stage"] = "export"
+            session.progress.reset("export")
+            processor.render_output(
+                target_path, output_path, session.final_cuts, session.target_rotation,
+                progress_callback=lambda value: session.progress.publish("export", value / 100),
+                status_callback=lambda message: session.progress.publish("export", message=message, force=True)
+            )
+            session.log("done", output=output_path)
+        except Exception as e:
+            failures += 1
+            session.log("error", message=str(e))
+
+    session.context = {}
+    session.log("finished", total=len(args.targets), failed=failures)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
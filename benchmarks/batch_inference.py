@@ -0,0 +1,86 @@
+"""批次物件檢測效能測試
+
+在 CPU 上以不同的批次大小執行 YOLO 推論，輸出每秒處理幀數。
+
+用法 (在專案根目錄執行):
+    python -m benchmarks.batch_inference [影片路徑] [--frames 64] [--model yolov8n.pt]
+
+未指定影片時使用隨機雜訊幀。
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from core.detection import BatchDetector
+
+
+def load_frames(video_path, frame_count, detection_interval):
+    """讀取每 detection_interval 幀中的一幀，或產生隨機幀"""
+    if not video_path:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8) for _ in range(frame_count)]
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError("無法打開影片")
+
+    frames = []
+    frame_idx = 0
+    while len(frames) < frame_count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame_idx % detection_interval == 0:
+            frames.append(frame)
+        frame_idx += 1
+    cap.release()
+    return frames
+
+
+def run_benchmark(model, frames, batch_size):
+    """以指定批次大小處理所有幀，返回每秒處理幀數"""
+    detector = BatchDetector(model, batch_size)
+
+    start = time.perf_counter()
+    processed = 0
+    for idx, frame in enumerate(frames):
+        processed += len(detector.add(idx, 0.0, frame))
+    processed += len(detector.flush())
+    elapsed = time.perf_counter() - start
+
+    return processed / elapsed if elapsed > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批次物件檢測效能測試")
+    parser.add_argument("video", nargs="?", help="測試影片路徑")
+    parser.add_argument("--frames", type=int, default=64, help="測試幀數")
+    parser.add_argument("--interval", type=int, default=5, help="抽樣間隔")
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLO 模型")
+    parser.add_argument("--batch-sizes", default="1,4,8,16", help="以逗號分隔的批次大小")
+    args = parser.parse_args()
+
+    # 關閉逐幀日誌輸出，避免影響計時
+    os.environ['YOLO_VERBOSE'] = 'False'
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+    model.to("cpu")
+
+    frames = load_frames(args.video, args.frames, args.interval)
+    if not frames:
+        raise SystemExit("沒有可用的測試幀")
+
+    # 預熱模型，避免第一次呼叫的初始化時間影響結果
+    model(frames[:1])
+
+    print(f"測試幀數: {len(frames)}")
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        fps = run_benchmark(model, frames, batch_size)
+        print(f"批次大小 {batch_size:>2}: {fps:.2f} 幀/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""兩階段場景掃描效能測試
+
+比較逐幀掃描與兩階段 (取樣 + 候選區間精修) 掃描的耗時，並檢查剪輯點是否一致。
+
+用法 (在專案根目錄執行):
+    python -m benchmarks.coarse_scan 影片路徑 [--step 10]
+"""
+import argparse
+import time
+
+import cv2
+
+from core.coarse_scan import CoarseToFineScanner
+from core.scene_diff import SceneDiff
+
+
+def full_scan(video_path, threshold):
+    """逐幀解碼並計算變化百分比，返回場景變化點和已讀取幀數"""
+    cap = cv2.VideoCapture(video_path)
+    scene_diff = SceneDiff()
+    scene_changes = []
+    frame_idx = 0
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        change_percentage = scene_diff.update(frame)
+        if change_percentage is not None and change_percentage > threshold / 2:
+            scene_changes.append((frame_idx, change_percentage))
+        frame_idx += 1
+
+    cap.release()
+    return scene_changes, frame_idx
+
+
+def main():
+    parser = argparse.ArgumentParser(description="兩階段場景掃描效能測試")
+    parser.add_argument("video", help="測試影片路徑")
+    parser.add_argument("--step", type=int, default=10, help="第一階段取樣間隔")
+    parser.add_argument("--threshold", type=float, default=35, help="剪輯閾值")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    full_changes, frames_read = full_scan(args.video, args.threshold)
+    full_elapsed = time.perf_counter() - start
+
+    cap = cv2.VideoCapture(args.video)
+    scanner = CoarseToFineScanner(args.step, args.threshold)
+    fast_changes, _ = scanner.scan(cap)
+    cap.release()
+    fast_elapsed = scanner.stats["elapsed"]
+
+    # 比較超過剪輯閾值的場景變化點
+    full_cuts = [idx for idx, score in full_changes if score > args.threshold]
+    fast_cuts = [idx for idx, score in fast_changes if score > args.threshold]
+
+    print(f"總幀數: {frames_read}")
+    print(f"逐幀掃描: {full_elapsed:.2f} 秒，剪輯點 {len(full_cuts)} 個")
+    print(f"兩階段掃描: {fast_elapsed:.2f} 秒，剪輯點 {len(fast_cuts)} 個，"
+          f"完整處理 {scanner.stats['decoded_fraction'] * 100:.1f}% 的幀")
+    if fast_elapsed > 0:
+        print(f"加速倍數: {full_elapsed / fast_elapsed:.2f}x")
+    print(f"剪輯點一致: {'是' if full_cuts == fast_cuts else '否'}")
+
+
+if __name__ == "__main__":
+    main()
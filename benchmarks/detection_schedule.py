@@ -0,0 +1,105 @@
+"""固定間隔與自適應檢測排程的一致性檢查
+
+以固定間隔和自適應檢測排程分別分析範例影片並掃描同一部影片，比較檢測幀數、
+物件出現次數 (自適應排程以檢測權重計算)、重要物件、包含物件的場景與建議剪輯點，
+超出容許範圍時以非 0 結束碼結束。預設使用合成影片與替代模型，也可以指定影片與 YOLO 模型。
+
+用法 (在專案根目錄執行):
+    python -m benchmarks.detection_schedule [--video 影片路徑 --model yolov8n.pt] [--tolerance 0.15]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from benchmarks.synthetic import StubDetector, make_clip
+from core.detection import load_object_model
+from core.headless import HeadlessSession
+from core.video_processor import VideoProcessor
+
+
+def run(video_path, model_factory, adaptive, work_dir):
+    """以指定的檢測排程分析並套用到同一部影片，返回結果摘要"""
+    processor = VideoProcessor(cache_dir=os.path.join(work_dir, "cache"))
+    processor.adaptive_detection = adaptive
+    session = HeadlessSession(model_factory(), stream=open(os.devnull, "w"))
+    try:
+        processor.analyze_example_video(video_path, session, use_cache=False)
+        analyze_stats = processor.last_schedule_stats
+        processor.apply_cutting_style(video_path, session)
+        return {
+            "analyze_detections": analyze_stats.get("detections", 0),
+            "apply_detections": processor.last_schedule_stats.get("detections", 0),
+            "example_counts": {name: value[0] for name, value in session.example_objects.items()},
+            "target_counts": {name: value[0] for name, value in session.target_objects.items()},
+            "important_objects": list(session.important_objects),
+            "object_scenes": len(processor.last_target_scan.object_scenes),
+            "suggested_cuts": list(session.suggested_cuts)
+        }
+    finally:
+        session.stream.close()
+
+
+def count_differences(fixed, adaptive, tolerance):
+    """出現次數相差超過 tolerance (比例，至少 2 次) 的物件 [(物件, 固定間隔, 自適應)]"""
+    differences = []
+    for name in sorted(set(fixed) | set(adaptive)):
+        a, b = fixed.get(name, 0), adaptive.get(name, 0)
+        if abs(a - b) > max(2, tolerance * max(a, b)):
+            differences.append((name, a, b))
+    return differences
+
+
+def cut_differences(fixed, adaptive, tolerance):
+    """建議剪輯點數量不同，或對應的剪輯點相差超過 tolerance 秒時返回說明，否則返回 None"""
+    if len(fixed) != len(adaptive):
+        return f"剪輯點數量 {len(fixed)} / {len(adaptive)}"
+    worst = max((abs(a - b) for a, b in zip(fixed, adaptive)), default=0.0)
+    if worst > tolerance:
+        return f"剪輯點最多相差 {worst:.2f} 秒"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="固定間隔與自適應檢測排程的一致性檢查")
+    parser.add_argument("--video", help="測試影片路徑 (預設產生合成影片)")
+    parser.add_argument("--model", help="YOLO 模型路徑 (預設使用合成影片的替代模型)")
+    parser.add_argument("--seconds", type=float, default=30, help="合成影片長度 (秒)")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="物件出現次數容許的相對差異")
+    parser.add_argument("--cut-tolerance", type=float, default=0.5, help="剪輯點容許的差異 (秒)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="ai_edit_schedule_")
+    video_path = args.video
+    if video_path is None:
+        video_path = os.path.join(work_dir, "clip.avi")
+        make_clip(video_path, int(args.seconds * 30), 30, (320, 180), 45)
+    model_factory = (lambda: load_object_model(args.model)) if args.model else StubDetector
+
+    fixed = run(video_path, model_factory, False, work_dir)
+    adaptive = run(video_path, model_factory, True, work_dir)
+
+    problems = []
+    for stage in ("example", "target"):
+        for name, a, b in count_differences(fixed[f"{stage}_counts"], adaptive[f"{stage}_counts"], args.tolerance):
+            problems.append(f"{stage} {name} 出現次數 {a} / {b}")
+    if set(fixed["important_objects"]) != set(adaptive["important_objects"]):
+        problems.append(f"重要物件 {fixed['important_objects']} / {adaptive['important_objects']}")
+    if fixed["object_scenes"] != adaptive["object_scenes"]:
+        problems.append(f"包含物件的場景 {fixed['object_scenes']} / {adaptive['object_scenes']}")
+    cuts = cut_differences(fixed["suggested_cuts"], adaptive["suggested_cuts"], args.cut_tolerance)
+    if cuts:
+        problems.append(cuts)
+
+    for label, result in (("固定間隔", fixed), ("自適應", adaptive)):
+        print(f"{label}: 檢測 {result['analyze_detections']} + {result['apply_detections']} 幀，"
+              f"範例 {result['example_counts']}，目標 {result['target_counts']}，"
+              f"剪輯點 {len(result['suggested_cuts'])} 個")
+    print(f"結果一致: {'是' if not problems else '否'}")
+    for problem in problems:
+        print(f"  {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""分析 / 套用 / 導出 效能測試
+
+在本機以 cv2.VideoWriter 產生不同解析度與長度的合成影片 (已知剪輯點)，以替代模型取代 YOLO，
+分別計時 analyze_example_video、apply_cutting_style 和導出 (render_output，即 export_video
+實際執行的部分)，輸出處理速度、最高記憶體用量與剪輯點檢測準確度，結果寫入 JSON 以便比較不同版本。
+
+用法 (在專案根目錄執行):
+    python -m benchmarks.pipeline [--sizes 640x360,1280x720] [--seconds 10,30] [--output benchmark.json]
+
+最高記憶體用量 (peak RSS) 是整個進程到該階段結束為止的最大值，導出階段另外列出子進程 (ffmpeg)。
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import StubDetector, make_clip
+from core.headless import HeadlessSession
+from core.video_processor import VideoProcessor
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource 模組
+    resource = None
+
+
+def peak_rss_mb(children=False):
+    """目前為止的最高記憶體用量 (MB)，無法取得時返回 None"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # macOS 以位元組為單位，Linux 以 KB 為單位
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+
+def cut_accuracy(detected, truth, tolerance=2):
+    """以容許誤差 tolerance 幀比對檢測到的剪輯點與實際剪輯點"""
+    truth = np.asarray(sorted(truth), dtype=np.int64)
+    matched = set()
+    true_positive = 0
+    for cut in sorted(detected):
+        if len(truth) == 0:
+            break
+        i = int(np.argmin(np.abs(truth - cut)))
+        if abs(int(truth[i]) - cut) <= tolerance and i not in matched:
+            matched.add(i)
+            true_positive += 1
+
+    precision = true_positive / len(detected) if detected else 0.0
+    recall = true_positive / len(truth) if len(truth) else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4)}
+
+
+def timed(func, frames):
+    """執行 func 並返回 (耗時, 每秒幀數)"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return elapsed, frames / elapsed if elapsed > 0 else 0.0
+
+
+def git_revision():
+    """目前的 git commit，無法取得時返回 None"""
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+        return output.stdout.decode().strip() or None
+    except OSError:
+        return None
+
+
+def run_clip(clip_path, truth, frame_count, fps, work_dir, fast_scan=False, export=True):
+    """對一部合成影片執行三個階段並返回結果"""
+    processor = VideoProcessor(cache_dir=os.path.join(work_dir, "cache"))
+    session = HeadlessSession(StubDetector(), stream=open(os.devnull, "w"))
+    result = {}
+
+    # 分析範例影片
+    elapsed, speed = timed(
+        lambda: processor.analyze_example_video(clip_path, session, use_cache=False), frame_count)
+    result["analyze"] = {
+        "seconds": round(elapsed, 3), "fps": round(speed, 1), "peak_rss_mb": peak_rss_mb(),
+        "cuts_detected": len(session.cut_points),
+        "accuracy": cut_accuracy(session.cut_points, truth)
+    }
+
+    # 套用到同一部影片
+    elapsed, speed = timed(
+        lambda: processor.apply_cutting_style(clip_path, session, fast_scan=fast_scan), frame_count)
+    result["apply"] = {
+        "seconds": round(elapsed, 3), "fps": round(speed, 1), "peak_rss_mb": peak_rss_mb(),
+        "cuts_suggested": len(session.final_cuts)
+    }
+
+    # 導出 (沒有建議剪輯點時使用實際剪輯點)
+    if export:
+        cuts = session.final_cuts or [cut / fps for cut in truth]
+        output_path = os.path.join(work_dir, "export_" + os.path.basename(clip_path) + ".mp4")
+        segments = processor._build_segments(cuts, fps, frame_count)
+        exported = sum(end - start for start, end in segments)
+        elapsed, speed = timed(lambda: processor.render_output(clip_path, output_path, cuts), exported)
+        result["export"] = {
+            "seconds": round(elapsed, 3), "fps": round(speed, 1), "frames": exported,
+            "peak_rss_mb": peak_rss_mb(), "children_peak_rss_mb": peak_rss_mb(children=True)
+        }
+
+    session.stream.close()
+    return result
+
+
+def parse_sizes(text):
+    return [tuple(int(v) for v in item.lower().split("x")) for item in text.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析 / 套用 / 導出 效能測試")
+    parser.add_argument("--sizes", default="640x360,1280x720", help="以逗號分隔的解析度，例如 640x360,1920x1080")
+    parser.add_argument("--seconds", default="10,30", help="以逗號分隔的影片長度 (秒)")
+    parser.add_argument("--fps", type=int, default=30, help="合成影片幀率")
+    parser.add_argument("--cut-every", type=float, default=1.5, help="合成影片每幾秒一個剪輯點")
+    parser.add_argument("--fast-scan", action="store_true", help="套用時使用兩階段快速掃描")
+    parser.add_argument("--skip-export", action="store_true", help="不測試導出")
+    parser.add_argument("--work-dir", help="合成影片與輸出的暫存資料夾 (預設為臨時資料夾)")
+    parser.add_argument("--output", default="benchmark.json", help="結果 JSON 路徑")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="ai_edit_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "fast_scan": args.fast_scan,
+        "clips": []
+    }
+
+    cut_every = max(1, int(args.cut_every * args.fps))
+    for width, height in parse_sizes(args.sizes):
+        for seconds in [float(v) for v in args.seconds.split(",") if v]:
+            frame_count = int(seconds * args.fps)
+            clip_path = os.path.join(work_dir, f"clip_{width}x{height}_{frame_count}.avi")
+            truth = make_clip(clip_path, frame_count, args.fps, (width, height), cut_every)
+
+            print(f"{width}x{height}, {frame_count} 幀 ...", flush=True)
+            result = run_clip(clip_path, truth, frame_count, args.fps, work_dir,
+                              args.fast_scan, not args.skip_export)
+            report["clips"].append({
+                "width": width, "height": height, "frames": frame_count, "fps": args.fps,
+                "true_cuts": len(truth), **result
+            })
+
+            line = [f"  分析 {result['analyze']['fps']:.0f} 幀/秒 (F1 {result['analyze']['accuracy']['f1']:.2f})",
+                    f"套用 {result['apply']['fps']:.0f} 幀/秒"]
+            if "export" in result:
+                line.append(f"導出 {result['export']['fps']:.0f} 幀/秒")
+            print("，".join(line))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果已寫入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
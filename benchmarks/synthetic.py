@@ -0,0 +1,128 @@
+"""效能測試用的合成影片與替代物件檢測模型
+
+合成影片由隨機色塊場景組成，每 cut_every 幀換一個場景 (硬剪輯)，場景內畫面緩慢平移；
+偶數場景左上角有一個固定顏色的方塊，StubDetector 會把它檢測為 "person"。
+相同參數產生的影片與檢測結果完全相同。
+"""
+import cv2
+import numpy as np
+
+# 偶數場景中方塊的顏色 (BGR)
+MARKER_COLOR = (40, 90, 200)
+
+
+def make_clip(path, frame_count=300, fps=30, size=(640, 360), cut_every=45, seed=0, fourcc="MJPG"):
+    """寫入合成影片，返回實際的剪輯點幀號列表"""
+    width, height = size
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    if not writer.isOpened():
+        raise ValueError(f"無法創建合成影片: {path}")
+
+    marker = max(8, min(width, height) // 4)
+    cuts = []
+    base = None
+    for i in range(frame_count):
+        if i % cut_every == 0:
+            blocks = rng.integers(0, 255, (max(1, height // 8), max(1, width // 8), 3), dtype=np.uint8)
+            base = cv2.resize(blocks, (width, height), interpolation=cv2.INTER_NEAREST)
+            if i:
+                cuts.append(i)
+
+        frame = np.roll(base, i % cut_every, axis=1)
+        if (i // cut_every) % 2 == 0:
+            frame = frame.copy()
+            frame[8:8 + marker, 8:8 + marker] = MARKER_COLOR
+        writer.write(frame)
+
+    writer.release()
+    return cuts
+
+
+class _Tensor(np.ndarray):
+    """模擬 torch 張量的 .cpu().numpy() 介面"""
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.asarray(self)
+
+
+def _tensor(values):
+    return np.asarray(values, dtype=np.float32).view(_Tensor)
+
+
+class _Box:
+    def __init__(self, cls_id, conf, xyxy, track_id=None):
+        self.cls = _tensor([cls_id])
+        self.conf = _tensor([conf])
+        self.xyxy = _tensor([xyxy])
+        self.id = None if track_id is None else _tensor([track_id])
+
+
+class _Boxes:
+    """模擬 ultralytics Boxes: 整個結果的 cls、conf、xyxy、id 張量，也可以逐個檢測框迭代"""
+
+    def __init__(self, boxes):
+        self._boxes = boxes
+        self.cls = _tensor([box.cls[0] for box in boxes])
+        self.conf = _tensor([box.conf[0] for box in boxes])
+        self.xyxy = _tensor([box.xyxy[0] for box in boxes]).reshape(-1, 4)
+        # 與 ultralytics 相同，所有檢測框都有追蹤 ID 時才有 id
+        tracked = boxes and all(box.id is not None for box in boxes)
+        self.id = _tensor([box.id[0] for box in boxes]) if tracked else None
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def __iter__(self):
+        return iter(self._boxes)
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = _Boxes(boxes)
+
+
+class StubDetector:
+    """取代 YOLO 的替代模型，介面與 ultralytics 相同 (model(frames)、model.track、names)
+
+    偶數場景的方塊檢測為 person (高置信度)，畫面平均亮度為偶數時加上一個 car，
+    另外每幀都有一個低置信度 (會被過濾) 的 dog。不做任何推論，只量測處理流程本身。
+    """
+
+    names = {0: "person", 1: "car", 2: "dog"}
+    ckpt_path = "stub-detector.pt"
+
+    def __init__(self):
+        self.verbose = False
+        self.calls = 0
+        self.frames = 0
+
+    def _detect(self, frame):
+        height, width = frame.shape[:2]
+        boxes = []
+
+        # 檢查左上角是否為標記方塊
+        pixel = frame[min(12, height - 1), min(12, width - 1)]
+        if np.all(np.abs(pixel.astype(np.int16) - MARKER_COLOR) < 24):
+            marker = max(8, min(width, height) // 4)
+            boxes.append(_Box(0, 0.9, [8, 8, 8 + marker, 8 + marker], track_id=1))
+
+        if int(frame[::16, ::16].mean()) % 2 == 0:
+            boxes.append(_Box(1, 0.7, [width // 2, height // 2, width // 2 + 40, height // 2 + 30], track_id=2))
+
+        boxes.append(_Box(2, 0.3, [0, 0, 10, 10], track_id=3))
+        return _Result(boxes)
+
+    def __call__(self, frames, **kwargs):
+        self.calls += 1
+        if isinstance(frames, list):
+            self.frames += len(frames)
+            return [self._detect(frame) for frame in frames]
+        self.frames += 1
+        return [self._detect(frames)]
+
+    def track(self, frame, persist=True, **kwargs):
+        return self(frame, **kwargs)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import pickle
+
+
+# 每次抽樣讀取的區塊大小與區塊數量
+SAMPLE_CHUNK_SIZE = 64 * 1024
+SAMPLE_CHUNK_COUNT = 8
+
+
+def default_cache_dir():
+    """取得預設的快取目錄，可用環境變數 AI_EDIT_CACHE_DIR 覆寫"""
+    return os.environ.get(
+        "AI_EDIT_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".ai_edit", "cache")
+    )
+
+
+def file_fingerprint(path):
+    """計算檔案的快速指紋 (大小、修改時間、抽樣區塊雜湊)"""
+    stat = os.stat(path)
+    size = stat.st_size
+
+    # 平均抽樣檔案中的數個區塊，避免讀取整個影片
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        if size <= SAMPLE_CHUNK_SIZE * SAMPLE_CHUNK_COUNT:
+            digest.update(f.read())
+        else:
+            step = (size - SAMPLE_CHUNK_SIZE) // (SAMPLE_CHUNK_COUNT - 1)
+            for i in range(SAMPLE_CHUNK_COUNT):
+                f.seek(i * step)
+                digest.update(f.read(SAMPLE_CHUNK_SIZE))
+
+    return {
+        "size": size,
+        "mtime": stat.st_mtime_ns,
+        "sample_hash": digest.hexdigest()
+    }
+
+
+def model_identity(model):
+    """取得物件檢測模型的識別名稱，用於快取鍵
+
+    權重檔存在時以絕對路徑、大小與修改時間識別，不同目錄的同名權重或重新訓練後覆寫的
+    權重不會共用快取；否則使用模型名稱。
+    """
+    if model is None:
+        return "none"
+    for attr in ("ckpt_path", "model_name"):
+        name = getattr(model, attr, None)
+        if name:
+            name = str(name)
+            try:
+                stat = os.stat(name)
+            except OSError:
+                return os.path.basename(name)
+            return f"{os.path.abspath(name)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return type(model).__name__
+
+
+class AnalysisCache:
+    """以內容指紋為鍵的分析結果磁碟快取"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = os.path.join(cache_dir or default_cache_dir(), "analysis")
+
+    def make_key(self, video_path, params):
+        """根據檔案指紋和分析參數產生快取鍵"""
+        payload = {
+            "fingerprint": file_fingerprint(video_path),
+            "params": params
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha1(encoded).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".pkl")
+
+    def load(self, key):
+        """讀取快取項目，不存在或損毀時返回 None"""
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"讀取分析快取失敗: {str(e)}")
+            return None
+
+    def save(self, key, data):
+        """寫入快取項目 (先寫入臨時檔再替換，避免產生不完整的檔案)"""
+        path = self._entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"寫入分析快取失敗: {str(e)}")
+
+    def clear(self):
+        """清除所有分析快取"""
+        import shutil
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
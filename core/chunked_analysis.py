@@ -0,0 +1,209 @@
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from multiprocessing import Manager
+
+import cv2
+
+from core.detection import BatchDetector, detection_records
+from core.detection_schedule import DETECT, make_scheduler
+from core.frame_pipeline import FramePipeline
+from core.frame_source import applied_rotation, open_frame_source
+from core.target_matcher import TargetMatcher
+
+
+class ChunkedAnalysisError(Exception):
+    """分段分析無法完成"""
+
+
+# 各區塊的追蹤 ID 加上 區塊序號 * TRACK_ID_STRIDE，避免不同進程的追蹤器編號重複
+TRACK_ID_STRIDE = 1000000
+
+
+def split_range(frame_count, chunks, min_frames):
+    """將 [0, frame_count) 切成最多 chunks 個長度相近的區間 [(開始幀, 結束幀)]
+
+    區間不短於 min_frames；最後一個區間的結束幀為 None，一直讀到影片結尾
+    (容器記錄的幀數不一定準確)。
+    """
+    size = max(int(min_frames), -(-frame_count // max(1, chunks)), 1)
+    starts = list(range(0, max(frame_count, 1), size))
+    return [(start, starts[i + 1] if i + 1 < len(starts) else None) for i, start in enumerate(starts)]
+
+
+def analyze_chunk(task):
+    """工作進程: 以獨立的幀來源和檢測模型分析一個區間
+
+    從區間前一幀開始解碼 (只用於場景差異比較)，返回區間內變化超過 change_threshold 的
+    場景變化點、抽樣幀加上權重的檢測紀錄 (見 detection_records 與檢測排程的 resolve) 和
+    讀到的最後幀號 + 1。
+    """
+    index = task["index"]
+    start, end = task["start"], task["end"]
+    progress_queue = task["progress_queue"]
+
+    backend, max_size, threads = task["decode"]
+    buffers = 2 * task["queue_size"] + 4
+    cap = open_frame_source(task["path"], backend, task["rotation"], max_size, task["gray"], buffers, threads)
+    if not cap.isOpened():
+        raise ChunkedAnalysisError("無法打開影片")
+    rotation = 0 if applied_rotation(cap) else task["rotation"]
+
+    # 從前一幀開始，讓區間第一幀也能與前一幀比較
+    first = max(0, start - 1)
+    if first > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    detector = None
+    names = None
+    if task["model_factory"] is not None:
+        model = task["model_factory"]()
+        model.verbose = False
+        names = model.names
+        detector = BatchDetector(model, task["batch_size"], track=task["track"],
+                                 copy_frames=not isinstance(cap, cv2.VideoCapture), rotation=rotation,
+                                 classes=task["classes"])
+
+    fps = task["fps"]
+    # 每個區間各自從區間第一幀開始排程
+    scheduler = make_scheduler(task["detection_interval"], fps, task["frame_count"], task["schedule"], start, end)
+    track_offset = index * TRACK_ID_STRIDE
+    scene_changes = []
+    records = []
+
+    # 每個區間有自己的追蹤器，追蹤 ID 的相似度快取也在區間內沿用
+    matcher = TargetMatcher(task["target_features"], task["similarity_threshold"]) if task["target_class"] else None
+
+    def collect(outputs, final=False):
+        for frame_idx, timestamp, classes, detected, track_ids, weight in scheduler.resolve(detection_records(
+                outputs, names, task["target_class"], task["target_features"], task["similarity_threshold"],
+                matcher=matcher), final):
+            records.append((frame_idx, timestamp, classes, detected, [track_offset + i for i in track_ids], weight))
+
+    frames_read = first
+    reported = start
+    try:
+        with FramePipeline(cap, rotation, task["queue_size"], task["scene_diff_size"],
+                           start_frame=first, stop_frame=end) as pipeline:
+            for frame_idx, frame, change_percentage in pipeline:
+                frames_read = frame_idx + 1
+                if frame_idx < start:
+                    continue
+
+                if detector is not None and scheduler.decide(frame_idx, change_percentage) == DETECT:
+                    collect(detector.add(frame_idx, frame_idx / fps, frame))
+
+                if change_percentage is not None and change_percentage > task["change_threshold"]:
+                    scene_changes.append((frame_idx, change_percentage))
+
+                # 每 30 幀回報一次，避免佇列過於頻繁
+                if frames_read - reported >= 30:
+                    progress_queue.put((index, frames_read - reported))
+                    reported = frames_read
+
+        if detector is not None:
+            collect(detector.flush(), final=True)
+    finally:
+        cap.release()
+
+    if frames_read > reported:
+        progress_queue.put((index, frames_read - reported))
+
+    return {"index": index, "scene_changes": scene_changes, "records": records, "frames_read": frames_read}
+
+
+class ChunkedAnalyzer:
+    """將時間軸切成數個區間，由多個進程各自解碼、計算場景差異和物件檢測
+
+    每個進程有自己的幀來源和檢測模型 (由可序列化的 model_factory 建立)。
+    各區間的場景變化點與檢測紀錄依幀號順序合併，區間第一幀以前一幀計算場景差異，
+    合併結果與單一進程逐幀處理相同 (自適應檢測排程在每個區間重新開始，檢測幀可能不同)；
+    剪輯點篩選、目標物件段落等依序進行的整理由呼叫端在合併後進行，跨越區間邊界的
+    剪輯點與段落因此不會被切斷。
+    追蹤模式下每個區間的追蹤器獨立，追蹤 ID 以區塊序號區分。
+    """
+
+    def __init__(self, workers=None, min_chunk_seconds=10.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_chunk_seconds = min_chunk_seconds
+
+        # 最近一次分析的統計
+        self.stats = {}
+
+    def chunks(self, frame_count, fps):
+        """影片會被切成的區間"""
+        return split_range(frame_count, self.workers, fps * self.min_chunk_seconds)
+
+    def analyze(self, video_path, fps, frame_count, change_threshold, detection_interval, model_factory=None,
+                rotation=0, gray=False, track=False, target_class=None, target_features=None,
+                similarity_threshold=0.6, batch_size=8, queue_size=16, scene_diff_size=(160, 90),
+                decode=("opencv", None, 0), schedule=None, classes=None, progress_callback=None):
+        """分析整部影片，返回 (場景變化點 [(幀號, 變化百分比)], 檢測紀錄, 已讀取幀數)
+
+        model_factory 為 None 時不做物件檢測。schedule 為自適應檢測排程的參數 (見 make_scheduler)，
+        None 時每 detection_interval 幀檢測一次。classes 為傳給模型的類別 ID 篩選。
+        progress_callback(已處理幀數) 彙整所有進程的進度。
+        """
+        start_time = time.perf_counter()
+        chunks = self.chunks(frame_count, fps)
+        workers = min(self.workers, len(chunks))
+
+        with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+            progress_queue = manager.Queue()
+            futures = [
+                executor.submit(analyze_chunk, {
+                    "index": i, "path": video_path, "start": start, "end": end, "fps": fps,
+                    "frame_count": frame_count, "schedule": schedule, "classes": classes,
+                    "rotation": rotation, "gray": gray, "decode": decode,
+                    "queue_size": queue_size, "scene_diff_size": scene_diff_size,
+                    "change_threshold": change_threshold, "detection_interval": detection_interval,
+                    "model_factory": model_factory, "batch_size": batch_size, "track": track,
+                    "target_class": target_class, "target_features": target_features,
+                    "similarity_threshold": similarity_threshold, "progress_queue": progress_queue
+                })
+                for i, (start, end) in enumerate(chunks)
+            ]
+
+            # 彙整各進程的進度，直到全部完成或有進程失敗
+            processed = 0
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_EXCEPTION)
+                processed += self._drain(progress_queue)
+                if progress_callback:
+                    progress_callback(processed)
+
+                for future in done:
+                    if future.exception() is not None:
+                        for other in pending:
+                            other.cancel()
+                        raise ChunkedAnalysisError(str(future.exception()))
+
+            results = sorted((future.result() for future in futures), key=lambda result: result["index"])
+
+        # 各區間互不重疊，依序串接即為按幀號排序的結果
+        scene_changes = []
+        records = []
+        for result in results:
+            scene_changes.extend(result["scene_changes"])
+            records.extend(result["records"])
+        frames_read = max(result["frames_read"] for result in results)
+
+        self.stats = {
+            "chunks": len(chunks),
+            "workers": workers,
+            "elapsed": time.perf_counter() - start_time
+        }
+        return scene_changes, records, frames_read
+
+    def _drain(self, progress_queue):
+        """取出佇列中所有的進度回報，返回新增的幀數"""
+        frames = 0
+        while True:
+            try:
+                _, count = progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            frames += count
+        return frames
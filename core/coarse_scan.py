@@ -0,0 +1,114 @@
+import time
+
+import cv2
+
+from core.profiling import NULL_PROFILER
+from core.scene_diff import SceneDiff
+
+
+class CoarseToFineScanner:
+    """兩階段場景變化掃描
+
+    第一階段以 cap.grab() 逐幀前進，只對每 step 幀 retrieve 一次，比較相鄰取樣幀找出
+    變化超過 candidate_threshold (預設為剪輯閾值) 的區間；未取樣的幀不做顏色轉換、
+    複製和差異計算。
+    第二階段只回到候選區間逐幀解碼，以與完整掃描相同的方法計算每幀的變化百分比，
+    得到精確到幀的場景變化點。候選區間以外、低於剪輯閾值的漸進變化不會被記錄。
+
+    幀不會被旋轉，rotation 只決定場景差異縮圖的取樣位置；交給 on_sample 的是未旋轉的幀。
+    """
+
+    def __init__(self, step=10, threshold=35, scene_diff_size=(160, 90), rotation=0, candidate_threshold=None,
+                 profiler=None):
+        self.step = max(1, int(step))
+        self.profiler = profiler or NULL_PROFILER
+        self.threshold = threshold
+        self.candidate_threshold = threshold if candidate_threshold is None else candidate_threshold
+        self.scene_diff_size = scene_diff_size
+        self.rotation = rotation
+
+        # 最近一次掃描的統計
+        self.stats = {}
+
+    def scan(self, cap, on_sample=None, on_progress=None):
+        """掃描整部影片，返回 (場景變化點列表 [(幀號, 變化百分比)], 已讀取幀數)
+
+        on_sample(frame_idx, frame) 會在每個取樣幀被呼叫，可用於物件檢測；
+        on_progress(frame_idx) 在第一階段每個取樣幀被呼叫。
+        """
+        start_time = time.perf_counter()
+        # 第二階段記錄的場景變化下限，與完整掃描相同
+        change_threshold = self.threshold / 2
+
+        # 第一階段: 取樣掃描
+        coarse_diff = SceneDiff(self.scene_diff_size, profiler=self.profiler, rotation=self.rotation)
+        candidates = []  # 候選區間 [(前一取樣幀, 取樣幀)]
+        prev_sample = None
+        frame_idx = 0
+        sampled = 0
+
+        while True:
+            with self.profiler.stage("decode"):
+                if not cap.grab():
+                    break
+            if frame_idx % self.step == 0:
+                with self.profiler.stage("decode"):
+                    ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                sampled += 1
+
+                if on_progress is not None:
+                    on_progress(frame_idx)
+                if on_sample is not None:
+                    on_sample(frame_idx, frame)
+
+                change_percentage = coarse_diff.update(frame)
+                if change_percentage is not None and change_percentage > self.candidate_threshold:
+                    candidates.append((prev_sample, frame_idx))
+                prev_sample = frame_idx
+            frame_idx += 1
+
+        frames_read = frame_idx
+
+        # 影片結尾不足一個取樣間隔的部分也需要檢查
+        if prev_sample is not None and frames_read - 1 > prev_sample:
+            candidates.append((prev_sample, frames_read - 1))
+
+        # 第二階段: 回到候選區間逐幀計算
+        scene_changes = []
+        refined = 0
+        for window_start, window_end in self._merge_windows(candidates):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, window_start)
+            fine_diff = SceneDiff(self.scene_diff_size, profiler=self.profiler, rotation=self.rotation)
+
+            for idx in range(window_start, window_end + 1):
+                with self.profiler.stage("decode"):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                refined += 1
+
+                change_percentage = fine_diff.update(frame)
+                if change_percentage is not None and change_percentage > change_threshold:
+                    scene_changes.append((idx, change_percentage))
+
+        self.stats = {
+            "frames_total": frames_read,
+            "frames_sampled": sampled,
+            "frames_refined": refined,
+            "candidate_windows": len(candidates),
+            "decoded_fraction": (sampled + refined) / frames_read if frames_read else 0.0,
+            "elapsed": time.perf_counter() - start_time
+        }
+        return scene_changes, frames_read
+
+    def _merge_windows(self, candidates):
+        """合併相鄰的候選區間，避免重複跳轉"""
+        merged = []
+        for window_start, window_end in candidates:
+            if merged and window_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], window_end)
+            else:
+                merged.append((window_start, window_end))
+        return merged
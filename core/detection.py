@@ -0,0 +1,301 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from core.frame_pipeline import rotate_frame, rotated_shape
+from core.profiling import NULL_PROFILER
+from core.target_matcher import TargetMatcher
+
+
+def load_object_model(model_name="yolov8n.pt"):
+    """加載 YOLO 物件檢測模型，關閉版本檢查與日誌輸出"""
+    # 禁用自動更新檢查
+    os.environ['ULTRALYTICS_SKIP_VERSION_CHECK'] = '1'
+    os.environ['YOLO_VERBOSE'] = 'False'
+
+    from ultralytics import YOLO
+    YOLO.checks = lambda *args, **kwargs: None
+    model = YOLO(model_name)
+    # 禁用日誌輸出
+    model.verbose = False
+    return model
+
+
+class SharedModel:
+    """讓多個線程共用同一個檢測模型
+
+    推論 (呼叫模型與 track) 以鎖互斥，其餘屬性 (names、ckpt_path 等) 直接轉給原模型，
+    可以取代原模型交給 BatchDetector 與 VideoProcessor。
+    """
+
+    def __init__(self, model):
+        self.wrapped = model
+        self.lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            return self.wrapped(*args, **kwargs)
+
+    def track(self, *args, **kwargs):
+        with self.lock:
+            return self.wrapped.track(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def __setattr__(self, name, value):
+        if name in ("wrapped", "lock"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.wrapped, name, value)
+
+
+def extract_object_features(image):
+    """從物件圖像中提取特徵 (HSV 色相-飽和度直方圖)"""
+    if image.size == 0 or image.shape[0] == 0 or image.shape[1] == 0:
+        return None
+
+    # 轉換到HSV色彩空間
+    try:
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    except:
+        return None
+
+    # 計算直方圖
+    hist = cv2.calcHist([hsv], [0, 1], None, [30, 32], [0, 180, 0, 256])
+
+    # 歸一化直方圖
+    cv2.normalize(hist, hist, 0, 1, cv2.NORM_MINMAX)
+
+    return {'color_hist': hist}
+
+
+def compare_features(features1, features2):
+    """比較兩個物件特徵的相似度"""
+    if features1 is None or features2 is None:
+        return 0
+
+    # 比較顏色直方圖
+    if 'color_hist' in features1 and 'color_hist' in features2:
+        similarity = cv2.compareHist(
+            features1['color_hist'],
+            features2['color_hist'],
+            cv2.HISTCMP_CORREL
+        )
+        return max(0, similarity)  # 確保相似度非負
+
+    return 0
+
+
+# 檢測框的最低置信度 (只保留置信度高於此值的檢測框)
+MIN_CONFIDENCE = 0.5
+
+
+def _numpy(value):
+    """將 torch 張量 (或類陣列) 轉為 NumPy 陣列"""
+    if hasattr(value, "cpu"):
+        value = value.cpu()
+    if hasattr(value, "numpy"):
+        return value.numpy()
+    return np.asarray(value)
+
+
+def class_ids(names, classes):
+    """將類別名稱列表轉為模型的類別 ID 列表 (模型沒有的類別略過)"""
+    lookup = {name: cls_id for cls_id, name in names.items()}
+    return [lookup[cls_name] for cls_name in classes if cls_name in lookup]
+
+
+def box_arrays(result, min_confidence=MIN_CONFIDENCE):
+    """一次取出檢測結果中所有檢測框的陣列，只保留置信度高於 min_confidence 的檢測框
+
+    返回 (類別 ID, 置信度, xyxy 座標 (N×4), 追蹤 ID)，沒有追蹤 ID 時最後一項為 None。
+    每個張量只轉換一次，以向量遮罩篩選，不需要逐個檢測框轉換。
+    """
+    boxes = getattr(result, "boxes", None)
+    if boxes is None:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), np.zeros((0, 4), dtype=np.float32), None
+
+    conf = _numpy(boxes.conf).reshape(-1)
+    keep = conf > min_confidence
+    cls = _numpy(boxes.cls).reshape(-1)[keep].astype(np.int64)
+    xyxy = _numpy(boxes.xyxy).reshape(-1, 4)[keep]
+    ids = getattr(boxes, "id", None)
+    if ids is not None:
+        ids = _numpy(ids).reshape(-1)[keep].astype(np.int64)
+    return cls, conf[keep], xyxy, ids
+
+
+def _target_matches(frame_idx, frame, cls, xyxy, ids, target_id, matcher):
+    """以 matcher 比對目標類別檢測框的顏色特徵，返回相似度超過閾值的 [(檢測框索引, (x1, y1, x2, y2), 相似度)]"""
+    candidates = np.flatnonzero(cls == target_id)
+    if len(candidates) == 0:
+        return []
+    similarities = matcher.similarities(frame_idx, frame, xyxy[candidates],
+                                        None if ids is None else ids[candidates])
+    return [(i, tuple(int(v) for v in xyxy[i]), similarity)
+            for i, similarity in zip(candidates.tolist(), similarities.tolist())
+            if similarity > matcher.similarity_threshold]
+
+
+def _target_id(names, target_class):
+    """目標物件類別的 ID，未指定或模型沒有該類別時返回 None"""
+    ids = class_ids(names, [target_class]) if target_class else []
+    return ids[0] if ids else None
+
+
+def detection_records(outputs, names, target_class=None, target_features=None, similarity_threshold=0.6,
+                      min_confidence=MIN_CONFIDENCE, matcher=None):
+    """將 BatchDetector 的輸出整理為不含影像的檢測紀錄
+
+    返回 [(frame_idx, timestamp, 物件類別列表, 是否檢測到目標物件, 目標物件追蹤 ID 列表)]。
+    類別列表包含每個置信度超過 min_confidence 的檢測框 (同一類別可重複出現，
+    依類別在幀中第一次出現的順序排列)；指定 target_class 時，比對該類別檢測框的
+    顏色特徵與 target_features。紀錄可以序列化，工作進程可以直接返回給主進程。
+    matcher 為跨呼叫沿用的 TargetMatcher (保留每個追蹤 ID 的相似度快取)，
+    None 時以 target_features 與 similarity_threshold 建立。
+    """
+    target_id = _target_id(names, target_class)
+    if target_id is not None and matcher is None:
+        matcher = TargetMatcher(target_features, similarity_threshold, max_age=0)
+    records = []
+    for frame_idx, timestamp, frame, results in outputs:
+        classes = []
+        target_detected = False
+        track_ids = []
+
+        for r in results:
+            cls, _, xyxy, ids = box_arrays(r, min_confidence)
+
+            # 每類物件的檢測框數量
+            values, first, counts = np.unique(cls, return_index=True, return_counts=True)
+            for j in np.argsort(first):
+                classes.extend([names[int(values[j])]] * int(counts[j]))
+
+            # 比較目標類別檢測框與目標物件的相似度
+            if target_id is None:
+                continue
+            for i, _, _ in _target_matches(frame_idx, frame, cls, xyxy, ids, target_id, matcher):
+                target_detected = True
+                if ids is not None:
+                    track_ids.append(int(ids[i]))
+
+        records.append((frame_idx, timestamp, classes, target_detected, track_ids))
+    return records
+
+
+def find_target_box(frame, results, names, target_class, target_features, similarity_threshold=0.6,
+                    min_confidence=MIN_CONFIDENCE, matcher=None, frame_idx=0):
+    """在一幀的檢測結果中找出與目標物件最相似的檢測框
+
+    條件與 detection_records 判斷目標物件相同，返回 ((x1, y1, x2, y2), 相似度)，
+    沒有符合的檢測框時返回 None。使用 matcher 時 frame_idx 為該幀的幀號。
+    """
+    target_id = _target_id(names, target_class)
+    if target_id is None:
+        return None
+    if matcher is None:
+        matcher = TargetMatcher(target_features, similarity_threshold, max_age=0)
+    best = None
+    for r in results:
+        cls, _, xyxy, ids = box_arrays(r, min_confidence)
+        for _, box, similarity in _target_matches(frame_idx, frame, cls, xyxy, ids, target_id, matcher):
+            if best is None or similarity > best[1]:
+                best = (box, similarity)
+    return best
+
+
+class BatchDetector:
+    """收集抽樣幀並批次執行物件檢測
+
+    add() 暫存需要檢測的幀，累積到 batch_size 後一次呼叫模型，
+    並返回 (frame_idx, timestamp, frame, results) 列表，順序與加入順序相同。
+    results 與單幀呼叫模型時的返回值格式相同，可直接迭代取得 boxes。
+
+    追蹤模式 (track=True) 需要逐幀維持追蹤器狀態，因此每幀單獨呼叫
+    model.track。
+
+    幀來源重複使用緩衝區時 (copy_frames=True)，暫存的幀會複製到每個批次位置
+    固定的緩衝區；返回結果中的幀在下一次 add() 之前有效。
+    rotation 不為 0 時，加入的未旋轉幀在寫入批次緩衝區時旋轉，只有抽樣幀需要旋轉，
+    檢測框與返回的幀都在旋轉後的座標中。
+
+    classes (類別 ID 列表) 與 min_confidence 傳給模型，不需要的檢測框在模型中就被過濾；
+    追蹤模式不傳入置信度 (追蹤器需要低置信度的檢測框做第二階段關聯)，
+    由 detection_records 過濾。
+    """
+
+    def __init__(self, model, batch_size=8, track=False, profiler=None, copy_frames=False, rotation=0,
+                 classes=None, min_confidence=MIN_CONFIDENCE):
+        self.model = model
+        self.batch_size = max(1, int(batch_size))
+        self.track = track
+        self.profiler = profiler or NULL_PROFILER
+        self.copy_frames = copy_frames
+        self.rotation = rotation % 360
+        self.track_args = {} if classes is None else {"classes": list(classes)}
+        self.predict_args = dict(self.track_args)
+        if min_confidence is not None:
+            self.predict_args["conf"] = min_confidence
+        self.pending = []
+        self._slots = []
+
+        # 統計資訊
+        self.model_calls = 0
+        self.frames_processed = 0
+
+    def add(self, frame_idx, timestamp, frame):
+        """加入一幀，批次已滿時返回檢測結果，否則返回空列表"""
+        if self.rotation:
+            with self.profiler.stage("rotate"):
+                frame = self._copy_to_slot(len(self.pending), frame)
+        elif self.copy_frames:
+            frame = self._copy_to_slot(len(self.pending), frame)
+        self.pending.append((frame_idx, timestamp, frame))
+        if self.track or len(self.pending) >= self.batch_size:
+            return self.flush()
+        return []
+
+    def _copy_to_slot(self, index, frame):
+        """將幀複製 (需要時旋轉) 到第 index 個批次位置的緩衝區"""
+        if index >= len(self._slots):
+            self._slots.append(None)
+        shape = rotated_shape(frame.shape, self.rotation)
+        slot = self._slots[index]
+        if slot is None or slot.shape != shape:
+            slot = self._slots[index] = np.empty(shape, dtype=frame.dtype)
+        if self.rotation:
+            rotate_frame(frame, self.rotation, dst=slot)
+        else:
+            np.copyto(slot, frame)
+        return slot
+
+    def flush(self):
+        """對暫存的幀執行檢測並返回結果"""
+        if not self.pending:
+            return []
+
+        pending = self.pending
+        self.pending = []
+
+        if self.track:
+            outputs = []
+            for frame_idx, timestamp, frame in pending:
+                with self.profiler.stage("inference"):
+                    results = self.model.track(frame, persist=True, **self.track_args)
+                outputs.append((frame_idx, timestamp, frame, results))
+                self.model_calls += 1
+        else:
+            # 一次推論整個批次，結果順序與輸入幀順序一致
+            with self.profiler.stage("inference"):
+                batch_results = self.model([frame for _, _, frame in pending], **self.predict_args)
+            outputs = [
+                (frame_idx, timestamp, frame, [result])
+                for (frame_idx, timestamp, frame), result in zip(pending, batch_results)
+            ]
+            self.model_calls += 1
+
+        self.frames_processed += len(pending)
+        return outputs
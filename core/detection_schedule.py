@@ -0,0 +1,165 @@
+import math
+
+
+# 排程決定
+DETECT = "detect"   # 在這一幀執行物件檢測
+
+
+class FixedScheduler:
+    """固定間隔的檢測排程 (每 interval 幀檢測一次)，與 DetectionScheduler 介面相同
+
+    每次檢測代表一個固定間隔，檢測紀錄的權重都是 1。
+    """
+
+    def __init__(self, interval):
+        self.interval = max(1, int(interval))
+        self.detections = 0
+
+    def decide(self, frame_idx, change_percentage):
+        if frame_idx % self.interval == 0:
+            self.detections += 1
+            return DETECT
+        return None
+
+    def resolve(self, records, final=False):
+        return [record + (1.0,) for record in records]
+
+    @property
+    def stats(self):
+        return {"detections": self.detections}
+
+
+class DetectionScheduler:
+    """依場景變化與畫面動態決定哪些幀需要物件檢測
+
+    以逐幀已計算的場景差異 (變化百分比) 判斷:
+    - 場景變化 (超過 scene_threshold) 的幀立即檢測，間隔回到 base_interval；
+    - 靜態畫面中單幀變化超過 event_threshold (例如物件出現或消失) 時也立即檢測；
+    - 靜態畫面 (平均變化低於 static_threshold) 每次檢測後間隔加倍，最多 max_interval；
+    - 動態畫面 (平均變化高於 motion_threshold) 間隔縮短為 min_interval。
+    整部影片最多檢測 budget 幀 (預設與固定間隔相同)，剩餘的額度不足時放寬間隔。
+
+    檢測紀錄保留實際檢測的幀號，resolve() 為每筆紀錄加上權重: 該次檢測到下一次檢測
+    (最後一次到 frame_count) 的幀數除以 base_interval，也就是這次檢測代表的固定間隔
+    檢測幀數。物件出現次數以權重累計 (見 ObjectIndex)，與固定間隔檢測的次數可以比較。
+    """
+
+    def __init__(self, base_interval, fps, frame_count, budget=None, scene_threshold=35,
+                 static_threshold=2.0, motion_threshold=15.0, event_threshold=1.0, max_interval=None,
+                 min_interval=None, start_frame=0, smoothing=0.3):
+        self.base_interval = max(1, int(base_interval))
+        self.fps = fps
+        self.frame_count = frame_count
+        self.scene_threshold = scene_threshold
+        self.static_threshold = static_threshold
+        self.motion_threshold = motion_threshold
+        self.event_threshold = event_threshold
+        self.max_interval = max_interval or self.base_interval * 8
+        self.min_interval = min_interval or max(1, self.base_interval // 2)
+        self.smoothing = smoothing
+
+        if budget is None:
+            budget = len(range(start_frame, max(frame_count, start_frame + 1), self.base_interval))
+        self.budget = max(1, int(budget))
+
+        self.interval = self.base_interval
+        self.next_frame = start_frame
+        self.motion = 0.0
+        self._last_detect = None
+        self._last_trigger = None   # 最近一次由場景變化或單幀變化觸發的檢測
+        self._held = None   # 等待下一筆紀錄決定權重的檢測紀錄
+
+        # 統計資訊
+        self.detections = 0
+        self.scene_triggers = 0
+        self.event_triggers = 0
+
+    def decide(self, frame_idx, change_percentage):
+        """返回 DETECT 或 None (不需要檢測)"""
+        scene_change = event = False
+        if change_percentage is not None:
+            # 連續的大幅變化 (例如快速移動的鏡頭) 不會每幀都觸發檢測；
+            # 剛好在一般檢測之後出現的剪輯點仍然觸發
+            if self._last_trigger is None or frame_idx - self._last_trigger >= self.min_interval:
+                scene_change = change_percentage > self.scene_threshold
+                event = (not scene_change and self.motion < self.static_threshold and
+                         change_percentage > self.event_threshold)
+            self.motion += self.smoothing * (change_percentage - self.motion)
+
+        if (scene_change or event or frame_idx >= self.next_frame) and self.detections < self.budget:
+            if scene_change:
+                self.scene_triggers += 1
+                # 新場景的動態程度重新計算
+                self.motion = 0.0
+            elif event:
+                self.event_triggers += 1
+            if scene_change or event:
+                # 下一次檢測使用固定間隔
+                self.interval = self.base_interval
+                self._last_trigger = frame_idx
+            self._detected(frame_idx, adapt=not (scene_change or event))
+            return DETECT
+        return None
+
+    def _detected(self, frame_idx, adapt=True):
+        """記錄一次檢測並決定下一次檢測的幀"""
+        self.detections += 1
+        self._last_detect = frame_idx
+
+        if adapt:
+            if self.motion < self.static_threshold:
+                self.interval = min(self.interval * 2, self.max_interval)
+            elif self.motion > self.motion_threshold:
+                self.interval = self.min_interval
+            else:
+                self.interval = self.base_interval
+
+        # 依剩餘的額度平均分配到剩餘的幀
+        remaining = self.budget - self.detections
+        if remaining > 0:
+            pace = math.ceil(max(0, self.frame_count - frame_idx) / remaining)
+            self.next_frame = frame_idx + max(self.interval, pace)
+        else:
+            self.next_frame = math.inf
+
+    def resolve(self, records, final=False):
+        """為檢測紀錄 (見 detection_records) 加上權重，返回 [(..., 權重)]，保持幀號順序
+
+        紀錄的權重要等到下一筆紀錄才能決定，每次呼叫保留最後一筆紀錄到下一次返回；
+        final 為 True (處理最後一個批次) 時也返回最後一筆紀錄。
+        """
+        resolved = []
+        for record in records:
+            if self._held is not None:
+                resolved.append(self._weighted(self._held, record[0]))
+            self._held = record
+        if final and self._held is not None:
+            resolved.append(self._weighted(self._held, max(self.frame_count, self._held[0] + 1)))
+            self._held = None
+        return resolved
+
+    def _weighted(self, record, next_frame):
+        return record + ((next_frame - record[0]) / self.base_interval,)
+
+    @property
+    def stats(self):
+        return {
+            "detections": self.detections,
+            "scene_triggers": self.scene_triggers,
+            "event_triggers": self.event_triggers,
+            "budget": self.budget
+        }
+
+
+def make_scheduler(interval, fps, frame_count, options=None, start_frame=0, end_frame=None):
+    """建立分析 [start_frame, end_frame) 時使用的檢測排程
+
+    options 為 None 時每 interval 幀檢測一次，否則為 {"budget": 檢測幀數上限 (固定間隔
+    檢測幀數的比例), "scene_threshold": 場景變化閾值}，使用 DetectionScheduler。
+    """
+    if options is None:
+        return FixedScheduler(interval)
+    end_frame = frame_count if end_frame is None else end_frame
+    fixed = len(range(start_frame, max(end_frame, start_frame + 1), max(1, int(interval))))
+    return DetectionScheduler(interval, fps, end_frame, budget=fixed * options["budget"],
+                              scene_threshold=options["scene_threshold"], start_frame=start_frame)
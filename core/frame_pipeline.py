@@ -0,0 +1,195 @@
+import queue
+import threading
+
+import cv2
+
+from core.profiling import NULL_PROFILER
+from core.scene_diff import SceneDiff
+
+
+# 佇列結束標記
+_END = object()
+
+
+# 旋轉角度 (順時針) 對應的 cv2.rotate 參數
+ROTATE_CODES = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+def rotate_frame(frame, rotation, dst=None):
+    """依旋轉角度旋轉影片幀，dst 為預先配置的輸出緩衝區"""
+    code = ROTATE_CODES.get(rotation)
+    if code is None:
+        return frame
+    return cv2.rotate(frame, code, dst=dst)
+
+
+def rotated_shape(shape, rotation):
+    """旋轉後的幀形狀"""
+    if rotation in (90, 270):
+        return (shape[1], shape[0]) + tuple(shape[2:])
+    return tuple(shape)
+
+
+class QueueStats:
+    """記錄佇列佔用情況"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.samples = 0
+        self.total = 0
+        self.max = 0
+
+    def sample(self, size):
+        self.samples += 1
+        self.total += size
+        if size > self.max:
+            self.max = size
+
+    def as_dict(self):
+        return {
+            "capacity": self.capacity,
+            "mean": self.total / self.samples if self.samples else 0.0,
+            "max": self.max
+        }
+
+
+class FramePipeline:
+    """解碼與場景差異計算的生產者-消費者管線
+
+    解碼線程讀取影片幀，經有界佇列交給場景差異線程在低解析度灰度縮圖上
+    計算變化百分比，再經第二個有界佇列把完整幀交給呼叫端進行物件檢測。
+    佇列上限決定了同時存在於記憶體中的最大幀數。
+
+    幀不會被旋轉: rotation 只決定縮圖的取樣位置 (結果與旋轉後的畫面相同)，
+    需要旋轉的抽樣幀由呼叫端在檢測前處理。
+
+    迭代時產生 (frame_idx, frame, change_percentage)，第一幀的
+    change_percentage 為 None。cap 已跳轉到其他位置時，以 start_frame 指定第一幀的幀號；
+    stop_frame 不為 None 時讀到該幀之前停止。
+    """
+
+    def __init__(self, cap, rotation=0, queue_size=16, scene_diff_size=(160, 90), diff_threshold=25,
+                 profiler=None, start_frame=0, stop_frame=None):
+        self.cap = cap
+        self.rotation = rotation
+        self.start_frame = start_frame
+        self.stop_frame = stop_frame
+        self.profiler = profiler or NULL_PROFILER
+        self.scene_diff = SceneDiff(scene_diff_size, diff_threshold, profiler=self.profiler, rotation=rotation)
+
+        self.decode_queue = queue.Queue(maxsize=queue_size)
+        self.analysis_queue = queue.Queue(maxsize=queue_size)
+        self.stats = {
+            "decode": QueueStats(queue_size),
+            "scene_diff": QueueStats(queue_size)
+        }
+
+        self._stop = threading.Event()
+        self._error = None
+        self._threads = []
+
+    def start(self):
+        """啟動解碼和場景差異線程"""
+        self._threads = [
+            threading.Thread(target=self._decode_worker, daemon=True),
+            threading.Thread(target=self._scene_diff_worker, daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self):
+        """停止所有線程並清空佇列"""
+        self._stop.set()
+        for q in (self.decode_queue, self.analysis_queue):
+            try:
+                while True:
+                    q.get_nowait()
+            except queue.Empty:
+                pass
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def occupancy(self):
+        """返回每個階段佇列的佔用統計"""
+        return {stage: stats.as_dict() for stage, stats in self.stats.items()}
+
+    def _put(self, q, stats, item):
+        """放入佇列，停止時放棄等待"""
+        stats.sample(q.qsize())
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        """從佇列取出項目，停止時返回結束標記"""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _decode_worker(self):
+        """解碼線程: 讀取影片幀"""
+        try:
+            frame_idx = self.start_frame
+            while not self._stop.is_set():
+                if self.stop_frame is not None and frame_idx >= self.stop_frame:
+                    break
+                with self.profiler.stage("decode"):
+                    ret, frame = self.cap.read()
+                if not ret:
+                    break
+                if not self._put(self.decode_queue, self.stats["decode"], (frame_idx, frame)):
+                    return
+                frame_idx += 1
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put(self.decode_queue, self.stats["decode"], _END)
+
+    def _scene_diff_worker(self):
+        """場景差異線程: 計算相鄰幀的變化百分比"""
+        try:
+            while not self._stop.is_set():
+                item = self._get(self.decode_queue)
+                if item is _END:
+                    break
+                frame_idx, frame = item
+
+                # 在縮圖上計算與前一幀的變化百分比
+                change_percentage = self.scene_diff.update(frame)
+
+                if not self._put(self.analysis_queue, self.stats["scene_diff"],
+                                 (frame_idx, frame, change_percentage)):
+                    return
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put(self.analysis_queue, self.stats["scene_diff"], _END)
+
+    def __iter__(self):
+        while True:
+            item = self._get(self.analysis_queue)
+            if item is _END:
+                break
+            yield item
+
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,272 @@
+import json
+import shutil
+import subprocess
+from fractions import Fraction
+
+import cv2
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl 模組
+    fcntl = None
+
+
+# 支援的解碼後端
+BACKENDS = ("opencv", "ffmpeg")
+
+# ffmpeg 輸出像素格式對應的每像素位元組數
+PIXEL_FORMATS = {"bgr24": 3, "gray": 1}
+
+# 旋轉角度 (順時針) 對應的 ffmpeg 濾鏡
+ROTATION_FILTERS = {
+    90: "transpose=clock",
+    180: "hflip,vflip",
+    270: "transpose=cclock",
+}
+
+
+def scaled_size(width, height, max_size):
+    """將長邊縮小到 max_size 以內 (保持比例，尺寸為偶數)，不放大"""
+    if not max_size or max(width, height) <= max_size:
+        return width, height
+    scale = max_size / max(width, height)
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+class FFmpegFrameSource:
+    """以 ffmpeg 解碼並經由管道讀取 rawvideo 的影片幀來源
+
+    縮放、旋轉與像素格式轉換都由 ffmpeg 的 -vf 濾鏡在解碼端完成 (多線程解碼)，
+    Python 端只把固定大小的幀讀入預先配置的 NumPy 緩衝區，不會逐幀配置記憶體。
+    介面與 cv2.VideoCapture 相容 (read、grab、retrieve、get、set、isOpened、release)，
+    可以直接交給 FramePipeline 和 CoarseToFineScanner。
+
+    緩衝區以環狀方式重複使用: read() 返回的陣列在之後 buffers 次讀取內保持不變，
+    需要保留更久的呼叫端必須自行複製。
+    CAP_PROP_FRAME_WIDTH / HEIGHT 返回縮放與旋轉後的尺寸。
+    """
+
+    def __init__(self, path, rotation=0, max_size=None, gray=False, buffers=1, threads=0,
+                 ffmpeg="ffmpeg", ffprobe="ffprobe"):
+        self.path = path
+        self.rotation = rotation % 360
+        self.max_size = max_size
+        self.pix_fmt = "gray" if gray else "bgr24"
+        self.threads = threads
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+
+        self.fps = 0.0
+        self.frame_count = 0
+        self.width = 0
+        self.height = 0
+        self.position = 0
+
+        self._process = None
+        self._buffers = []
+        self._next_buffer = 0
+        self._grabbed = None
+        self._opened = False
+
+        try:
+            self._probe()
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            print(f"無法讀取影片資訊: {str(e)}")
+            return
+
+        channels = PIXEL_FORMATS[self.pix_fmt]
+        shape = (self.height, self.width) if channels == 1 else (self.height, self.width, channels)
+        self._buffers = [np.empty(shape, dtype=np.uint8) for _ in range(max(1, int(buffers)))]
+        self.frame_bytes = self._buffers[0].nbytes
+        self._opened = self._start(0)
+
+    @staticmethod
+    def is_available(ffmpeg="ffmpeg", ffprobe="ffprobe"):
+        """檢查 ffmpeg 和 ffprobe 是否可用"""
+        return shutil.which(ffmpeg) is not None and shutil.which(ffprobe) is not None
+
+    def _probe(self):
+        """以 ffprobe 取得幀率、幀數與輸出尺寸"""
+        output = subprocess.run([
+            self.ffprobe, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height,r_frame_rate,nb_frames,duration:"
+                             "stream_side_data=rotation:stream_tags=rotate:format=duration",
+            "-of", "json", self.path
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+        info = json.loads(output.decode("utf-8"))
+        streams = info.get("streams", [])
+        if not streams:
+            raise ValueError("找不到視頻串流")
+        stream = streams[0]
+
+        fps = Fraction(stream.get("r_frame_rate", "0/1"))
+        if fps <= 0:
+            raise ValueError("無法取得影片幀率")
+        self.fps = float(fps)
+
+        # 優先使用容器記錄的幀數，否則以時長估計
+        nb_frames = stream.get("nb_frames")
+        if nb_frames and str(nb_frames).isdigit():
+            self.frame_count = int(nb_frames)
+        else:
+            duration = stream.get("duration") or info.get("format", {}).get("duration") or 0
+            self.frame_count = int(round(float(duration) * self.fps))
+
+        # ffmpeg 預設會依顯示矩陣自動旋轉 (與 OpenCV 相同)，寬高以旋轉後為準
+        width, height = int(stream["width"]), int(stream["height"])
+        display_rotation = 0
+        for side_data in stream.get("side_data_list", []):
+            if "rotation" in side_data:
+                display_rotation = int(side_data["rotation"])
+        if not display_rotation and "rotate" in stream.get("tags", {}):
+            display_rotation = int(stream["tags"]["rotate"])
+        if display_rotation % 180:
+            width, height = height, width
+
+        # 先縮放再旋轉
+        scaled = scaled_size(width, height, self.max_size)
+        self._scale = scaled if scaled != (width, height) else None
+        width, height = scaled
+        if self.rotation in (90, 270):
+            width, height = height, width
+        self.width, self.height = width, height
+
+    def _filters(self):
+        filters = []
+        if self._scale is not None:
+            filters.append(f"scale={self._scale[0]}:{self._scale[1]}:flags=fast_bilinear")
+        if self.rotation in ROTATION_FILTERS:
+            filters.append(ROTATION_FILTERS[self.rotation])
+        filters.append(f"format={self.pix_fmt}")
+        return ",".join(filters)
+
+    def _start(self, frame_idx):
+        """從 frame_idx 開始啟動 ffmpeg 解碼進程"""
+        self._stop_process()
+
+        cmd = [self.ffmpeg, "-v", "error", "-nostdin", "-threads", str(self.threads)]
+        if frame_idx > 0:
+            # 往前半幀跳轉，精確地從 frame_idx 開始輸出
+            cmd += ["-ss", f"{(frame_idx - 0.5) / self.fps:.6f}"]
+        cmd += [
+            "-i", self.path, "-map", "0:v:0", "-an", "-sn", "-dn",
+            "-vf", self._filters(), "-vsync", "passthrough",
+            "-f", "rawvideo", "-pix_fmt", self.pix_fmt, "pipe:1"
+        ]
+
+        try:
+            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                             stdin=subprocess.DEVNULL, bufsize=0)
+        except OSError as e:
+            print(f"無法啟動 ffmpeg: {str(e)}")
+            self._process = None
+            return False
+
+        # 加大管道容量以減少系統呼叫次數 (僅 Linux)
+        if fcntl is not None and hasattr(fcntl, "F_SETPIPE_SZ"):
+            try:
+                fcntl.fcntl(self._process.stdout.fileno(), fcntl.F_SETPIPE_SZ, 1 << 20)
+            except OSError:
+                pass
+
+        self.position = frame_idx
+        self._grabbed = None
+        return True
+
+    def _stop_process(self):
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+    def isOpened(self):
+        return self._opened
+
+    def grab(self):
+        """讀取下一幀到緩衝區，返回是否成功"""
+        if self._process is None:
+            return False
+
+        buffer = self._buffers[self._next_buffer]
+        view = memoryview(buffer).cast("B")
+        stdout = self._process.stdout
+        offset = 0
+        while offset < self.frame_bytes:
+            count = stdout.readinto(view[offset:])
+            if not count:
+                # 影片結束或 ffmpeg 失敗
+                self._stop_process()
+                self._grabbed = None
+                return False
+            offset += count
+
+        self._next_buffer = (self._next_buffer + 1) % len(self._buffers)
+        self._grabbed = buffer
+        self.position += 1
+        return True
+
+    def retrieve(self):
+        """返回最近一次 grab 的幀"""
+        if self._grabbed is None:
+            return False, None
+        return True, self._grabbed
+
+    def read(self):
+        """讀取下一幀，返回 (是否成功, 幀)"""
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        return 0.0
+
+    def set(self, prop, value):
+        """只支援 CAP_PROP_POS_FRAMES (重新啟動 ffmpeg 並精確跳轉)"""
+        if prop != cv2.CAP_PROP_POS_FRAMES or not self._opened:
+            return False
+        frame_idx = max(0, int(value))
+        if frame_idx == self.position and self._process is not None:
+            return True
+        return self._start(frame_idx)
+
+    def release(self):
+        self._stop_process()
+        self._opened = False
+
+    def __del__(self):
+        self._stop_process()
+
+
+def open_frame_source(path, backend="opencv", rotation=0, max_size=None, gray=False, buffers=1, threads=0):
+    """依後端打開影片幀來源
+
+    backend 為 "ffmpeg" 且 ffmpeg 可用時返回 FFmpegFrameSource (旋轉、縮放與灰度轉換在解碼端完成)，
+    否則返回 cv2.VideoCapture，此時 rotation、max_size 和 gray 都不會套用。
+    呼叫端可用 applied_rotation() 判斷是否還需要自行旋轉。
+    """
+    if backend == "ffmpeg":
+        if FFmpegFrameSource.is_available():
+            return FFmpegFrameSource(path, rotation, max_size, gray, buffers, threads)
+        print("未檢測到 ffmpeg，改用 OpenCV 解碼")
+    elif backend != "opencv":
+        raise ValueError(f"不支援的解碼後端: {backend}")
+    return cv2.VideoCapture(path)
+
+
+def applied_rotation(source):
+    """幀來源在解碼端已套用的旋轉角度"""
+    return source.rotation if isinstance(source, FFmpegFrameSource) else 0
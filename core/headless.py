@@ -0,0 +1,93 @@
+import json
+import sys
+import time
+
+from core.object_index import ObjectIndex
+from core.progress import ProgressBridge, ThrottledListener
+
+
+def log_event(event, stream=None, **fields):
+    """輸出一行 JSON 格式的日誌"""
+    record = {"time": round(time.time(), 3), "event": event}
+    record.update(fields)
+    stream = stream or sys.stdout
+    stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+    stream.flush()
+
+
+class ImmediateRoot:
+    """取代 Tk root，after() 立即在目前執行緒執行回調"""
+
+    def after(self, delay, callback=None, *args):
+        if callback is not None:
+            callback(*args)
+
+    def update_idletasks(self):
+        pass
+
+    def update(self):
+        pass
+
+
+class HeadlessSession:
+    """不依賴 Tk 的工作階段，提供 VideoProcessor 需要的應用程式屬性
+
+    進度事件 (ProgressBridge) 以 JSON 日誌行輸出，每個階段最多每秒一行；
+    context 中的欄位 (例如目前處理的影片) 會附加在每一行。
+    """
+
+    def __init__(self, object_model=None, stream=None):
+        self.root = ImmediateRoot()
+        self.object_model = object_model
+        self.stream = stream
+        self.context = {}
+
+        # 進度事件直接輸出為日誌行 (帶訊息與完成的事件一定輸出)
+        self.progress = ProgressBridge()
+        self.progress.add_listener(ThrottledListener(self.on_progress_event, min_interval=1.0))
+
+        # 旋轉設置
+        self.example_rotation = 0
+        self.target_rotation = 0
+
+        # 物件分析相關
+        self.example_objects = ObjectIndex()
+        self.target_objects = ObjectIndex()
+        self.important_objects = []
+
+        # 目標物件追蹤相關 (無介面時不選擇目標物件)
+        self.target_object_roi = None
+        self.target_object_features = None
+        self.target_object_track_ids = set()
+        self.target_object_timestamps = []
+
+        # 剪輯偏好
+        self.object_transitions = {}
+        self.object_durations = {}
+
+        # 分析結果
+        self.cut_points = []
+        self.segment_durations = []
+        self.segment_weights = None
+        self.avg_segment_duration = 0
+        self.cutting_density = 0
+        self.style_profile = None
+
+        # 自動剪輯結果
+        self.suggested_cuts = []
+        self.final_cuts = []
+        self.final_cuts_edited = False
+
+    def log(self, event, **fields):
+        """輸出附帶目前 context 的日誌行"""
+        merged = dict(self.context)
+        merged.update(fields)
+        log_event(event, self.stream, **merged)
+
+    def update_progress(self, message):
+        """VideoProcessor 的進度回報"""
+        self.log("progress", message=message)
+
+    def on_progress_event(self, event):
+        """將進度事件輸出為日誌行"""
+        self.log("progress", **event.to_dict())
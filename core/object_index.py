@@ -0,0 +1,106 @@
+import math
+from collections.abc import Mapping
+
+import numpy as np
+
+
+def _weighted_count(weights):
+    """權重合計為出現次數 (無條件進位，任何一次檢測都至少算一次)"""
+    return int(math.ceil(float(weights.sum()) - 1e-9)) if len(weights) else 0
+
+
+class ObjectIndex(Mapping):
+    """每類物件的檢測時間戳索引 {物件類別: (出現次數, 0, 已排序的時間戳陣列)}
+
+    與原本的 {物件類別: [出現次數, 總時長, [時間戳列表]]} 字典用法相同，可以迭代、
+    以類別取值並解包；時間戳保存為已排序的 NumPy 陣列，以 searchsorted 做範圍查詢。
+    add() 先暫存新的時間戳，查詢時才合併排序，逐幀加入不需要重建陣列。
+
+    每次檢測有一個權重 (預設為 1)，表示該次檢測代表幾個固定間隔的檢測幀
+    (自適應檢測排程中檢測間隔不固定)；出現次數為權重的合計。
+    """
+
+    def __init__(self, data=None):
+        self._order = []      # 類別的加入順序
+        self._arrays = {}     # 已排序的時間戳
+        self._weights = {}    # 與時間戳對應的權重
+        self._pending = {}    # 尚未合併的 ([時間戳], [權重])
+        if data:
+            for cls_name, value in data.items():
+                self.extend(cls_name, value[2] if isinstance(value, (list, tuple)) else value)
+
+    def _entry(self, cls_name):
+        if cls_name not in self._arrays:
+            self._order.append(cls_name)
+            self._arrays[cls_name] = np.zeros(0, dtype=np.float64)
+            self._weights[cls_name] = np.zeros(0, dtype=np.float64)
+        return self._pending.setdefault(cls_name, ([], []))
+
+    def add(self, cls_name, timestamp, weight=1.0):
+        """加入一次檢測"""
+        timestamps, weights = self._entry(cls_name)
+        timestamps.append(timestamp)
+        weights.append(weight)
+
+    def extend(self, cls_name, timestamps, weights=None):
+        """加入多次檢測，weights 為 None 時權重都是 1"""
+        pending_timestamps, pending_weights = self._entry(cls_name)
+        timestamps = list(timestamps)
+        pending_timestamps.extend(timestamps)
+        pending_weights.extend([1.0] * len(timestamps) if weights is None else weights)
+
+    def _merge(self, cls_name):
+        """合併暫存的檢測，返回 (時間戳陣列, 權重陣列)"""
+        pending = self._pending.pop(cls_name, None)
+        array = self._arrays[cls_name]
+        weights = self._weights[cls_name]
+        if pending and pending[0]:
+            array = np.concatenate([array, np.asarray(pending[0], dtype=np.float64)])
+            weights = np.concatenate([weights, np.asarray(pending[1], dtype=np.float64)])
+            # 依時間順序加入時已經有序，只有亂序時才需要排序
+            if np.any(array[1:] < array[:-1]):
+                order = np.argsort(array, kind="stable")
+                array, weights = array[order], weights[order]
+            self._arrays[cls_name] = array
+            self._weights[cls_name] = weights
+        return array, weights
+
+    def timestamps(self, cls_name):
+        """某類物件已排序的時間戳陣列"""
+        return self._merge(cls_name)[0]
+
+    def weights(self, cls_name):
+        """與 timestamps() 對應的權重陣列"""
+        return self._merge(cls_name)[1]
+
+    def __getitem__(self, cls_name):
+        array, weights = self._merge(cls_name)
+        return (_weighted_count(weights), 0, array)
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, cls_name):
+        return cls_name in self._arrays
+
+    def count_in_range(self, cls_name, start, end):
+        """某類物件在 [start, end] 內被檢測到的次數 (權重合計)"""
+        array, weights = self._merge(cls_name)
+        return _weighted_count(weights[np.searchsorted(array, start, side="left"):
+                                       np.searchsorted(array, end, side="right")])
+
+    def counts_in_range(self, start, end):
+        """[start, end] 內出現的物件與次數 {物件類別: 次數}，依類別加入順序"""
+        counts = {}
+        for cls_name in self._order:
+            count = self.count_in_range(cls_name, start, end)
+            if count > 0:
+                counts[cls_name] = count
+        return counts
+
+    def classes_in_range(self, start, end):
+        """[start, end] 內出現過的物件類別列表，依類別加入順序"""
+        return [cls_name for cls_name in self._order if self.count_in_range(cls_name, start, end) > 0]
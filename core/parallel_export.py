@@ -0,0 +1,193 @@
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from multiprocessing import Manager
+
+import cv2
+
+from core.frame_pipeline import rotate_frame
+from core.smart_render import build_audio_filter
+
+
+class ParallelExportError(Exception):
+    """平行輸出無法完成"""
+
+
+def split_segments(segments, workers, min_frames):
+    """將保留片段切成大小相近的區塊，讓每個工作進程分到差不多的幀數
+
+    只有一兩個很長的片段時也能用滿所有核心；區塊不會短於 min_frames。
+    """
+    total = sum(end - start for start, end in segments)
+    chunk = max(int(min_frames), -(-total // max(1, workers)))
+
+    chunks = []
+    for start, end in segments:
+        while end - start > chunk:
+            chunks.append((start, start + chunk))
+            start += chunk
+        if end > start:
+            chunks.append((start, end))
+    return chunks
+
+
+def render_segment(task):
+    """工作進程: 以獨立的 VideoCapture 和編碼器輸出一個區塊的視頻 (不含音頻)
+
+    task 為 (區塊序號, 來源路徑, 輸出路徑, 開始幀, 結束幀, 幀率, 旋轉角度, 進度佇列)。
+    返回實際寫入的幀數。音頻在所有區塊拼接後由主進程一次處理，區塊邊界不會有間隙。
+    """
+    index, input_path, piece_path, start, end, fps, rotation, progress_queue = task
+
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise ParallelExportError("無法打開目標素材")
+
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if rotation in (90, 270):
+        width, height = height, width
+
+    out = cv2.VideoWriter(piece_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not out.isOpened():
+        cap.release()
+        raise ParallelExportError("無法創建輸出視頻文件")
+
+    written = 0
+    reported = 0
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for _ in range(start, end):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if rotation != 0:
+                frame = rotate_frame(frame, rotation)
+            out.write(frame)
+            written += 1
+
+            # 每 30 幀回報一次，避免佇列過於頻繁
+            if written - reported >= 30:
+                progress_queue.put((index, written - reported))
+                reported = written
+    finally:
+        cap.release()
+        out.release()
+
+    if written - reported > 0:
+        progress_queue.put((index, written - reported))
+    return written
+
+
+class ParallelExporter:
+    """以多個進程平行輸出各保留片段，再依序無損拼接"""
+
+    def __init__(self, max_workers=None, min_chunk_seconds=2.0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_chunk_seconds = min_chunk_seconds
+
+    def is_available(self):
+        """檢查 ffmpeg 是否可用 (拼接與音頻處理需要)"""
+        return shutil.which("ffmpeg") is not None
+
+    def export(self, input_path, output_path, segments, fps, rotation=0,
+               progress_callback=None, status_callback=None):
+        """輸出保留片段 [(開始幀, 結束幀)] 組成的影片
+
+        progress_callback(比例) 會彙整所有工作進程的進度，比例介於 0 到 1。
+        """
+        chunks = split_segments(segments, self.max_workers, fps * self.min_chunk_seconds)
+        total_frames = sum(end - start for start, end in chunks)
+        if total_frames <= 0:
+            raise ParallelExportError("沒有要處理的視頻幀")
+
+        workers = min(self.max_workers, len(chunks))
+        if status_callback:
+            status_callback(f"平行輸出: {len(chunks)} 個區塊，{workers} 個進程")
+
+        temp_dir = tempfile.mkdtemp(prefix="ai_edit_export_")
+        try:
+            piece_paths = [os.path.join(temp_dir, f"piece_{i:05d}.mkv") for i in range(len(chunks))]
+
+            with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+                progress_queue = manager.Queue()
+                futures = [
+                    executor.submit(render_segment, (i, input_path, piece_paths[i], start, end,
+                                                     fps, rotation, progress_queue))
+                    for i, (start, end) in enumerate(chunks)
+                ]
+
+                # 彙整各進程的進度，直到全部完成或有進程失敗
+                processed_frames = 0
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout=0.2, return_when=FIRST_EXCEPTION)
+                    processed_frames += self._drain(progress_queue)
+                    if progress_callback:
+                        progress_callback(min(processed_frames / total_frames, 1.0))
+
+                    for future in done:
+                        if future.exception() is not None:
+                            for other in pending:
+                                other.cancel()
+                            raise ParallelExportError(str(future.exception()))
+
+            # 以 concat demuxer 依序無損拼接
+            list_path = os.path.join(temp_dir, "pieces.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for piece_path in piece_paths:
+                    f.write(f"file '{piece_path}'\n")
+
+            if status_callback:
+                status_callback("正在拼接片段...")
+            video_path = os.path.join(temp_dir, "video.mkv")
+            self._run([
+                "ffmpeg", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+                "-map", "0:v", "-c", "copy", "-y", video_path
+            ])
+
+            # 從原始影片一次裁切並連接所有保留片段的音頻 (以原始片段計算，不受區塊切分影響)
+            if status_callback:
+                status_callback("處理音頻中...")
+            try:
+                self._run([
+                    "ffmpeg", "-v", "error",
+                    "-i", video_path,
+                    "-i", input_path,
+                    "-filter_complex", build_audio_filter(segments, fps),
+                    "-map", "0:v",
+                    "-map", "[outa]",
+                    "-c:v", "copy",
+                    "-c:a", "aac",
+                    "-y",
+                    output_path
+                ])
+            except ParallelExportError as e:
+                # 來源沒有音頻或音頻無法處理時輸出無聲影片
+                print(f"音頻處理錯誤，將輸出無聲影片: {str(e)}")
+                self._run([
+                    "ffmpeg", "-v", "error", "-i", video_path,
+                    "-map", "0:v", "-c", "copy", "-y", output_path
+                ])
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _run(self, cmd):
+        """執行 ffmpeg，失敗時拋出 ParallelExportError"""
+        process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if process.returncode != 0:
+            raise ParallelExportError(process.stderr.decode("utf-8", errors="replace").strip())
+
+    def _drain(self, progress_queue):
+        """取出佇列中所有的進度回報，返回新增的幀數"""
+        frames = 0
+        while True:
+            try:
+                _, count = progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            frames += count
+        return frames
@@ -0,0 +1,167 @@
+import datetime
+import json
+import math
+import threading
+import time
+
+
+class StageStats:
+    """單一階段的耗時統計
+
+    耗時以對數刻度的直方圖保存 (每個 2 的冪次再分 8 格，誤差約 6%)，
+    記憶體用量與呼叫次數無關。
+    """
+
+    SUB_BUCKETS = 8
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+        # 以微秒為單位計算直方圖格子
+        micros = seconds * 1e6
+        if micros < 1:
+            index = 0
+        else:
+            mantissa, exponent = math.frexp(micros)
+            index = exponent * self.SUB_BUCKETS + int((mantissa - 0.5) * 2 * self.SUB_BUCKETS)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def _bucket_upper(self, index):
+        """格子的上限 (秒)"""
+        if index == 0:
+            return 1e-6
+        exponent, sub = divmod(index, self.SUB_BUCKETS)
+        mantissa = 0.5 + (sub + 1) / (2 * self.SUB_BUCKETS)
+        return math.ldexp(mantissa, exponent) / 1e6
+
+    def percentile(self, q):
+        """近似的百分位數 (秒)，q 介於 0 到 1"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative >= target:
+                return min(self._bucket_upper(index), self.max)
+        return self.max
+
+    def as_dict(self):
+        """以毫秒表示的統計"""
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 4) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5) * 1000, 4),
+            "p95_ms": round(self.percentile(0.95) * 1000, 4),
+            "max_ms": round(self.max * 1000, 4)
+        }
+
+
+class _Timer:
+    """計時一個階段的 context manager"""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    """停用時使用的空 context manager"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class StageProfiler:
+    """熱路徑的分階段計時
+
+    預設停用，停用時 stage() 直接返回共用的空 context manager，幾乎沒有額外成本。
+    啟用後記錄每個階段的呼叫次數與耗時直方圖 (p50 / p95 / max)，可輸出為 JSON 報告。
+    可以同時被多個線程使用。
+
+    用法:
+        with profiler.stage("decode"):
+            ret, frame = cap.read()
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def stage(self, name):
+        """返回計時 name 階段的 context manager"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def record(self, name, seconds):
+        """加入一次耗時 (秒)"""
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = StageStats()
+            stats.record(seconds)
+
+    def reset(self):
+        """清除所有統計"""
+        with self._lock:
+            self._stages = {}
+            self._started = time.perf_counter()
+
+    def summary(self):
+        """{階段: 統計}，依總耗時由大到小排列"""
+        with self._lock:
+            items = [(name, stats.as_dict()) for name, stats in self._stages.items()]
+        items.sort(key=lambda item: item[1]["total_ms"], reverse=True)
+        return dict(items)
+
+    def report(self, **metadata):
+        """組成執行報告，metadata 會加入報告 (例如影片路徑、執行的階段)"""
+        report = {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - self._started, 3),
+        }
+        report.update(metadata)
+        report["stages"] = self.summary()
+        return report
+
+    def save(self, path, **metadata):
+        """將執行報告寫入 JSON 檔"""
+        report = self.report(**metadata)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+# 沒有指定計時器時使用的共用停用實例
+NULL_PROFILER = StageProfiler(enabled=False)
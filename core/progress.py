@@ -0,0 +1,194 @@
+import queue
+import threading
+import time
+
+
+class ProgressEvent:
+    """工作線程回報的進度事件
+
+    stage 為處理階段 (例如 "analyze"、"apply"、"export")，fraction 為 0 到 1 的完成比例，
+    fps 為處理速度 (幀/秒)，eta 為預估剩餘秒數；沒有資料的欄位為 None。
+    force 為 True 的事件不會被顯示端合併或略過。
+    """
+
+    def __init__(self, stage, fraction=None, fps=None, eta=None, message=None, timestamp=None, force=False):
+        self.stage = stage
+        self.fraction = fraction
+        self.fps = fps
+        self.eta = eta
+        self.message = message
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.force = force
+
+    @property
+    def essential(self):
+        """帶有訊息、完成或 force 的事件必須交給顯示端，不能被較新的事件取代"""
+        return self.force or bool(self.message) or (self.fraction is not None and self.fraction >= 1.0)
+
+    def format(self):
+        """組成顯示在狀態欄的文字"""
+        if self.message:
+            text = self.message
+        elif self.fraction is not None:
+            text = f"{self.stage}: {self.fraction * 100:.1f}%"
+        else:
+            text = self.stage
+
+        extra = []
+        if self.fps:
+            extra.append(f"{self.fps:.0f} 幀/秒")
+        if self.eta is not None:
+            minutes, seconds = divmod(int(self.eta), 60)
+            extra.append(f"剩餘 {minutes}:{seconds:02d}")
+        if extra:
+            text += f" ({', '.join(extra)})"
+        return text
+
+    def to_dict(self):
+        """轉換為可輸出成 JSON 的字典，省略沒有資料的欄位"""
+        data = {"stage": self.stage}
+        if self.fraction is not None:
+            data["fraction"] = round(self.fraction, 4)
+        if self.fps is not None:
+            data["fps"] = round(self.fps, 2)
+        if self.eta is not None:
+            data["eta"] = round(self.eta, 1)
+        if self.message:
+            data["message"] = self.message
+        return data
+
+
+def coalesce(events):
+    """合併依序發生的進度事件: 必要事件 (見 ProgressEvent.essential) 全部保留，
+    其餘事件在每個階段只保留最新一個，保持原本的先後順序"""
+    kept = []
+    replaceable = {}   # 每個階段最新一個可被取代的事件在 kept 中的位置
+    for event in events:
+        index = replaceable.pop(event.stage, None)
+        if index is not None:
+            kept[index] = None
+        if not event.essential:
+            replaceable[event.stage] = len(kept)
+        kept.append(event)
+    return [event for event in kept if event is not None]
+
+
+class ProgressBridge:
+    """工作線程與進度顯示之間的事件橋接
+
+    publish() 可以在任何線程呼叫，計算處理速度與剩餘時間後把事件交給所有監聽器，
+    監聽器在發佈事件的線程中執行。產生端不丟棄事件，頻率限制由顯示端處理
+    (TkProgressPump 每次只顯示各階段最新的事件，ThrottledListener 限制輸出頻率)。
+    """
+
+    def __init__(self):
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stage_start = {}    # 每個階段第一次回報的時間
+
+    def add_listener(self, listener):
+        """加入監聽器 listener(event)"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """移除監聽器"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def reset(self, stage):
+        """重新開始某階段的計時"""
+        with self._lock:
+            self._stage_start.pop(stage, None)
+
+    def publish(self, stage, fraction=None, message=None, done=None, force=False):
+        """發佈進度並返回事件，done 為已處理的幀數 (用於計算速度)"""
+        now = time.perf_counter()
+        with self._lock:
+            start = self._stage_start.setdefault(stage, now)
+            listeners = list(self._listeners)
+
+        elapsed = now - start
+        fps = done / elapsed if done and elapsed > 0 else None
+        eta = None
+        if fraction is not None and 0 < fraction < 1 and elapsed > 0:
+            eta = elapsed * (1 - fraction) / fraction
+
+        event = ProgressEvent(stage, fraction, fps, eta, message, force=force)
+        for listener in listeners:
+            listener(event)
+        return event
+
+
+class ThrottledListener:
+    """限制監聽器的呼叫頻率
+
+    同一階段在 min_interval 秒內的一般事件會被略過；必要事件 (見 ProgressEvent.essential)
+    與階段切換的事件一定會交給 listener。
+    """
+
+    def __init__(self, listener, min_interval=1.0):
+        self.listener = listener
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_stage = None
+        self._last_emit = {}      # 每個階段最後一次交給 listener 的時間
+
+    def __call__(self, event):
+        now = time.perf_counter()
+        with self._lock:
+            if not (event.essential or event.stage != self._last_stage
+                    or now - self._last_emit.get(event.stage, float("-inf")) >= self.min_interval):
+                return
+            self._last_stage = event.stage
+            self._last_emit[event.stage] = now
+        self.listener(event)
+
+
+class TkProgressPump:
+    """在 Tk 主線程以固定頻率取出進度事件
+
+    事件先放入線程安全的佇列，每 interval 毫秒由 root.after 取出一次，
+    同一階段只把最新的事件 (以及帶訊息等必要事件) 交給 callback，避免大量回調塞滿 Tk 事件佇列。
+    """
+
+    def __init__(self, root, bridge, callback, interval=100):
+        self.root = root
+        self.bridge = bridge
+        self.callback = callback
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._running = False
+
+        bridge.add_listener(self._queue.put)
+
+    def start(self):
+        """開始定期取出事件"""
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval, self._poll)
+
+    def stop(self):
+        """停止定期取出，並在 Tk 主線程處理剩餘的事件"""
+        self._running = False
+        self.bridge.remove_listener(self._queue.put)
+        self.root.after(0, self._drain)
+
+    def _poll(self):
+        if not self._running:
+            return
+        self._drain()
+        self.root.after(self.interval, self._poll)
+
+    def _drain(self):
+        """取出所有事件並合併 (見 coalesce)"""
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        for event in coalesce(events):
+            self.callback(event)
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+import cv2
+
+from core.analysis_cache import default_cache_dir, file_fingerprint
+from core.frame_source import scaled_size
+
+
+class ProxyError(Exception):
+    """無法建立預覽代理檔"""
+
+
+# 代理檔長邊的預設像素數
+DEFAULT_PROXY_SIZE = 640
+
+
+def map_rect(rect, from_size, to_size):
+    """將 (x, y, w, h) 從 from_size (寬, 高) 的畫面換算到 to_size 的畫面，並限制在畫面範圍內"""
+    x, y, w, h = rect
+    sx = to_size[0] / from_size[0]
+    sy = to_size[1] / from_size[1]
+    x1 = max(0, min(int(round(x * sx)), to_size[0] - 1))
+    y1 = max(0, min(int(round(y * sy)), to_size[1] - 1))
+    x2 = max(x1 + 1, min(int(round((x + w) * sx)), to_size[0]))
+    y2 = max(y1 + 1, min(int(round((y + h) * sy)), to_size[1]))
+    return x1, y1, x2 - x1, y2 - y1
+
+
+def read_source_frame(path, frame_idx):
+    """從原始影片讀取第 frame_idx 幀 (完整解析度)，失敗時返回 None"""
+    cap = cv2.VideoCapture(path)
+    try:
+        if frame_idx > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = cap.read()
+        return frame if ret else None
+    finally:
+        cap.release()
+
+
+class VideoProxy:
+    """預覽代理檔與原始影片的對應
+
+    代理檔與原始影片逐幀一一對應 (代理檔第 i 幀就是原始影片第 i 幀)，只有解析度不同；
+    每一幀都是關鍵幀 (MJPEG)，跳轉到任何位置只需要解碼一幀。
+    畫面座標以 to_source_rect() 換算回原始影片。
+    """
+
+    def __init__(self, source_path, path, source_size, size, fps, frame_count):
+        self.source_path = source_path
+        self.path = path
+        self.source_size = source_size
+        self.size = size
+        self.fps = fps
+        self.frame_count = frame_count
+
+    def open(self):
+        """打開代理檔，返回 cv2.VideoCapture"""
+        return cv2.VideoCapture(self.path)
+
+    def to_source_rect(self, rect):
+        """代理檔畫面上的 (x, y, w, h) 換算為原始影片的座標"""
+        return map_rect(rect, self.size, self.source_size)
+
+
+class ProxyBuilder:
+    """在背景建立影片的低解析度、全關鍵幀預覽代理檔
+
+    代理檔以原始影片的內容指紋命名，保存在快取目錄中，同一部影片只需要建立一次。
+    有 ffmpeg 時以 ffmpeg 轉碼為 MJPEG / AVI (時間戳依幀序重新編號，不丟幀也不補幀)，
+    否則以 OpenCV 逐幀縮小寫入；兩種方式都保持與原始影片逐幀對應。
+    """
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_PROXY_SIZE, quality=5, ffmpeg="ffmpeg"):
+        self.cache_dir = os.path.join(cache_dir or default_cache_dir(), "proxy")
+        self.max_size = max_size
+        self.quality = quality
+        self.ffmpeg = ffmpeg
+
+        self._lock = threading.Lock()
+        self._threads = {}   # 建立中的代理檔 {原始影片路徑: 線程}
+        self._proxies = {}   # 已建立的代理檔 {原始影片路徑: VideoProxy}
+
+    def proxy_path(self, path):
+        """原始影片對應的代理檔路徑"""
+        key = hashlib.sha1(json.dumps({
+            "fingerprint": file_fingerprint(path),
+            "max_size": self.max_size,
+            "quality": self.quality
+        }, sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + ".avi")
+
+    def get(self, path):
+        """已建立的代理檔，尚未建立時返回 None"""
+        with self._lock:
+            proxy = self._proxies.get(path)
+        if proxy is not None and os.path.exists(proxy.path):
+            return proxy
+        proxy_path = self.proxy_path(path)
+        if os.path.exists(proxy_path):
+            return self._remember(path, proxy_path)
+        return None
+
+    def is_building(self, path):
+        with self._lock:
+            thread = self._threads.get(path)
+        return thread is not None and thread.is_alive()
+
+    def build_async(self, path, callback=None, progress_callback=None):
+        """在背景線程建立代理檔
+
+        完成後在背景線程呼叫 callback(VideoProxy)，失敗時 callback(None)；
+        已經在建立中的影片不會重複建立 (此時不會呼叫 callback)。
+        """
+        with self._lock:
+            thread = self._threads.get(path)
+            if thread is not None and thread.is_alive():
+                return thread
+
+            def worker():
+                try:
+                    proxy = self.build(path, progress_callback)
+                except (ProxyError, OSError) as e:
+                    print(f"建立預覽代理檔失敗: {str(e)}")
+                    proxy = None
+                finally:
+                    with self._lock:
+                        self._threads.pop(path, None)
+                if callback:
+                    callback(proxy)
+
+            thread = threading.Thread(target=worker, daemon=True)
+            self._threads[path] = thread
+        thread.start()
+        return thread
+
+    def build(self, path, progress_callback=None):
+        """建立 (或沿用已建立的) 代理檔並返回 VideoProxy，progress_callback(比例) 回報進度"""
+        proxy = self.get(path)
+        if proxy is not None:
+            return proxy
+
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise ProxyError("無法打開影片")
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        size = scaled_size(width, height, self.max_size)
+
+        proxy_path = self.proxy_path(path)
+        os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+        # 先寫入臨時檔再替換，避免其他線程讀到不完整的代理檔
+        temp_path = proxy_path + ".tmp.avi"
+        try:
+            if shutil.which(self.ffmpeg) is not None:
+                cap.release()
+                try:
+                    self._build_ffmpeg(path, temp_path, size, frame_count, progress_callback)
+                except ProxyError as e:
+                    print(f"ffmpeg 建立代理檔失敗，改用 OpenCV: {str(e)}")
+                    cap = cv2.VideoCapture(path)
+                    self._build_opencv(cap, temp_path, size, fps, frame_count, progress_callback)
+            else:
+                self._build_opencv(cap, temp_path, size, fps, frame_count, progress_callback)
+            os.replace(temp_path, proxy_path)
+        finally:
+            cap.release()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        return self._remember(path, proxy_path)
+
+    def _build_ffmpeg(self, path, output_path, size, frame_count, progress_callback=None):
+        """以 ffmpeg 轉碼，setpts 依幀序重新編號時間戳，確保代理檔與原始影片逐幀對應"""
+        cmd = [
+            self.ffmpeg, "-v", "error", "-nostdin", "-y", "-i", path,
+            "-map", "0:v:0", "-an", "-sn", "-dn",
+            "-vf", f"scale={size[0]}:{size[1]},setpts=round(N/FRAME_RATE/TB),format=yuvj420p",
+            "-vsync", "passthrough", "-c:v", "mjpeg", "-q:v", str(self.quality),
+            "-progress", "pipe:1", "-nostats", output_path
+        ]
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       stdin=subprocess.DEVNULL)
+        except OSError as e:
+            raise ProxyError(str(e))
+
+        # -progress 每隔一段時間輸出 frame=N
+        for line in process.stdout:
+            if progress_callback and frame_count > 0 and line.startswith(b"frame="):
+                try:
+                    progress_callback(min(int(line[6:]) / frame_count, 1.0))
+                except ValueError:
+                    pass
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise ProxyError(stderr.decode("utf-8", errors="replace").strip() or "ffmpeg 執行失敗")
+
+    def _build_opencv(self, cap, output_path, size, fps, frame_count, progress_callback=None):
+        """以 OpenCV 逐幀縮小並寫入 MJPEG"""
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+        if not writer.isOpened():
+            raise ProxyError("無法建立代理檔")
+        try:
+            frames = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if (frame.shape[1], frame.shape[0]) != size:
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                writer.write(frame)
+                frames += 1
+                if progress_callback and frame_count > 0 and frames % 100 == 0:
+                    progress_callback(min(frames / frame_count, 1.0))
+        finally:
+            writer.release()
+
+    def _remember(self, path, proxy_path):
+        """讀取代理檔資訊並記錄"""
+        source = cv2.VideoCapture(path)
+        source_size = (int(source.get(cv2.CAP_PROP_FRAME_WIDTH)), int(source.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        source.release()
+
+        cap = cv2.VideoCapture(proxy_path)
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        proxy = VideoProxy(path, proxy_path, source_size, size, fps, frame_count)
+        with self._lock:
+            self._proxies[path] = proxy
+        return proxy
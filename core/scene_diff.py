@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+
+from core.profiling import NULL_PROFILER
+
+
+class SceneDiff:
+    """在低解析度灰度縮圖上計算相鄰幀的變化百分比
+
+    縮圖把原始幀切成 size (寬, 高) 個格子，每格取一個固定的隨機位置像素 (抖動取樣)。
+    取樣不會平均相鄰像素，縮圖中變化像素的比例即為原始解析度比例的無偏估計，
+    原有閾值可以直接沿用；隨機位置也避免了規則取樣在重複紋理上的混疊。
+    所有中間結果都寫入預先配置的緩衝區。size 為 None 時使用原始解析度。
+
+    rotation 為影片需要的旋轉角度 (順時針)。傳入未旋轉的幀時，取樣位置在旋轉後的畫面上
+    計算再對應回原始座標，縮圖與先旋轉整幀再取樣的結果完全相同。
+    原始解析度模式的變化百分比與旋轉無關，不需要處理。
+    """
+
+    def __init__(self, size=(160, 90), diff_threshold=25, seed=0, profiler=None, rotation=0):
+        self.size = tuple(size) if size else None
+        self.diff_threshold = diff_threshold
+        self.seed = seed
+        self.rotation = rotation % 360
+        self.profiler = profiler or NULL_PROFILER
+
+        self._samples = None
+        self._gray = [None, None]
+        self._diff = None
+        self._indices = None
+        self._frame_shape = None
+        self._current = 0
+        self._has_prev = False
+
+        if self.size is not None:
+            width, height = self.size
+            self._samples = np.empty((height, width, 3), dtype=np.uint8)
+            self._gray = [np.empty((height, width), dtype=np.uint8) for _ in range(2)]
+            self._diff = np.empty((height, width), dtype=np.uint8)
+
+    def reset(self):
+        """清除前一幀，下一次 update 重新開始比較"""
+        self._has_prev = False
+
+    def _sample_indices(self, frame_height, frame_width):
+        """計算每個格子內取樣像素在未旋轉幀中的平坦索引"""
+        source_width = frame_width
+        if self.rotation in (90, 270):
+            frame_height, frame_width = frame_width, frame_height
+
+        width, height = self.size
+        rng = np.random.default_rng(self.seed)
+
+        # 每格的邊界，格子大小不整除時平均分配
+        y_edges = np.linspace(0, frame_height, height + 1).astype(np.int64)
+        x_edges = np.linspace(0, frame_width, width + 1).astype(np.int64)
+        y_span = np.maximum(y_edges[1:] - y_edges[:-1], 1)
+        x_span = np.maximum(x_edges[1:] - x_edges[:-1], 1)
+
+        ys = y_edges[:-1, None] + (rng.random((height, width)) * y_span[:, None]).astype(np.int64)
+        xs = x_edges[None, :-1] + (rng.random((height, width)) * x_span[None, :]).astype(np.int64)
+        ys = np.minimum(ys, frame_height - 1)
+        xs = np.minimum(xs, frame_width - 1)
+
+        # 旋轉後畫面的 (ys, xs) 對應回未旋轉幀的座標
+        if self.rotation == 90:
+            ys, xs = frame_width - 1 - xs, ys
+        elif self.rotation == 180:
+            ys, xs = frame_height - 1 - ys, frame_width - 1 - xs
+        elif self.rotation == 270:
+            ys, xs = xs, frame_height - 1 - ys
+
+        return (ys * source_width + xs).ravel()
+
+    def _to_gray(self, frame):
+        """將幀轉換為灰度縮圖，返回本次使用的緩衝區"""
+        if self.size is None:
+            # 原始解析度模式
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+            self._gray[self._current] = gray
+            return gray
+
+        # 幀尺寸改變時重新計算取樣位置
+        if frame.shape[:2] != self._frame_shape:
+            self._frame_shape = frame.shape[:2]
+            self._indices = self._sample_indices(*self._frame_shape)
+
+        frame = np.ascontiguousarray(frame)
+        gray = self._gray[self._current]
+        if frame.ndim == 2:
+            np.take(frame.reshape(-1), self._indices, out=gray.reshape(-1))
+        else:
+            np.take(frame.reshape(-1, 3), self._indices, axis=0, out=self._samples.reshape(-1, 3))
+            cv2.cvtColor(self._samples, cv2.COLOR_BGR2GRAY, dst=gray)
+        return gray
+
+    def update(self, frame):
+        """加入新的一幀，返回與前一幀的變化百分比，第一幀返回 None"""
+        with self.profiler.stage("gray"):
+            gray = self._to_gray(frame)
+
+        change_percentage = None
+        if self._has_prev:
+            prev_gray = self._gray[1 - self._current]
+
+            with self.profiler.stage("diff"):
+                # 計算兩幀間的差異
+                if self.size is None:
+                    diff = cv2.absdiff(prev_gray, gray)
+                    _, diff = cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_BINARY)
+                else:
+                    diff = self._diff
+                    cv2.absdiff(prev_gray, gray, dst=diff)
+                    cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_BINARY, dst=diff)
+
+                # 計算差異百分比
+                change_percentage = (cv2.countNonZero(diff) * 100) / diff.size
+
+        self._has_prev = True
+        self._current = 1 - self._current
+        return change_percentage
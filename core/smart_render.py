@@ -0,0 +1,324 @@
+import bisect
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from fractions import Fraction
+
+
+class SmartRenderError(Exception):
+    """智慧輸出無法完成 (缺少工具、不支援的編碼或 ffmpeg 執行失敗)"""
+
+
+# 來源編碼對應的重新編碼器與比特流過濾器
+ENCODERS = {
+    "h264": ("libx264", "h264_mp4toannexb"),
+    "hevc": ("libx265", "hevc_mp4toannexb"),
+}
+
+# ffprobe 的 profile 名稱對應的編碼器 profile (沒有對應時使用編碼器預設值)
+PROFILES = {
+    "h264": {
+        "Baseline": "baseline", "Constrained Baseline": "baseline", "Main": "main", "High": "high",
+        "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444"
+    },
+    "hevc": {"Main": "main", "Main 10": "main10", "Main Still Picture": "mainstillpicture"},
+}
+
+
+def encoder_options(info):
+    """重新編碼片段的編碼器參數
+
+    序列與圖像參數集 (SPS/PPS) 寫在每個關鍵幀前 (repeat-headers)，不只寫在容器標頭中；
+    直接複製的 GOP 帶有來源的參數集，拼接後解碼器才不會把來源的參數集套用到重新編碼的
+    片段上。profile 與 level 與來源相同。
+    """
+    codec = info["codec"]
+    options = []
+    profile = PROFILES[codec].get(info.get("profile"))
+    if profile:
+        options += ["-profile:v", profile]
+
+    params = ["repeat-headers=1"]
+    level = info.get("level") or 0
+    if level > 0:
+        # ffprobe 的 level: H.264 為 level×10，HEVC 為 level×30
+        if codec == "h264":
+            options += ["-level:v", f"{level / 10:.1f}"]
+        else:
+            params.append(f"level-idc={level / 30:.1f}")
+    options += ["-x264-params" if codec == "h264" else "-x265-params", ":".join(params)]
+    return options
+
+
+def plan_pieces(segments, keyframes):
+    """依關鍵幀位置將保留片段拆分為直接複製與重新編碼的部分
+
+    segments 與 keyframes 均以幀號表示，片段為 [開始幀, 結束幀)。
+    片段內第一個與最後一個關鍵幀之間的完整 GOP 直接複製，
+    片段開頭到第一個關鍵幀、最後一個關鍵幀到片段結尾的部分重新編碼。
+    返回 [(模式, 開始幀, 結束幀)]，模式為 "copy" 或 "encode"。
+    """
+    pieces = []
+    for start, end in segments:
+        if end <= start:
+            continue
+
+        i = bisect.bisect_left(keyframes, start)
+        j = bisect.bisect_right(keyframes, end) - 1
+        first_key = keyframes[i] if i < len(keyframes) else None
+        last_key = keyframes[j] if j >= 0 else None
+
+        # 片段內沒有完整的 GOP，整段重新編碼
+        if first_key is None or last_key is None or last_key <= first_key:
+            pieces.append(("encode", start, end))
+            continue
+
+        if start < first_key:
+            pieces.append(("encode", start, first_key))
+        pieces.append(("copy", first_key, last_key))
+        if last_key < end:
+            pieces.append(("encode", last_key, end))
+
+    return pieces
+
+
+class SmartRenderer:
+    """依來源關鍵幀佈局輸出剪輯結果，只重新編碼片段邊界的不完整 GOP"""
+
+    def __init__(self, ffmpeg="ffmpeg", ffprobe="ffprobe", crf=16, preset="medium"):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.crf = crf
+        self.preset = preset
+
+    def is_available(self):
+        """檢查 ffmpeg 和 ffprobe 是否可用"""
+        return shutil.which(self.ffmpeg) is not None and shutil.which(self.ffprobe) is not None
+
+    def _run(self, cmd):
+        """執行外部命令，失敗時拋出 SmartRenderError"""
+        process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if process.returncode != 0:
+            message = process.stderr.decode("utf-8", errors="replace").strip().splitlines()
+            raise SmartRenderError(message[-1] if message else f"{cmd[0]} 執行失敗")
+        return process.stdout
+
+    def probe(self, input_path):
+        """讀取影片串流資訊與關鍵幀位置 (只讀取封包，不解碼)"""
+        output = self._run([
+            self.ffprobe, "-v", "error",
+            "-show_entries", "stream=index,codec_type,codec_name,profile,level,width,height,pix_fmt,r_frame_rate,start_time:"
+                             "stream_side_data=rotation:stream_tags=rotate",
+            "-of", "json", input_path
+        ])
+        streams = json.loads(output.decode("utf-8")).get("streams", [])
+        video = next((s for s in streams if s.get("codec_type") == "video"), None)
+        if video is None:
+            raise SmartRenderError("找不到視頻串流")
+
+        fps = Fraction(video.get("r_frame_rate", "0/1"))
+        if fps <= 0:
+            raise SmartRenderError("無法取得影片幀率")
+        start_time = float(video.get("start_time") or 0.0)
+
+        # 讀取視頻封包的時間戳與關鍵幀標記
+        packets = self._run([
+            self.ffprobe, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0", input_path
+        ]).decode("utf-8")
+
+        keyframes = set()
+        for line in packets.splitlines():
+            parts = line.strip().split(",")
+            if len(parts) < 2 or "K" not in parts[1]:
+                continue
+            try:
+                pts_time = float(parts[0])
+            except ValueError:
+                continue
+            keyframes.add(int(round((pts_time - start_time) * fps)))
+
+        return {
+            "codec": video.get("codec_name"),
+            "profile": video.get("profile"),
+            "level": int(video.get("level") or 0),
+            "width": video.get("width"),
+            "height": video.get("height"),
+            "pix_fmt": video.get("pix_fmt"),
+            "fps": fps,
+            "start_time": start_time,
+            "keyframes": sorted(keyframes),
+            "rotation": stream_rotation(video),
+            "has_audio": any(s.get("codec_type") == "audio" for s in streams)
+        }
+
+    def display_rotation(self, input_path):
+        """影片第一個視頻串流的顯示旋轉 (順時針角度)"""
+        output = self._run([
+            self.ffprobe, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream_side_data=rotation:stream_tags=rotate",
+            "-of", "json", input_path
+        ])
+        streams = json.loads(output.decode("utf-8")).get("streams", [])
+        return stream_rotation(streams[0]) if streams else 0
+
+    def render(self, input_path, output_path, segments, progress_callback=None, status_callback=None):
+        """輸出保留片段 [(開始幀, 結束幀)] 組成的影片，包含原始音頻
+
+        progress_callback(比例) 在每個部分完成後被呼叫，比例介於 0 到 1。
+        """
+        info = self.probe(input_path)
+        if info["codec"] not in ENCODERS:
+            raise SmartRenderError(f"不支援的視頻編碼: {info['codec']}")
+
+        pieces = plan_pieces(segments, info["keyframes"])
+        if not pieces:
+            raise SmartRenderError("沒有要處理的視頻幀")
+
+        total_frames = sum(end - start for _, start, end in pieces)
+        copied_frames = sum(end - start for mode, start, end in pieces if mode == "copy")
+        if status_callback:
+            status_callback(f"智慧輸出: 直接複製 {copied_frames}/{total_frames} 幀，其餘重新編碼")
+
+        temp_dir = tempfile.mkdtemp(prefix="ai_edit_render_")
+        try:
+            piece_paths = []
+            processed_frames = 0
+            for i, (mode, start, end) in enumerate(pieces):
+                piece_path = os.path.join(temp_dir, f"piece_{i:05d}.mkv")
+                if mode == "copy":
+                    self._copy_piece(input_path, piece_path, start, end, info)
+                else:
+                    self._encode_piece(input_path, piece_path, start, end, info)
+                piece_paths.append(piece_path)
+
+                processed_frames += end - start
+                if progress_callback:
+                    progress_callback(processed_frames / total_frames)
+
+            # 以 concat demuxer 無損拼接所有部分
+            list_path = os.path.join(temp_dir, "pieces.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for piece_path in piece_paths:
+                    f.write(f"file '{piece_path}'\n")
+
+            video_path = os.path.join(temp_dir, "video.mp4")
+            self._run([
+                self.ffmpeg, "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+                "-map", "0:v", "-c", "copy", "-y", video_path
+            ])
+
+            if status_callback:
+                status_callback("處理音頻中...")
+            if not info["rotation"]:
+                self.mux_audio(video_path, input_path, output_path, segments, info["fps"], info["has_audio"])
+                return
+
+            # 各部分都保持編碼方向，最後寫入來源的顯示旋轉
+            muxed_path = os.path.join(temp_dir, "muxed.mp4")
+            self.mux_audio(video_path, input_path, muxed_path, segments, info["fps"], info["has_audio"])
+            self.set_display_rotation(muxed_path, output_path, info["rotation"])
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _frame_time(self, frame_idx, info):
+        """幀號對應的時間 (秒)"""
+        return float(frame_idx / info["fps"])
+
+    def _copy_piece(self, input_path, piece_path, start, end, info):
+        """直接複製從關鍵幀 start 開始的完整 GOP"""
+        _, bitstream_filter = ENCODERS[info["codec"]]
+        # 稍微超過關鍵幀時間，確保跳轉落在該關鍵幀上
+        seek_time = self._frame_time(start + 0.25, info)
+        self._run([
+            self.ffmpeg, "-v", "error", "-ss", f"{seek_time:.6f}", "-i", input_path,
+            "-map", "0:v:0", "-an", "-frames:v", str(end - start),
+            "-c", "copy", "-bsf:v", bitstream_filter,
+            "-avoid_negative_ts", "make_zero", "-f", "matroska", "-y", piece_path
+        ])
+
+    def _encode_piece(self, input_path, piece_path, start, end, info):
+        """以與來源相同的編碼參數重新編碼 [start, end) 的幀 (見 encoder_options)
+
+        不依顯示矩陣自動旋轉，與直接複製的 GOP 一樣保持編碼方向。
+        """
+        encoder, _ = ENCODERS[info["codec"]]
+        # 往前半幀跳轉，精確地從 start 幀開始解碼輸出
+        seek_time = max(0.0, self._frame_time(start - 0.5, info))
+        cmd = [
+            self.ffmpeg, "-v", "error", "-noautorotate", "-ss", f"{seek_time:.6f}", "-i", input_path,
+            "-map", "0:v:0", "-an", "-frames:v", str(end - start),
+            "-c:v", encoder, "-preset", self.preset, "-crf", str(self.crf)
+        ] + encoder_options(info)
+        if info["pix_fmt"]:
+            cmd += ["-pix_fmt", info["pix_fmt"]]
+        cmd += ["-avoid_negative_ts", "make_zero", "-f", "matroska", "-y", piece_path]
+        self._run(cmd)
+
+    def mux_audio(self, video_path, input_path, output_path, segments, fps, has_audio=True):
+        """從原始影片裁切各片段的音頻，與拼接後的視頻合併"""
+        if not has_audio:
+            shutil.move(video_path, output_path)
+            return
+
+        audio_filter = build_audio_filter(segments, fps)
+        self._run([
+            self.ffmpeg, "-v", "error",
+            "-i", video_path,
+            "-i", input_path,
+            "-filter_complex", audio_filter,
+            "-map", "0:v",
+            "-map", "[outa]",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            "-y",
+            output_path
+        ])
+
+    def set_display_rotation(self, input_path, output_path, rotation):
+        """以串流複製寫入顯示旋轉資訊 (順時針角度)，播放器顯示時旋轉，不重新編碼
+
+        ffmpeg 6.0 以上寫入顯示矩陣 (-display_rotation 為逆時針角度)，
+        較舊的版本改為寫入 rotate 標籤。
+        """
+        try:
+            self._run([
+                self.ffmpeg, "-v", "error", "-display_rotation", str((360 - rotation) % 360),
+                "-i", input_path, "-map", "0", "-c", "copy", "-y", output_path
+            ])
+        except SmartRenderError:
+            self._run([
+                self.ffmpeg, "-v", "error", "-i", input_path, "-map", "0", "-c", "copy",
+                "-metadata:s:v:0", f"rotate={rotation}", "-y", output_path
+            ])
+
+
+def stream_rotation(stream):
+    """ffprobe 串流資訊中的顯示旋轉，換算為順時針角度 (顯示矩陣為逆時針角度，rotate 標籤為順時針)"""
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            return int(round(-float(side_data["rotation"]))) % 360
+    try:
+        return int(stream.get("tags", {}).get("rotate", 0)) % 360
+    except ValueError:
+        return 0
+
+
+def build_audio_filter(segments, fps, input_index=1):
+    """建立裁切並連接各片段音頻的 filter_complex，音頻取自第 input_index 個輸入"""
+    audio_filter = ""
+    for i, (start, end) in enumerate(segments):
+        if i > 0:
+            audio_filter += ";"
+        start_time = float(start / fps)
+        end_time = float(end / fps)
+        audio_filter += f"[{input_index}:a]atrim=start={start_time}:end={end_time},asetpts=PTS-STARTPTS[a{i}]"
+    # 連接音頻片段
+    audio_filter += ";"
+    for i in range(len(segments)):
+        audio_filter += f"[a{i}]"
+    audio_filter += f"concat=n={len(segments)}:v=0:a=1[outa]"
+    return audio_filter
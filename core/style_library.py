@@ -0,0 +1,153 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core.detection import SharedModel
+from core.headless import HeadlessSession
+from core.style_profile import StyleProfile
+
+
+class StyleLibraryError(Exception):
+    """無法由範例影片資料夾建立剪輯風格"""
+
+
+# 視為範例影片的副檔名
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+
+def find_examples(folder):
+    """資料夾中的範例影片路徑 (依檔名排序，不包含子資料夾)"""
+    paths = []
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS and os.path.isfile(path):
+            paths.append(path)
+    return paths
+
+
+class _ExampleSession(HeadlessSession):
+    """分析單一範例影片的工作階段，進度事件轉給風格庫的回調而不輸出日誌"""
+
+    def __init__(self, object_model, path, callback=None):
+        super().__init__(object_model)
+        self.path = path
+        self.callback = callback
+
+    def on_progress_event(self, event):
+        if self.callback is not None:
+            self.callback(self.path, event)
+
+
+class StyleLibrary:
+    """由多部範例影片合併而成的剪輯風格
+
+    範例影片由線程池同時分析，所有線程共用同一個檢測模型 (推論經 SharedModel 互斥，
+    解碼與場景差異在各影片自己的管線線程中與推論重疊)，每部影片的結果再以
+    StyleProfile.aggregate 合併。每部影片以 processor.fork() 的處理器分析，
+    啟用計時時各影片的報告保存在 reports。
+    風格庫保留每部影片的分析結果，以檔案大小、修改時間和分析參數 (與分析快取鍵相同) 判斷是否需要重新分析，
+    資料夾更新後只分析新增或修改過的影片；VideoProcessor 的分析快取則讓未修改的影片
+    在不同工作階段之間也不需要重新分析。
+    """
+
+    def __init__(self, processor, workers=None):
+        self.processor = processor
+        self.workers = workers or min(4, os.cpu_count() or 1)
+
+        # {影片路徑: (簽章, StyleProfile)}
+        self.clips = {}
+        # 最近一次分析失敗的影片 {影片路徑: 錯誤訊息}
+        self.errors = {}
+        # 最近一次分析的合併風格與統計，以及各影片的計時報告 {影片路徑: 報告}
+        self.profile = None
+        self.stats = {}
+        self.reports = {}
+
+    def analyze(self, folder, object_model=None, use_object_detection=True, rotation=0, weights=None,
+                use_cache=True, progress_callback=None):
+        """分析資料夾 (或影片路徑列表) 中的範例影片，返回合併後的 StyleProfile
+
+        weights 為 {影片路徑或檔名: 權重}，未指定的影片權重為 1。
+        progress_callback(影片路徑, ProgressEvent) 在分析線程中呼叫。
+        個別影片分析失敗時記錄在 errors 並略過，全部失敗時拋出 StyleLibraryError。
+        """
+        paths = find_examples(folder) if isinstance(folder, str) else list(folder)
+        if not paths:
+            raise StyleLibraryError("資料夾中沒有範例影片")
+
+        start_time = time.perf_counter()
+        use_object_detection = bool(use_object_detection and object_model is not None)
+        # 與分析快取鍵相同的參數與處理器設定 (檢測類別、檢測排程、解碼設定等)
+        params = json.dumps(self.processor.analysis_params(object_model, use_object_detection, rotation),
+                            sort_keys=True, default=str)
+
+        # 移除已不在資料夾中的影片，找出新增或修改過的影片
+        self.clips = {path: entry for path, entry in self.clips.items() if path in paths}
+        pending = []
+        for path in paths:
+            signature = self._signature(path, params)
+            entry = self.clips.get(path)
+            if entry is None or entry[0] != signature:
+                pending.append((path, signature))
+
+        self.errors = {}
+        self.reports = {}
+        workers = max(1, min(self.workers, len(pending)))
+        if pending:
+            # 多個線程同時推論時以鎖保護共用的模型
+            model = object_model
+            if use_object_detection and workers > 1 and not isinstance(model, SharedModel):
+                model = SharedModel(model)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self._analyze_clip, path, model, use_object_detection, rotation,
+                                    use_cache, progress_callback): (path, signature)
+                    for path, signature in pending
+                }
+                for future in as_completed(futures):
+                    path, signature = futures[future]
+                    try:
+                        profile, report = future.result()
+                        self.clips[path] = (signature, profile)
+                        if report:
+                            self.reports[path] = report
+                    except Exception as e:
+                        self.clips.pop(path, None)
+                        self.errors[path] = str(e)
+                        print(f"分析範例影片失敗 {os.path.basename(path)}: {str(e)}")
+
+        analyzed = [path for path in paths if path in self.clips]
+        if not analyzed:
+            raise StyleLibraryError("沒有成功分析的範例影片")
+
+        weights = weights or {}
+        self.profile = StyleProfile.aggregate(
+            [self.clips[path][1] for path in analyzed],
+            [weights.get(path, weights.get(os.path.basename(path), 1.0)) for path in analyzed]
+        )
+        self.stats = {
+            "clips": len(paths),
+            "analyzed": len(pending) - len(self.errors),
+            "reused": len(paths) - len(pending),
+            "failed": len(self.errors),
+            "workers": workers,
+            "elapsed": time.perf_counter() - start_time
+        }
+        return self.profile
+
+    def _signature(self, path, params):
+        """判斷影片是否需要重新分析的簽章"""
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns, params
+
+    def _analyze_clip(self, path, model, use_object_detection, rotation, use_cache, progress_callback):
+        """在工作線程中分析一部範例影片，返回 (StyleProfile, 計時報告)
+
+        結果寫入獨立的工作階段，不影響應用程式狀態；每部影片使用自己的處理器。
+        """
+        session = _ExampleSession(model, path, progress_callback)
+        processor = self.processor.fork()
+        profile = processor.analyze_example_video(path, session, use_object_detection, rotation, use_cache)
+        return profile, processor.last_profile_report
@@ -0,0 +1,310 @@
+import json
+import os
+
+import numpy as np
+
+from core.object_index import ObjectIndex
+
+
+class StyleProfile:
+    """範例影片分析出的剪輯風格
+
+    所有數值資料都以 NumPy 陣列保存：物件時間戳合併成一個陣列，以 object_offsets 切分；
+    物件轉場次數為 物件數 x 物件數 的矩陣；沒有平均展示時長的物件以 NaN 表示。
+    可以儲存為 .npz (二進位) 或 .json，在不同工作階段和機器之間直接載入。
+    segment_weights 為每個片段時長的權重 (單一範例影片時全為 1)，由多部範例影片合併的風格
+    以權重表示各影片的片段時長分佈所佔的比例。object_weights 為每個物件時間戳的檢測權重
+    (固定間隔檢測時全為 1，見 ObjectIndex)。
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, cut_points=None, fps=0.0, frame_count=0, segment_durations=None,
+                 avg_segment_duration=0.0, cutting_density=0.0, object_names=None,
+                 object_counts=None, object_timestamps=None, object_offsets=None,
+                 object_durations=None, object_transitions=None, important_objects=None,
+                 segment_weights=None, object_weights=None):
+        self.object_names = list(object_names or [])
+        n = len(self.object_names)
+
+        self.cut_points = np.asarray(cut_points if cut_points is not None else [], dtype=np.int64)
+        self.fps = float(fps)
+        self.frame_count = int(frame_count)
+        self.segment_durations = np.asarray(
+            segment_durations if segment_durations is not None else [], dtype=np.float64)
+        self.segment_weights = np.asarray(
+            segment_weights if segment_weights is not None else np.ones(len(self.segment_durations)),
+            dtype=np.float64)
+        self.avg_segment_duration = float(avg_segment_duration)
+        self.cutting_density = float(cutting_density)
+
+        self.object_counts = np.asarray(
+            object_counts if object_counts is not None else np.zeros(n), dtype=np.int64)
+        self.object_timestamps = np.asarray(
+            object_timestamps if object_timestamps is not None else [], dtype=np.float64)
+        self.object_weights = np.asarray(
+            object_weights if object_weights is not None else np.ones(len(self.object_timestamps)),
+            dtype=np.float64)
+        self.object_offsets = np.asarray(
+            object_offsets if object_offsets is not None else np.zeros(n + 1), dtype=np.int64)
+        self.object_durations = np.asarray(
+            object_durations if object_durations is not None else np.full(n, np.nan), dtype=np.float64)
+        self.object_transitions = np.asarray(
+            object_transitions if object_transitions is not None else np.zeros((n, n)),
+            dtype=np.int64).reshape(n, n)
+        self.important_objects = list(important_objects or [])
+
+    def __setstate__(self, state):
+        # 舊版快取中的風格沒有片段權重與檢測權重
+        self.__dict__.update(state)
+        if "segment_weights" not in state:
+            self.segment_weights = np.ones(len(self.segment_durations))
+        if "object_weights" not in state:
+            self.object_weights = np.ones(len(self.object_timestamps))
+
+    @property
+    def duration(self):
+        """範例影片總長度 (秒)"""
+        return self.frame_count / self.fps if self.fps > 0 else 0
+
+    @classmethod
+    def from_app(cls, app, fps=0.0, frame_count=0):
+        """從應用程式 (或 HeadlessSession) 的分析結果屬性建立風格"""
+        names = list(app.example_objects.keys())
+        index = {name: i for i, name in enumerate(names)}
+
+        counts = [app.example_objects[name][0] for name in names]
+        timestamp_lists = [app.example_objects[name][2] for name in names]
+        offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(timestamps) for timestamps in timestamp_lists])
+        timestamps = np.concatenate([np.asarray(ts, dtype=np.float64) for ts in timestamp_lists]) \
+            if timestamp_lists else np.zeros(0)
+        object_weights = np.concatenate([app.example_objects.weights(name) for name in names]) \
+            if names else np.zeros(0)
+
+        durations = np.full(len(names), np.nan)
+        for name, value in app.object_durations.items():
+            if name in index:
+                durations[index[name]] = value
+
+        transitions = np.zeros((len(names), len(names)), dtype=np.int64)
+        for (prev_obj, curr_obj), count in app.object_transitions.items():
+            if prev_obj in index and curr_obj in index:
+                transitions[index[prev_obj], index[curr_obj]] = count
+
+        return cls(
+            cut_points=app.cut_points, fps=fps, frame_count=frame_count,
+            segment_durations=app.segment_durations,
+            segment_weights=getattr(app, "segment_weights", None),
+            avg_segment_duration=app.avg_segment_duration,
+            cutting_density=app.cutting_density,
+            object_names=names, object_counts=counts,
+            object_timestamps=timestamps, object_offsets=offsets, object_weights=object_weights,
+            object_durations=durations, object_transitions=transitions,
+            important_objects=app.important_objects
+        )
+
+    @classmethod
+    def aggregate(cls, profiles, weights=None, top_objects=5):
+        """將多部範例影片的風格合併為一個風格
+
+        weights 為每部影片的權重 (預設都是 1)。每部影片的片段時長分佈合計佔該影片的權重，
+        平均片段時長、剪輯密度與物件平均展示時長都是各影片的加權平均 (物件只計入有資料的影片)，
+        物件出現次數與轉場次數直接相加，重要物件依加權出現次數選出。
+        剪輯點與物件時間戳依影片順序串接在同一條時間軸上 (以第一部影片的幀率換算幀號)。
+        """
+        profiles = list(profiles)
+        if not profiles:
+            raise ValueError("沒有可合併的風格")
+        weights = np.ones(len(profiles)) if weights is None else np.asarray(weights, dtype=np.float64)
+        if len(weights) != len(profiles) or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError("風格權重必須與風格數量相同且不全為 0")
+        if len(profiles) == 1:
+            return profiles[0]
+
+        fps = next((p.fps for p in profiles if p.fps > 0), 0.0)
+        names = []
+        for profile in profiles:
+            names.extend(name for name in profile.object_names if name not in names)
+        index = {name: i for i, name in enumerate(names)}
+        n = len(names)
+
+        # 片段時長: 每部影片的片段平分該影片的權重
+        segment_durations = []
+        segment_weights = []
+        for profile, weight in zip(profiles, weights):
+            total = profile.segment_weights.sum()
+            if len(profile.segment_durations) and total > 0:
+                segment_durations.append(profile.segment_durations)
+                segment_weights.append(profile.segment_weights * (weight / total))
+        segment_durations = np.concatenate(segment_durations) if segment_durations else np.zeros(0)
+        segment_weights = np.concatenate(segment_weights) if segment_weights else np.zeros(0)
+        if segment_weights.sum() > 0:
+            avg_segment_duration = float(np.average(segment_durations, weights=segment_weights))
+        else:
+            avg_segment_duration = float(np.average([p.avg_segment_duration for p in profiles], weights=weights))
+        cutting_density = float(np.average([p.cutting_density for p in profiles], weights=weights))
+
+        # 物件統計: 依合併後的物件順序累加
+        counts = np.zeros(n, dtype=np.int64)
+        weighted_counts = np.zeros(n)
+        duration_sums = np.zeros(n)
+        duration_weights = np.zeros(n)
+        transitions = np.zeros((n, n), dtype=np.int64)
+        timestamp_lists = [[] for _ in range(n)]
+        weight_lists = [[] for _ in range(n)]
+        cut_points = []
+        offset = 0.0
+        for profile, weight in zip(profiles, weights):
+            columns = np.array([index[name] for name in profile.object_names], dtype=np.int64)
+            if len(columns):
+                counts[columns] += profile.object_counts
+                weighted_counts[columns] += weight * profile.object_counts
+                known = ~np.isnan(profile.object_durations)
+                duration_sums[columns[known]] += weight * profile.object_durations[known]
+                duration_weights[columns[known]] += weight
+                transitions[np.ix_(columns, columns)] += profile.object_transitions
+                for i, name in zip(columns, profile.object_names):
+                    timestamp_lists[i].append(profile.timestamps_for(name) + offset)
+                    weight_lists[i].append(profile.weights_for(name))
+            if profile.fps > 0:
+                cut_points.append(np.round((profile.cut_points / profile.fps + offset) * fps))
+            offset += profile.duration
+
+        timestamps = [np.concatenate(ts) if ts else np.zeros(0) for ts in timestamp_lists]
+        object_weights = [np.concatenate(w) if w else np.zeros(0) for w in weight_lists]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(ts) for ts in timestamps])
+        durations = np.full(n, np.nan)
+        known = duration_weights > 0
+        durations[known] = duration_sums[known] / duration_weights[known]
+        order = np.argsort(-weighted_counts, kind="stable")[:top_objects]
+
+        return cls(
+            cut_points=np.concatenate(cut_points) if cut_points else None,
+            fps=fps, frame_count=int(round(offset * fps)),
+            segment_durations=segment_durations, segment_weights=segment_weights,
+            avg_segment_duration=avg_segment_duration, cutting_density=cutting_density,
+            object_names=names, object_counts=counts,
+            object_timestamps=np.concatenate(timestamps) if n else None, object_offsets=offsets,
+            object_weights=np.concatenate(object_weights) if n else None,
+            object_durations=durations, object_transitions=transitions,
+            important_objects=[names[i] for i in order if counts[i] > 0]
+        )
+
+    def timestamps_for(self, name):
+        """某類物件被檢測到的時間戳陣列"""
+        i = self.object_names.index(name)
+        return self.object_timestamps[self.object_offsets[i]:self.object_offsets[i + 1]]
+
+    def weights_for(self, name):
+        """與 timestamps_for(name) 對應的檢測權重陣列"""
+        i = self.object_names.index(name)
+        return self.object_weights[self.object_offsets[i]:self.object_offsets[i + 1]]
+
+    def object_duration_map(self):
+        """每類物件的平均展示時長 {物件: 秒}，不包含沒有資料的物件"""
+        return {
+            name: float(value)
+            for name, value in zip(self.object_names, self.object_durations)
+            if not np.isnan(value)
+        }
+
+    def transition_map(self):
+        """物件轉場次數 {(物件A, 物件B): 次數}"""
+        rows, cols = np.nonzero(self.object_transitions)
+        return {
+            (self.object_names[r], self.object_names[c]): int(self.object_transitions[r, c])
+            for r, c in zip(rows, cols)
+        }
+
+    def apply_to(self, app):
+        """將風格寫回應用程式屬性，供介面顯示與沿用既有流程"""
+        app.cut_points = [int(cut) for cut in self.cut_points]
+        app.segment_durations = [float(d) for d in self.segment_durations]
+        app.segment_weights = [float(w) for w in self.segment_weights]
+        app.avg_segment_duration = self.avg_segment_duration
+        app.cutting_density = self.cutting_density
+        app.example_objects = ObjectIndex()
+        for name in self.object_names:
+            app.example_objects.extend(name, self.timestamps_for(name), self.weights_for(name))
+        app.object_durations = self.object_duration_map()
+        app.object_transitions = self.transition_map()
+        app.important_objects = list(self.important_objects)
+        app.example_duration = self.duration
+
+    def to_arrays(self):
+        """轉換為 {名稱: 陣列} 字典"""
+        return {
+            "version": np.array(self.FORMAT_VERSION),
+            "cut_points": self.cut_points,
+            "fps": np.array(self.fps),
+            "frame_count": np.array(self.frame_count),
+            "segment_durations": self.segment_durations,
+            "segment_weights": self.segment_weights,
+            "avg_segment_duration": np.array(self.avg_segment_duration),
+            "cutting_density": np.array(self.cutting_density),
+            "object_names": np.array(self.object_names, dtype=str),
+            "object_counts": self.object_counts,
+            "object_timestamps": self.object_timestamps,
+            "object_offsets": self.object_offsets,
+            "object_weights": self.object_weights,
+            "object_durations": self.object_durations,
+            "object_transitions": self.object_transitions,
+            "important_objects": np.array(self.important_objects, dtype=str),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """從 to_arrays() 格式的字典建立風格"""
+        version = int(arrays.get("version", cls.FORMAT_VERSION))
+        if version > cls.FORMAT_VERSION:
+            raise ValueError(f"不支援的風格檔版本: {version}")
+
+        return cls(
+            cut_points=arrays["cut_points"],
+            fps=float(arrays["fps"]),
+            frame_count=int(arrays["frame_count"]),
+            segment_durations=arrays["segment_durations"],
+            segment_weights=arrays.get("segment_weights"),
+            avg_segment_duration=float(arrays["avg_segment_duration"]),
+            cutting_density=float(arrays["cutting_density"]),
+            object_names=[str(name) for name in arrays["object_names"]],
+            object_counts=arrays["object_counts"],
+            object_timestamps=arrays["object_timestamps"],
+            object_offsets=arrays["object_offsets"],
+            object_weights=arrays.get("object_weights"),
+            object_durations=arrays["object_durations"],
+            object_transitions=arrays["object_transitions"],
+            important_objects=[str(name) for name in arrays["important_objects"]],
+        )
+
+    def save(self, path):
+        """依副檔名儲存為 .json，其他副檔名都以 .npz 格式寫入該檔名 (不另外加上 .npz)，返回寫入的路徑"""
+        if os.path.splitext(path)[1].lower() == ".json":
+            data = {}
+            for key, value in self.to_arrays().items():
+                value = value.tolist()
+                # JSON 沒有 NaN，以 null 表示
+                if key == "object_durations":
+                    value = [None if v != v else v for v in value]
+                data[key] = value
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        else:
+            # 傳入檔案物件時 NumPy 不會在檔名後面加上 .npz，load() 可以用同一個路徑讀取
+            with open(path, "wb") as f:
+                np.savez_compressed(f, **self.to_arrays())
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """讀取 save() 儲存的風格檔"""
+        if os.path.splitext(path)[1].lower() == ".json":
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            data["object_durations"] = [np.nan if v is None else v for v in data["object_durations"]]
+            return cls.from_arrays(data)
+
+        with np.load(path, allow_pickle=False) as data:
+            return cls.from_arrays({key: data[key] for key in data.files})
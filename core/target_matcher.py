@@ -0,0 +1,151 @@
+import cv2
+import numpy as np
+
+
+# 色相-飽和度直方圖的格數，與 extract_object_features 相同
+HUE_BINS = 30
+SATURATION_BINS = 32
+HIST_SIZE = HUE_BINS * SATURATION_BINS
+
+
+def hs_histograms(frame, boxes):
+    """一次計算多個檢測框的 HSV 色相-飽和度直方圖
+
+    boxes 為 (x1, y1, x2, y2) 列表 (或 N×4 陣列)。返回 (N×HIST_SIZE 的直方圖, 有效遮罩)，
+    直方圖與 extract_object_features 相同 (30×32 格，以 NORM_MINMAX 歸一化到 0~1)；
+    檢測框範圍為空時該列無效。每個區域的計數以 calcHist 寫入同一個陣列，
+    歸一化與之後的相關係數對所有列一次計算。
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4).astype(np.int64).tolist()
+    valid = np.zeros(len(boxes), dtype=bool)
+    hists = np.zeros((len(boxes), HIST_SIZE), dtype=np.float32)
+    for i, (x1, y1, x2, y2) in enumerate(boxes):
+        region = frame[y1:y2, x1:x2]
+        if region.size == 0 or region.ndim != 3:
+            continue
+        hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
+        hists[i] = cv2.calcHist([hsv], [0, 1], None, [HUE_BINS, SATURATION_BINS], [0, 180, 0, 256]).reshape(-1)
+        valid[i] = True
+
+    # 每列歸一化到 0~1 (與 cv2.normalize NORM_MINMAX 相同，最大值等於最小值時全為 0)
+    hists = hists.astype(np.float64)
+    low = hists.min(axis=1, keepdims=True)
+    span = hists.max(axis=1, keepdims=True) - low
+    hists = np.divide(hists - low, span, out=np.zeros_like(hists), where=span > 0)
+    return hists, valid
+
+
+def hist_correlations(hists, target_hist):
+    """每列直方圖與目標直方圖的相關係數 (與 cv2.compareHist HISTCMP_CORREL 相同)"""
+    target = np.asarray(target_hist, dtype=np.float64).reshape(-1)
+    scale = 1.0 / target.size
+    s1 = hists.sum(axis=1)
+    s11 = np.einsum("ij,ij->i", hists, hists)
+    s12 = hists @ target
+    s2 = target.sum()
+    s22 = target @ target
+    num = s12 - s1 * s2 * scale
+    denom = (s11 - s1 * s1 * scale) * (s22 - s2 * s2 * scale)
+    # 變異數為 0 時 OpenCV 返回 1
+    safe = np.abs(denom) > np.finfo(np.float64).eps
+    return np.where(safe, num / np.sqrt(np.where(safe, denom, 1.0)), 1.0)
+
+
+def _mean_color(frame, box):
+    """檢測框區域的平均顏色 (每隔 4 像素取樣)，範圍為空時返回 None"""
+    x1, y1, x2, y2 = box
+    region = frame[int(y1):int(y2):4, int(x1):int(x2):4]
+    if region.size == 0:
+        return None
+    return cv2.mean(region)[:3]
+
+
+class TargetMatcher:
+    """比對檢測框與目標物件的顏色特徵，並快取每個追蹤 ID 的相似度
+
+    同一幀中需要比對的檢測框一次計算直方圖與相關係數 (見 hs_histograms)。
+    追蹤模式下同一個追蹤 ID 的物件在接下來的檢測幀沿用快取的相似度，不重新計算；
+    快取的相似度隨幀數以 decay 衰減，衰減後不再超過 similarity_threshold (接近閾值的
+    匹配很快重新確認)、超過 max_age 幀、檢測框面積改變超過 max_area_change 倍，或區域的
+    平均顏色改變超過 max_color_change (例如剪輯點前後沿用了同一個追蹤 ID) 時重新計算。
+    超過 max_idle 幀沒有出現的追蹤 ID 從快取中移除；max_age 為 0 時不使用快取。
+
+    相似度與 compare_features(target_features, extract_object_features(區域)) 相同，
+    範圍為空的檢測框相似度為 0。
+    """
+
+    def __init__(self, target_features, similarity_threshold=0.6, decay=0.99, max_age=90, max_idle=90,
+                 max_area_change=2.0, max_color_change=16.0):
+        hist = target_features.get("color_hist") if target_features else None
+        self.target_hist = None if hist is None else np.asarray(hist, dtype=np.float64).reshape(-1)
+        self.similarity_threshold = similarity_threshold
+        self.decay = decay
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.max_area_change = max_area_change
+        self.max_color_change = max_color_change
+        self._cache = {}   # {追蹤 ID: [相似度, 計算時的幀號, 最後出現的幀號, 檢測框面積, 平均顏色]}
+
+        # 統計資訊
+        self.computed = 0
+        self.cached = 0
+
+    def similarities(self, frame_idx, frame, boxes, track_ids=None):
+        """返回每個檢測框 (x1, y1, x2, y2) 與目標物件的相似度陣列，track_ids 為對應的追蹤 ID"""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        result = np.zeros(len(boxes), dtype=np.float64)
+        if self.target_hist is None or len(boxes) == 0:
+            return result
+
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        if self.max_age <= 0:
+            track_ids = None
+        pending = []
+        colors = [None] * len(boxes)
+        for i in range(len(boxes)):
+            entry = self._cache.get(int(track_ids[i])) if track_ids is not None else None
+            if entry is not None:
+                colors[i] = _mean_color(frame, boxes[i])
+                if self._fresh(entry, frame_idx, areas[i], colors[i]):
+                    result[i] = entry[0]
+                    entry[2] = frame_idx
+                    self.cached += 1
+                    continue
+            pending.append(i)
+
+        if pending:
+            hists, valid = hs_histograms(frame, boxes[pending])
+            computed = np.where(valid, np.maximum(hist_correlations(hists, self.target_hist), 0), 0)
+            self.computed += len(pending)
+            for i, similarity in zip(pending, computed.tolist()):
+                result[i] = similarity
+                if track_ids is not None:
+                    color = colors[i] if colors[i] is not None else _mean_color(frame, boxes[i])
+                    self._cache[int(track_ids[i])] = [similarity, frame_idx, frame_idx, areas[i], color]
+
+        self._evict(frame_idx)
+        return result
+
+    def _fresh(self, entry, frame_idx, area, color):
+        """快取的相似度是否仍可沿用"""
+        similarity, computed_at, _, cached_area, cached_color = entry
+        age = frame_idx - computed_at
+        if age < 0 or age > self.max_age:
+            return False
+        if area <= 0 or cached_area <= 0 or max(area / cached_area, cached_area / area) > self.max_area_change:
+            return False
+        if color is None or cached_color is None or \
+                max(abs(a - b) for a, b in zip(color, cached_color)) > self.max_color_change:
+            return False
+        # 匹配的相似度衰減到閾值以下時重新確認；不匹配的物件維持不匹配
+        if similarity > self.similarity_threshold:
+            return similarity * self.decay ** age > self.similarity_threshold
+        return True
+
+    def _evict(self, frame_idx):
+        for track_id in [tid for tid, entry in self._cache.items() if frame_idx - entry[2] > self.max_idle]:
+            del self._cache[track_id]
+
+    @property
+    def stats(self):
+        return {"computed": self.computed, "cached": self.cached, "tracks": len(self._cache)}
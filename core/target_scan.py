@@ -0,0 +1,126 @@
+import numpy as np
+
+from core.object_index import ObjectIndex
+
+
+class TargetScan:
+    """目標影片的掃描結果，可重複用於選擇剪輯點
+
+    掃描 (解碼、場景差異、物件檢測與目標物件追蹤) 只需要進行一次；剪輯密度、
+    重要物件等參數改變時，以 plan_cuts() 在掃描結果上重新選擇剪輯點即可。
+
+    scene_changes 為依幀號排序的 [(幀號, 變化百分比)]，object_scenes 為
+    [(開始幀, 結束幀, 物件列表)]，target_object_occurrences 為目標物件出現的段落
+    [(開始幀, 結束幀)]；key 為掃描時的影片與參數，用於判斷掃描結果是否仍然有效。
+    video_path 為掃描的影片路徑。
+    """
+
+    def __init__(self, fps, frame_count, frames_read, scene_changes, object_scenes,
+                 target_object_occurrences=None, target_objects=None, target_object_timestamps=None,
+                 target_object_track_ids=None, tracker_active=False, key=None, video_path=None):
+        self.fps = float(fps)
+        self.frame_count = int(frame_count)
+        self.frames_read = int(frames_read)
+        self.scene_changes = sorted(scene_changes, key=lambda x: x[0])
+        self.object_scenes = list(object_scenes)
+        self.target_object_occurrences = list(target_object_occurrences or [])
+        self.target_objects = target_objects if target_objects is not None else ObjectIndex()
+        self.target_object_timestamps = list(target_object_timestamps or [])
+        self.target_object_track_ids = set(target_object_track_ids or ())
+        self.tracker_active = tracker_active
+        self.key = key
+        self.video_path = video_path
+
+        # 場景變化點的幀號與變化強度陣列，以 searchsorted 查詢區間內的變化點
+        self.change_frames = np.array([idx for idx, _ in self.scene_changes], dtype=np.int64)
+        self.change_scores = np.array([score for _, score in self.scene_changes], dtype=np.float64)
+
+    @property
+    def duration(self):
+        """目標影片總長度 (秒)"""
+        return self.frame_count / self.fps if self.fps > 0 else 0
+
+    def strongest_changes(self, start, end):
+        """(start, end) 區間內的場景變化點幀號，依變化強度由大到小排列 (強度相同時依幀號)"""
+        lo = np.searchsorted(self.change_frames, start, side="right")
+        hi = np.searchsorted(self.change_frames, end, side="left")
+        order = np.argsort(-self.change_scores[lo:hi], kind="stable")
+        return self.change_frames[lo:hi][order]
+
+    def apply_to(self, app):
+        """將目標影片的物件統計與目標物件追蹤結果寫入應用程式屬性"""
+        app.target_objects = self.target_objects
+        app.target_object_track_ids = set(self.target_object_track_ids)
+        app.target_object_timestamps = list(self.target_object_timestamps)
+
+
+def plan_cuts(scan, avg_segment_duration, cutting_density, important_objects, object_durations,
+              density_factor=1.0, min_interval=1.0):
+    """依剪輯風格在掃描結果上選擇剪輯點，返回剪輯點 (秒) 列表
+
+    不讀取影片也不修改 scan，可以在參數 (例如剪輯密度) 改變時直接重新計算。
+    object_durations 為 {物件: 平均展示時長 (秒)}，min_interval 為剪輯點最小間隔 (秒)。
+    """
+    fps = scan.fps
+    candidate_cuts = []
+
+    # 如果有特定目標物件，優先處理包含目標物件的片段
+    if scan.tracker_active:
+        for start_frame, end_frame in scan.target_object_occurrences:
+            # 將段落起始和結束點加入候選剪輯點
+            candidate_cuts.append(start_frame)
+            candidate_cuts.append(end_frame)
+
+            # 如果段落較長，在段落內部變化最顯著的點添加剪輯點
+            segment_duration = (end_frame - start_frame) / fps
+            if segment_duration > avg_segment_duration * 1.5:
+                segments_needed = int(segment_duration / avg_segment_duration)
+                if segments_needed > 1:
+                    internal_changes = scan.strongest_changes(start_frame, end_frame)
+                    candidate_cuts.extend(int(idx) for idx in internal_changes[:segments_needed - 1])
+
+    # 基於物件場景選擇剪輯點
+    for i, (start, end, objects) in enumerate(scan.object_scenes):
+        if any(obj in important_objects for obj in objects):
+            # 包含重要物件的場景，以範例影片中物件的展示時長作為理想時長
+            ideal_duration = 0
+            for obj in objects:
+                if obj in object_durations:
+                    ideal_duration = max(ideal_duration, object_durations[obj])
+            if ideal_duration == 0:
+                ideal_duration = avg_segment_duration
+
+            # 場景太長時切分成適合長度的片段
+            actual_duration = (end - start) / fps
+            if actual_duration > ideal_duration * 1.5:
+                segments_needed = int(actual_duration / ideal_duration)
+                if segments_needed > 1:
+                    internal_changes = scan.strongest_changes(start, end)
+                    candidate_cuts.extend(int(idx) for idx in internal_changes[:segments_needed - 1])
+
+            # 場景結束是潛在剪輯點
+            candidate_cuts.append(end)
+        elif i > 0:
+            # 不包含重要物件的場景 (第一個場景除外)，僅考慮剪輯密度
+            candidate_cuts.append(end)
+
+    # 根據目標剪輯密度決定剪輯點數量，至少一個
+    target_density = cutting_density * density_factor
+    target_cuts_count = max(1, int((scan.duration / 60) * target_density))
+
+    # 排序並移除太近的剪輯點
+    candidate_cuts.sort()
+    min_frames = fps * min_interval
+    filtered_cuts = []
+    last_cut = -min_frames
+    for cut in candidate_cuts:
+        if cut - last_cut >= min_frames:
+            filtered_cuts.append(cut)
+            last_cut = cut
+
+    # 如果剪輯點太多，等距採樣選擇間隔分布最均勻的點
+    if len(filtered_cuts) > target_cuts_count:
+        indices = np.linspace(0, len(filtered_cuts) - 1, target_cuts_count, dtype=int)
+        filtered_cuts = [filtered_cuts[i] for i in indices]
+
+    return [cut / fps for cut in filtered_cuts]
@@ -0,0 +1,186 @@
+import cv2
+import numpy as np
+
+from core.frame_pipeline import rotate_frame
+
+
+class TemplateTracker:
+    """輕量的單一物件追蹤器: 在縮小的灰度圖上以模板匹配跟隨物件
+
+    每幀只在上一個位置附近的搜尋範圍內做一次 matchTemplate，匹配分數
+    (正規化相關係數) 作為追蹤可信度。模板固定為初始化時的畫面，
+    由檢測器定期重新初始化，不會累積漂移。沒有紋理 (灰度標準差低於 min_texture，
+    例如單色物件只剩壓縮雜訊) 的區域無法可靠地計算相關係數，不作為模板。
+    """
+
+    def __init__(self, margin=0.5, min_margin=8, min_texture=4.0):
+        self.margin = margin
+        self.min_margin = min_margin
+        self.min_texture = min_texture
+        self.template = None
+        self.box = None
+
+    def init(self, image, box):
+        """以 image 上的 (x, y, w, h) 初始化模板，範圍太小或沒有紋理時返回 False"""
+        height, width = image.shape[:2]
+        x, y, w, h = box
+        x1, y1 = max(0, int(x)), max(0, int(y))
+        x2, y2 = min(width, int(x + w)), min(height, int(y + h))
+        self.box = (x1, y1, x2 - x1, y2 - y1)
+        if x2 - x1 < 4 or y2 - y1 < 4 or cv2.meanStdDev(image[y1:y2, x1:x2])[1].max() < self.min_texture:
+            self.template = None
+            return False
+        self.template = image[y1:y2, x1:x2].copy()
+        return True
+
+    def update(self, image):
+        """在新的一幀中尋找物件，返回 ((x, y, w, h), 匹配分數)；無法計算分數時為 None"""
+        if self.template is None:
+            return self.box, None
+        height, width = image.shape[:2]
+        x, y, w, h = self.box
+        margin = max(self.min_margin, int(max(w, h) * self.margin))
+        sx1, sy1 = max(0, x - margin), max(0, y - margin)
+        sx2, sy2 = min(width, x + w + margin), min(height, y + h + margin)
+        if sx2 - sx1 < w or sy2 - sy1 < h:
+            return self.box, None
+
+        scores = cv2.matchTemplate(image[sy1:sy2, sx1:sx2], self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(scores)
+        if not np.isfinite(score):
+            return self.box, None
+        self.box = (sx1 + location[0], sy1 + location[1], w, h)
+        return self.box, float(score)
+
+
+class HybridTargetTracker:
+    """檢測器加輕量追蹤器，逐幀判斷目標物件是否出現
+
+    檢測器只在關鍵幀 (檢測排程選擇的幀) 執行，找到目標物件時以檢測框重新
+    初始化 TemplateTracker，關鍵幀之間由追蹤器在縮小的灰度圖上跟隨目標。
+    追蹤可信度低於 min_score 時以 detect(frame_idx, frame) 重新檢測，仍然找不到
+    才結束目標物件段落 (結束幀為追蹤失敗的第一幀)。重新檢測距離上一次檢測 (關鍵幀或
+    重新檢測) 至少 min_interval 幀，在那之前暫時維持段落；無法計算匹配分數 (例如
+    搜尋範圍超出畫面) 時不重新檢測，直接結束段落。檢測框沒有紋理、無法作為模板時
+    不追蹤，段落維持到下一個關鍵幀 (與只看關鍵幀時相同)。目標在關鍵幀重新出現時，
+    從關鍵幀往回追蹤暫存的縮圖，找出實際出現的第一幀。目標物件段落的起點和終點因此
+    精確到幀，而重新檢測最多每 min_interval 幀一次。
+
+    段落格式與逐關鍵幀判斷時相同: [(開始幀, 結束幀)]，結束幀為目標消失後的第一幀。
+    檢測框使用旋轉後的座標，rotation 為幀來源尚未套用的旋轉角度。
+    """
+
+    def __init__(self, detect=None, rotation=0, max_size=320, min_score=0.6, min_interval=5):
+        self.detect = detect
+        self.rotation = rotation % 360
+        self.max_size = max_size
+        self.min_score = min_score
+        self.min_interval = max(1, int(min_interval))
+
+        self.tracker = TemplateTracker()
+        self.occurrences = []
+        self._start = None      # 目前段落的開始幀，目標未出現時為 None
+        self._following = False
+        self._pending = []      # 上一個關鍵幀之後、目標未出現的幀 [(幀號, 縮圖)]
+        self._last_detect = None   # 最近一次檢測 (關鍵幀或重新檢測) 的幀號
+        self._lost = None          # 追蹤失敗、等待重新檢測的第一幀
+
+        # 統計資訊
+        self.stats = {"tracked_frames": 0, "redetections": 0, "skipped_redetections": 0,
+                      "backfilled_frames": 0}
+
+    @property
+    def present(self):
+        return self._start is not None
+
+    def _prepare(self, frame):
+        """縮小、旋轉並轉為灰度，返回 (縮圖, 縮放比例)"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.max_size / max(width, height))
+        if scale < 1.0:
+            frame = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return rotate_frame(frame, self.rotation), scale
+
+    def _seed(self, image, scale, box):
+        """以檢測框 (x1, y1, x2, y2) 初始化追蹤器"""
+        x1, y1, x2, y2 = box
+        self._following = self.tracker.init(image, (x1 * scale, y1 * scale, (x2 - x1) * scale, (y2 - y1) * scale))
+
+    def keyframe(self, frame_idx, frame, box):
+        """關鍵幀: box 為檢測器找到的目標物件檢測框 (沒有時為 None)"""
+        image, scale = self._prepare(frame)
+        self._last_detect = frame_idx
+        self._lost = None
+        if box is None:
+            self._following = False
+            self._end(frame_idx)
+        else:
+            self._seed(image, scale, box)
+            if not self.present:
+                self._start = self._backfill(image, frame_idx) if self._following else frame_idx
+        self._pending = []
+
+    def track(self, frame_idx, frame):
+        """關鍵幀之間的幀"""
+        image, scale = self._prepare(frame)
+        if not self.present:
+            # 目標可能在下一個關鍵幀之前就已出現，暫存縮圖供往回追蹤
+            self._pending.append((frame_idx, image))
+            return
+
+        # 檢測框無法作為模板時維持到下一個關鍵幀
+        if not self._following:
+            return
+
+        if self._lost is None:
+            _, score = self.tracker.update(image)
+            self.stats["tracked_frames"] += 1
+            if score is not None and score >= self.min_score:
+                return
+            if score is None or self.detect is None:
+                self._following = False
+                self._end(frame_idx)
+                return
+            self._lost = frame_idx
+
+        # 追蹤可信度下降: 距離上一次檢測不到 min_interval 幀時先等待
+        if self._last_detect is not None and frame_idx - self._last_detect < self.min_interval:
+            self.stats["skipped_redetections"] += 1
+            return
+
+        self.stats["redetections"] += 1
+        self._last_detect = frame_idx
+        box = self.detect(frame_idx, frame)
+        lost, self._lost = self._lost, None
+        if box is not None:
+            self._seed(image, scale, box)
+            return
+        self._following = False
+        self._end(lost)
+
+    def finish(self, frames_read):
+        """影片結束，返回目標物件段落"""
+        self._end(frames_read)
+        return self.occurrences
+
+    def _end(self, frame_idx):
+        if self._start is not None:
+            self.occurrences.append((self._start, frame_idx))
+            self._start = None
+
+    def _backfill(self, image, frame_idx):
+        """從關鍵幀往回追蹤暫存的縮圖，返回目標實際出現的第一幀"""
+        tracker = TemplateTracker()
+        if not tracker.init(image, self.tracker.box):
+            return frame_idx
+        start = frame_idx
+        for pending_idx, pending_image in reversed(self._pending):
+            _, score = tracker.update(pending_image)
+            if score is None or score < self.min_score:
+                break
+            start = pending_idx
+        self.stats["backfilled_frames"] += frame_idx - start
+        return start
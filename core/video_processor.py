@@ -1,18 +1,145 @@
+import copy
 import cv2
+import functools
+import hashlib
+import json
 import numpy as np
 import os
-from tkinter import messagebox
+
+from core.analysis_cache import AnalysisCache, file_fingerprint, model_identity
+from core.chunked_analysis import ChunkedAnalysisError, ChunkedAnalyzer
+from core.coarse_scan import CoarseToFineScanner
+from core.detection import (BatchDetector, SharedModel, class_ids, compare_features, detection_records,
+                            extract_object_features, find_target_box, load_object_model)
+from core.detection_schedule import DETECT, FixedScheduler, make_scheduler
+from core.frame_pipeline import FramePipeline, rotate_frame
+from core.frame_source import applied_rotation, open_frame_source
+from core.object_index import ObjectIndex
+from core.parallel_export import ParallelExportError, ParallelExporter
+from core.profiling import StageProfiler
+from core.progress import ProgressBridge, TkProgressPump
+from core.smart_render import SmartRenderError, SmartRenderer, build_audio_filter
+from core.style_profile import StyleProfile
+from core.target_matcher import TargetMatcher
+from core.target_scan import TargetScan, plan_cuts
+from core.target_tracker import HybridTargetTracker
+
+
+# 範例影片分析的場景變化閾值與物件檢測間隔 (每 5 幀檢測一次物件)
+EXAMPLE_SCENE_THRESHOLD = 35
+EXAMPLE_DETECTION_INTERVAL = 5
+
+
+class ExportError(Exception):
+    """導出影片失敗，訊息可直接顯示給使用者"""
+
 
 class VideoProcessor:
-    def __init__(self):
-        pass
+    def __init__(self, cache_dir=None):
+        # 範例影片分析結果的磁碟快取
+        self.analysis_cache = AnalysisCache(cache_dir)
+
+        # 解碼管線中每個佇列最多暫存的幀數
+        self.pipeline_queue_size = 16
+        # 最近一次分析的管線佇列佔用統計
+        self.last_pipeline_stats = {}
+        # 最近一次快速掃描的統計
+        self.last_scan_stats = {}
+        # 最近一次的目標影片掃描結果 (TargetScan)，調整剪輯參數時重複使用
+        self.last_target_scan = None
+        # 掃描結果鍵中計算較慢的部分: {絕對路徑: ((大小, 修改時間), 檔案指紋)} 與 (色彩直方圖, 雜湊)，
+        # 調整剪輯參數時不需要重新讀取影片或重新計算雜湊
+        self._fingerprints = {}
+        self._target_digest = (None, None)
+
+        # 場景變化檢測使用的灰度縮圖尺寸 (寬, 高)，None 表示原始解析度
+        self.scene_diff_size = (160, 90)
+
+        # 每次送入物件檢測模型的幀數
+        self.detection_batch_size = 8
+
+        # 分析時的解碼後端 ("opencv" 或 "ffmpeg")；ffmpeg 後端在解碼端把長邊縮小到
+        # decode_max_size 以內 (None 表示原始解析度)，decode_threads 為 0 時自動決定線程數
+        self.decode_backend = "opencv"
+        self.decode_max_size = 1280
+        self.decode_threads = 0
+
+        # 分段平行分析的進程數 (1 表示在目前進程逐幀分析)，以及工作進程建立檢測模型的
+        # 可序列化工廠 (None 時由 app.object_model 的權重檔路徑建立)
+        self.analysis_workers = 1
+        self.model_factory = None
+
+        # 只檢測這些類別 (類別名稱列表，目標物件類別會自動加入)，None 時檢測所有類別
+        self.detection_classes = None
+
+        # 自適應檢測排程: 依場景變化與畫面動態調整物件檢測的間隔 (預設使用固定間隔)；
+        # detection_budget 為每部影片檢測幀數的上限，以固定間隔檢測幀數的比例表示
+        self.adaptive_detection = False
+        self.detection_budget = 1.0
+        # 最近一次分析或掃描的檢測排程統計
+        self.last_schedule_stats = {}
+
+        # 逐幀掃描目標素材時，以輕量追蹤器在檢測幀之間跟隨目標物件 (段落邊界精確到幀)
+        self.hybrid_tracking = True
+        # 最近一次混合追蹤的統計
+        self.last_tracking_stats = {}
+
+        # 分階段計時 (預設停用)，最近一次分析或套用的報告
+        self.profiler = StageProfiler()
+        self.profile_report_path = None
+        self.last_profile_report = {}
+
+    def fork(self):
+        """返回設定相同的處理器，分析快取共用，計時與統計各自獨立
+
+        多個線程同時分析不同影片時每個線程使用自己的處理器，計時報告與統計不會互相混合。
+        計時報告不寫入 profile_report_path，由 last_profile_report 取得。
+        """
+        processor = copy.copy(self)
+        processor.profiler = StageProfiler(self.profiler.enabled)
+        processor.profile_report_path = None
+        processor.last_profile_report = {}
+        processor.last_pipeline_stats = {}
+        processor.last_scan_stats = {}
+        processor.last_schedule_stats = {}
+        processor.last_tracking_stats = {}
+        processor.last_target_scan = None
+        return processor
+
+    def analyze_example_video(self, video_path, app, use_object_detection=True, rotation=0, use_cache=True):
+        """分析範例影片的剪輯風格和物件特徵，結果寫入 app 並返回 StyleProfile"""
+        # 場景變化檢測閾值
+        threshold = EXAMPLE_SCENE_THRESHOLD
 
-    def analyze_example_video(self, video_path, app, use_object_detection=True, rotation=0):
-        """分析範例影片的剪輯風格和物件特徵"""
-        # 打開影片
-        cap = cv2.VideoCapture(video_path)
+        # 每隔幾幀進行物件檢測以提高速度
+        detection_interval = EXAMPLE_DETECTION_INTERVAL
+
+        # 檢查快取，相同檔案與參數直接還原結果 (檔案不存在或無法讀取時由下方打開影片時回報錯誤)
+        cache_key = None
+        if use_cache and self.analysis_cache is not None and os.path.isfile(video_path):
+            try:
+                cache_key = self.analysis_cache.make_key(
+                    video_path, self.analysis_params(app.object_model, use_object_detection, rotation))
+            except OSError:
+                cache_key = None
+        if cache_key is not None:
+            cached = self.analysis_cache.load(cache_key)
+            if isinstance(cached, StyleProfile):
+                cached.apply_to(app)
+                app.style_profile = cached
+                self.last_profile_report = {}
+                self._report(app, "analyze", 1.0, "已從快取載入分析結果")
+                return cached
+
+        # 打開影片 (不做物件檢測時只需要灰度幀)，分段分析的工作進程需要原始的旋轉角度
+        source_rotation = rotation
+        cap, rotation = self._open_source(video_path, rotation, gray=not use_object_detection)
         if not cap.isOpened():
             raise ValueError("無法打開範例影片")
+        self._reset_progress(app, "analyze")
+        self.last_schedule_stats = {}
+        if self.profiler.enabled:
+            self.profiler.reset()
 
         # 獲取影片信息
         fps = cap.get(cv2.CAP_PROP_FPS)
@@ -20,146 +147,118 @@ class VideoProcessor:
         total_duration = frame_count / fps if fps > 0 else 0
 
         # 重置物件統計
-        app.example_objects = {}
+        app.example_objects = ObjectIndex()
+        app.object_durations = {}
+        app.object_transitions = {}
         object_track = {}  # 用於追蹤物件 {object_id: {class_id, last_seen, duration}}
 
-        # 場景變化檢測閾值
-        threshold = 35
         min_scene_length = int(fps * 0.5)
 
         # 開始分析
-        prev_frame = None
-        frame_idx = 0
         app.cut_points = []  # 清空剪輯點列表
 
-        # 每隔幾幀進行物件檢測以提高速度
-        detection_interval = 5  # 每5幀檢測一次物件
-
         # 如果使用物件檢測，確保模型已加載
         if use_object_detection and app.object_model:
             # 禁用模型的詳細輸出
             app.object_model.verbose = False
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            # 應用旋轉
-            if rotation != 0:
-                if rotation == 90:
-                    frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-                elif rotation == 180:
-                    frame = cv2.rotate(frame, cv2.ROTATE_180)
-                elif rotation == 270:
-                    frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
-
-            # 轉換為灰度用於場景變化檢測
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-            # 物件檢測 (每隔幾幀)
-            if frame_idx % detection_interval == 0 and use_object_detection:
-                # 更新進度
-                progress = (frame_idx / frame_count) * 100
-                app.root.after(0, lambda p=progress: app.update_progress(f"分析進度: {p:.1f}%, 檢測物件中..."))
-
-                # 進行物件檢測
-                results = app.object_model(frame)
-
-                # 處理檢測結果
-                timestamp = frame_idx / fps
-                detected_objects = {}
-
-                for r in results:
-                    boxes = r.boxes
-                    for box in boxes:
-                        # 獲取類別、置信度和座標
-                        cls_id = int(box.cls[0])
-                        cls_name = app.object_model.names[cls_id]
-                        conf = float(box.conf[0])
-
-                        # 只考慮高置信度的檢測結果
-                        if conf > 0.5:
-                            if cls_name not in detected_objects:
-                                detected_objects[cls_name] = 1
-                            else:
-                                detected_objects[cls_name] += 1
+        # 影片夠長且設定了多個進程時分段平行分析
+        chunk_result = None
+        analyzer = self._chunked_analyzer(app, frame_count, fps, use_object_detection)
+        if analyzer is not None:
+            chunk_result = self._run_chunked(
+                app, "analyze", analyzer, video_path, fps, frame_count, use_object_detection,
+                change_threshold=threshold, detection_interval=detection_interval,
+                rotation=source_rotation, gray=not use_object_detection, schedule=self._schedule_options(threshold),
+                classes=self._detection_class_ids(app.object_model) if use_object_detection else None
+            )
 
-                            # 更新物件統計
-                            if cls_name not in app.example_objects:
-                                app.example_objects[cls_name] = [1, 0, [timestamp]]
-                            else:
-                                app.example_objects[cls_name][0] += 1
-                                app.example_objects[cls_name][2].append(timestamp)
-
-            # 場景變化檢測
-            if prev_frame is None:
-                prev_frame = gray
-                frame_idx += 1
-                continue
-
-            # 計算兩幀間的差異
-            diff = cv2.absdiff(prev_frame, gray)
-            _, diff = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
-
-            # 計算差異百分比
-            change_percentage = (np.count_nonzero(diff) * 100) / diff.size
-
-            # 如果變化超過閾值且與前一個剪輯點間隔足夠，標記為剪輯點
-            if change_percentage > threshold:
-                if not app.cut_points or (frame_idx - app.cut_points[-1]) > min_scene_length:
-                    time_point = frame_idx / fps
-                    app.cut_points.append(frame_idx)
-                    app.root.after(0, lambda: app.update_progress(f"檢測到剪輯點: {time_point:.2f}秒"))
-
-            prev_frame = gray
-            frame_idx += 1
-
-            # 每50幀更新進度
-            if frame_idx % 50 == 0 and frame_idx % detection_interval != 0:
-                progress = (frame_idx / frame_count) * 100
-                app.root.after(0, lambda p=progress: app.update_progress(f"分析進度: {p:.1f}%"))
-
-        # 計算每類物件的平均持續時間
+        if chunk_result is not None:
+            # 合併後的場景變化點依幀號順序篩選剪輯點，跨越區間邊界也與逐幀處理相同
+            scene_changes, records, _ = chunk_result
+            self._record_example_detections(app, records)
+            for frame_idx, _ in scene_changes:
+                self._add_cut_point(app, frame_idx, fps, min_scene_length)
+        else:
+            # 抽樣幀累積成批次後一次送入模型
+            detector = BatchDetector(app.object_model, self.detection_batch_size, profiler=self.profiler,
+                                     copy_frames=self._reuses_buffers(cap), rotation=rotation,
+                                     classes=self._detection_class_ids(app.object_model)) \
+                if use_object_detection else None
+            scheduler = self._detection_scheduler(detection_interval, fps, frame_count, threshold)
+
+            # 解碼與場景差異在獨立線程中進行，與物件檢測重疊執行
+            with FramePipeline(cap, rotation, self.pipeline_queue_size, self.scene_diff_size,
+                               profiler=self.profiler) as pipeline:
+                for frame_idx, frame, change_percentage in pipeline:
+                    # 物件檢測 (依檢測排程)
+                    if use_object_detection:
+                        if frame_idx % detection_interval == 0:
+                            # 更新進度
+                            progress = (frame_idx / frame_count) * 100
+                            self._report(app, "analyze", frame_idx / frame_count,
+                                         f"分析進度: {progress:.1f}%, 檢測物件中...", done=frame_idx)
+
+                        if scheduler.decide(frame_idx, change_percentage) == DETECT:
+                            # 加入批次，批次已滿時處理檢測結果
+                            outputs = detector.add(frame_idx, frame_idx / fps, frame)
+                            with self.profiler.stage("postprocess"):
+                                records = detection_records(outputs, app.object_model.names)
+                                self._record_example_detections(app, scheduler.resolve(records))
+
+                    # 第一幀沒有可比較的前一幀
+                    if change_percentage is None:
+                        continue
+
+                    # 如果變化超過閾值且與前一個剪輯點間隔足夠，標記為剪輯點
+                    if change_percentage > threshold:
+                        self._add_cut_point(app, frame_idx, fps, min_scene_length)
+
+                    # 每50幀更新進度
+                    if (frame_idx + 1) % 50 == 0 and (frame_idx + 1) % detection_interval != 0:
+                        progress = ((frame_idx + 1) / frame_count) * 100
+                        self._report(app, "analyze", (frame_idx + 1) / frame_count,
+                                     f"分析進度: {progress:.1f}%", done=frame_idx + 1)
+
+            self.last_pipeline_stats = pipeline.occupancy()
+
+            # 處理最後一個未滿的批次
+            if detector is not None:
+                with self.profiler.stage("postprocess"):
+                    records = detection_records(detector.flush(), app.object_model.names)
+                    self._record_example_detections(app, scheduler.resolve(records, final=True))
+                self.last_schedule_stats = scheduler.stats
+
+        # 計算每類物件的平均持續時間 (出現次數以檢測權重計算，見 ObjectIndex)
         for obj, (count, _, timestamps) in app.example_objects.items():
             # 如果該物件出現超過1次，計算平均間隔
-            if len(timestamps) > 1:
-                total_interval = timestamps[-1] - timestamps[0]
-                avg_duration = total_interval / (len(timestamps) - 1)
+            if len(timestamps) > 1 and count > 1:
+                total_interval = float(timestamps[-1] - timestamps[0])
+                avg_duration = total_interval / (count - 1)
                 app.object_durations[obj] = avg_duration
 
-        # 計算片段時長和物件關聯性
+        # 計算片段時長和物件關聯性 (單一範例影片的片段權重都是 1)
         app.segment_durations = []
+        app.segment_weights = None
 
         # 計算剪輯點間的物件轉場關係
         if len(app.cut_points) >= 2:
+            # 每個片段出現過的物件，以排序後的時間戳做範圍查詢
+            segment_objects = [
+                app.example_objects.classes_in_range(app.cut_points[i] / fps, app.cut_points[i + 1] / fps)
+                for i in range(len(app.cut_points) - 1)
+            ]
+
             for i in range(len(app.cut_points) - 1):
                 start_time = app.cut_points[i] / fps
                 end_time = app.cut_points[i + 1] / fps
                 duration = end_time - start_time
                 app.segment_durations.append(duration)
 
-                # 找出該片段的主要物件
-                segment_objects = []
-                for obj, (_, _, timestamps) in app.example_objects.items():
-                    for ts in timestamps:
-                        if start_time <= ts <= end_time:
-                            segment_objects.append(obj)
-                            break
-
                 # 記錄前後片段物件轉場關係
-                if i > 0 and segment_objects:
-                    prev_start = app.cut_points[i-1] / fps
-                    prev_end = start_time
-                    prev_objects = []
-                    for obj, (_, _, timestamps) in app.example_objects.items():
-                        for ts in timestamps:
-                            if prev_start <= ts <= prev_end:
-                                prev_objects.append(obj)
-                                break
-
-                    for prev_obj in prev_objects:
-                        for curr_obj in segment_objects:
+                if i > 0 and segment_objects[i]:
+                    for prev_obj in segment_objects[i - 1]:
+                        for curr_obj in segment_objects[i]:
                             key = (prev_obj, curr_obj)
                             if key not in app.object_transitions:
                                 app.object_transitions[key] = 1
@@ -191,41 +290,240 @@ class VideoProcessor:
 
         cap.release()
 
-    def apply_cutting_style(self, video_path, app, object_priority=0.7, density_factor=1.0):
-        """將分析出的剪輯風格應用到目標影片，支持目標物件追蹤"""
-        # 打開目標影片
-        cap = cv2.VideoCapture(video_path)
+        # 整理為風格設定並寫入快取
+        profile = StyleProfile.from_app(app, fps, frame_count)
+        app.style_profile = profile
+        if cache_key is not None:
+            self.analysis_cache.save(cache_key, profile)
+
+        self._finish_profile("analyze", video_path)
+        return profile
+
+    def _report(self, app, stage, fraction=None, message=None, done=None, force=False):
+        """回報進度: app 有 ProgressBridge 時發佈事件，否則排程更新狀態欄"""
+        with self.profiler.stage("progress"):
+            bridge = getattr(app, "progress", None)
+            if bridge is not None:
+                bridge.publish(stage, fraction, message, done, force)
+            elif message:
+                app.root.after(0, lambda: app.update_progress(message))
+
+    def _finish_profile(self, run, video_path):
+        """啟用效能分析時整理本次執行的報告，並在指定路徑時寫入 JSON"""
+        if not self.profiler.enabled:
+            return
+        metadata = {"run": run, "video": video_path, "pipeline": self.last_pipeline_stats}
+        if run == "apply" and self.last_scan_stats:
+            metadata["scan"] = self.last_scan_stats
+        if self.last_schedule_stats:
+            metadata["schedule"] = self.last_schedule_stats
+        if run == "apply" and self.last_tracking_stats:
+            metadata["tracking"] = self.last_tracking_stats
+        if self.profile_report_path:
+            self.last_profile_report = self.profiler.save(self.profile_report_path, **metadata)
+        else:
+            self.last_profile_report = self.profiler.report(**metadata)
+
+    def _open_source(self, video_path, rotation=0, gray=False):
+        """依解碼設定打開影片，返回 (幀來源, 還需要在 Python 端套用的旋轉角度)"""
+        # 兩個管線佇列、兩個工作線程和消費端同時持有的幀都需要各自的緩衝區
+        buffers = 2 * self.pipeline_queue_size + 4
+        cap = open_frame_source(video_path, self.decode_backend, rotation, self.decode_max_size, gray,
+                                buffers, self.decode_threads)
+        return cap, 0 if applied_rotation(cap) else rotation
+
+    def _reuses_buffers(self, cap):
+        """幀來源是否重複使用緩衝區 (需要保留的幀必須複製)"""
+        return not isinstance(cap, cv2.VideoCapture)
+
+    def _detection_class_ids(self, model, target_class=None):
+        """傳給模型的類別篩選 (類別 ID 列表)，None 時檢測所有類別"""
+        if self.detection_classes is None:
+            return None
+        classes = list(self.detection_classes)
+        if target_class and target_class not in classes:
+            classes.append(target_class)
+        return class_ids(model.names, classes)
+
+    def _detection_scheduler(self, detection_interval, fps, frame_count, scene_threshold):
+        """逐幀分析時使用的檢測排程"""
+        return make_scheduler(detection_interval, fps, frame_count, self._schedule_options(scene_threshold))
+
+    def _schedule_options(self, scene_threshold):
+        """自適應檢測排程的參數 (可序列化，傳給分段分析的工作進程)，固定間隔時返回 None"""
+        if not self.adaptive_detection:
+            return None
+        return {"budget": self.detection_budget, "scene_threshold": scene_threshold}
+
+    def analysis_params(self, object_model, use_object_detection=True, rotation=0):
+        """影響範例影片分析結果的參數與設定，用於分析快取鍵與風格庫判斷是否需要重新分析"""
+        return {
+            "rotation": rotation,
+            "detection_interval": EXAMPLE_DETECTION_INTERVAL,
+            "schedule": self._schedule_identity(),
+            "classes": self.detection_classes,
+            "threshold": EXAMPLE_SCENE_THRESHOLD,
+            "scene_diff_size": self.scene_diff_size,
+            "use_object_detection": bool(use_object_detection and object_model),
+            "model": model_identity(object_model if use_object_detection else None),
+            "decode": self._decode_identity()
+        }
+
+    def _schedule_identity(self):
+        """影響檢測幀選擇的設定，用於快取鍵"""
+        return ["adaptive", "weighted", self.detection_budget] if self.adaptive_detection else ["fixed"]
+
+    def _decode_identity(self):
+        """影響分析結果的解碼設定，用於快取鍵"""
+        if self.decode_backend == "opencv":
+            return None
+        return [self.decode_backend, self.decode_max_size]
+
+    def _model_factory(self, app):
+        """工作進程建立物件檢測模型的可序列化工廠，無法建立時返回 None"""
+        if self.model_factory is not None:
+            return self.model_factory
+        model = app.object_model
+        if isinstance(model, SharedModel):
+            model = model.wrapped
+        ckpt_path = getattr(model, "ckpt_path", None)
+        if ckpt_path and type(model).__module__.startswith("ultralytics"):
+            return functools.partial(load_object_model, ckpt_path)
+        return None
+
+    def _chunked_analyzer(self, app, frame_count, fps, use_object_detection=True):
+        """需要分段分析時返回 ChunkedAnalyzer，否則返回 None"""
+        if self.analysis_workers <= 1:
+            return None
+        if use_object_detection and self._model_factory(app) is None:
+            print("無法在工作進程中建立物件檢測模型，改為單一進程分析")
+            return None
+        analyzer = ChunkedAnalyzer(self.analysis_workers)
+        if len(analyzer.chunks(frame_count, fps)) < 2:
+            return None
+        return analyzer
+
+    def _run_chunked(self, app, stage, analyzer, video_path, fps, frame_count, use_object_detection=True,
+                     **options):
+        """以多個進程分段分析，返回 (場景變化點, 檢測紀錄, 已讀取幀數)，失敗時返回 None"""
+        def on_progress(done):
+            fraction = min(done / frame_count, 1.0)
+            self._report(app, stage, fraction,
+                         f"分段分析進度: {fraction * 100:.1f}% ({analyzer.workers} 個進程)", done=done)
+
+        try:
+            result = analyzer.analyze(
+                video_path, fps, frame_count,
+                model_factory=self._model_factory(app) if use_object_detection else None,
+                batch_size=self.detection_batch_size, queue_size=self.pipeline_queue_size,
+                scene_diff_size=self.scene_diff_size,
+                decode=(self.decode_backend, self.decode_max_size, self.decode_threads),
+                progress_callback=on_progress, **options
+            )
+        except (ChunkedAnalysisError, OSError) as e:
+            print(f"分段分析失敗，改為單一進程分析: {str(e)}")
+            return None
+
+        self.last_pipeline_stats = {"chunked": analyzer.stats}
+        return result
+
+    def _add_cut_point(self, app, frame_idx, fps, min_scene_length):
+        """與前一個剪輯點間隔足夠時，將場景變化點加入範例影片的剪輯點"""
+        if not app.cut_points or (frame_idx - app.cut_points[-1]) > min_scene_length:
+            app.cut_points.append(frame_idx)
+            self._report(app, "analyze", message=f"檢測到剪輯點: {frame_idx / fps:.2f}秒")
+
+    def _reset_progress(self, app, stage):
+        """重新開始某階段的速度與剩餘時間計算"""
+        bridge = getattr(app, "progress", None)
+        if bridge is not None:
+            bridge.reset(stage)
+
+    def _record_example_detections(self, app, records):
+        """將加上權重的檢測紀錄 (見 scheduler.resolve) 加入範例影片物件統計"""
+        for _, timestamp, classes, _, _, weight in records:
+            for cls_name in classes:
+                app.example_objects.add(cls_name, timestamp, weight)
+
+    def apply_cutting_style(self, video_path, app, object_priority=0.7, density_factor=1.0, fast_scan=False,
+                            profile=None):
+        """將分析出的剪輯風格應用到目標影片，支持目標物件追蹤
+
+        fast_scan 為 True 時使用兩階段掃描，只完整處理取樣幀和候選場景變化區間，
+        適合長時間的素材。
+        profile 為 StyleProfile 時直接使用該風格，否則使用 app 上的分析結果。
+        同一部影片以相同設定掃描過時沿用掃描結果，只重新選擇剪輯點。
+        """
+        scan = self.scan_target(video_path, app, fast_scan)
+
+        # 基於物件和場景變化選擇剪輯點
+        self._report(app, "apply", message="基於物件和場景變化選擇剪輯點...", force=True)
+        if scan.tracker_active and scan.target_object_occurrences:
+            self._report(app, "apply", message=f"發現目標物件出現 {len(scan.target_object_occurrences)} 次",
+                         force=True)
+        return self.plan_target_cuts(app, scan, density_factor, profile)
+
+    def plan_target_cuts(self, app, scan=None, density_factor=1.0, profile=None):
+        """在掃描結果上依剪輯風格選擇剪輯點，寫入 app.suggested_cuts 與 app.final_cuts
+
+        不讀取影片，可以在剪輯密度或重要物件改變時立即重新計算。
+        scan 為 None 時使用最近一次的掃描結果。使用者修改過最終剪輯點 (app.final_cuts_edited)
+        時只更新建議剪輯點，保留 app.final_cuts。
+        """
+        scan = scan or self.last_target_scan
+        if scan is None:
+            raise ValueError("尚未掃描目標素材")
+        if profile is None:
+            profile = StyleProfile.from_app(app)
+
+        app.suggested_cuts = plan_cuts(scan, profile.avg_segment_duration, profile.cutting_density,
+                                       profile.important_objects, profile.object_duration_map(), density_factor)
+
+        # 設置為最終剪輯點 (保留使用者的修改)
+        if not app.final_cuts_edited:
+            app.final_cuts = app.suggested_cuts.copy()
+        return app.suggested_cuts
+
+    def scan_target(self, video_path, app, fast_scan=False, use_cache=True):
+        """掃描目標影片 (場景變化、物件檢測與目標物件追蹤)，返回 TargetScan
+
+        結果保存在 last_target_scan；影片、旋轉角度、目標物件與掃描設定都相同時直接沿用。
+        """
+        key = self._target_scan_key(video_path, app, fast_scan)
+        if use_cache and self.cached_target_scan(video_path, app, fast_scan, key) is not None:
+            self.last_target_scan.apply_to(app)
+            self._report(app, "apply", 1.0, "沿用目標素材的掃描結果", force=True)
+            return self.last_target_scan
+
+        # 打開目標影片，解碼端已套用的旋轉不再重複處理
+        cap, rotation = self._open_source(video_path, app.target_rotation)
         if not cap.isOpened():
             raise ValueError("無法打開目標素材")
+        self._reset_progress(app, "apply")
+        self.last_schedule_stats = {}
+        if self.profiler.enabled:
+            self.profiler.reset()
 
         # 獲取影片信息
         fps = cap.get(cv2.CAP_PROP_FPS)
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        total_duration = frame_count / fps if fps > 0 else 0
 
         # 重置目標影片物件統計
-        app.target_objects = {}
-        app.target_object_track_ids = set()
-        app.target_object_timestamps = []
+        target_objects = ObjectIndex()
+        target_object_track_ids = set()
+        target_object_timestamps = []
 
         # 設置分析參數
         threshold = 35  # 場景變化檢測閾值
 
         # 開始分析
-        prev_frame = None
-        frame_idx = 0
-        app.suggested_cuts = []  # 清空建議剪輯點列表
         scene_changes = []  # 所有潛在的場景變化點
-        object_scenes = []  # 包含重要物件的場景 [(開始幀, 結束幀, 物件列表)]
+        frame_detections = []  # 每個檢測幀出現的物件 [(幀號, 物件集合)]
         target_object_occurrences = []  # 目標物件出現的段落 [(開始幀, 結束幀)]
 
         # 每隔幾幀進行物件檢測
         detection_interval = 10  # 每10幀檢測一次物件
 
-        # 當前場景的物件
-        current_scene_start = 0
-        current_scene_objects = set()
-
         # 使用 Ultralytics 追蹤功能
         tracker_active = app.target_object_features is not None
         target_similarity_threshold = 0.6  # 目標物件相似度閾值
@@ -239,314 +537,307 @@ class VideoProcessor:
         target_object_tracking = False
         target_object_start_frame = None
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                # 處理最後一個場景
-                if current_scene_objects and frame_idx > current_scene_start:
-                    object_scenes.append((current_scene_start, frame_idx, list(current_scene_objects)))
-
-                # 處理最後一個目標物件片段
-                if target_object_tracking and target_object_start_frame is not None:
-                    target_object_occurrences.append((target_object_start_frame, frame_idx))
-
-                break
-
-            # 應用旋轉
-            if app.target_rotation != 0:
-                if app.target_rotation == 90:
-                    frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-                elif app.target_rotation == 180:
-                    frame = cv2.rotate(frame, cv2.ROTATE_180)
-                elif app.target_rotation == 270:
-                    frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
-
-            # 轉換為灰度用於場景變化檢測
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-            # 物件檢測和追蹤 (每隔幾幀)
-            if frame_idx % detection_interval == 0:
-                # 更新進度
-                progress = (frame_idx / frame_count) * 100
-                app.root.after(0, lambda p=progress: app.update_progress(f"分析進度: {p:.1f}%, 檢測物件中..."))
-
-                # 進行物件檢測與追蹤
-                if tracker_active:
-                    # 使用追蹤功能
-                    results = app.object_model.track(frame, persist=True)
-                else:
-                    # 只進行檢測
-                    results = app.object_model(frame)
-
-                # 處理檢測和追蹤結果
-                timestamp = frame_idx / fps
-                frame_objects = set()
-                target_object_detected = False
-
-                for r in results:
-                    boxes = r.boxes
-                    for box in boxes:
-                        # 獲取類別、置信度和座標
-                        cls_id = int(box.cls[0])
-                        cls_name = app.object_model.names[cls_id]
-                        conf = float(box.conf[0])
-
-                        # 只考慮高置信度的檢測結果
-                        if conf > 0.5:
-                            # 加入該幀的物件集合
-                            frame_objects.add(cls_name)
-
-                            # 更新物件統計
-                            if cls_name not in app.target_objects:
-                                app.target_objects[cls_name] = [1, 0, [timestamp]]
-                            else:
-                                app.target_objects[cls_name][0] += 1
-                                app.target_objects[cls_name][2].append(timestamp)
-
-                            # 檢查是否是目標物件類型
-                            if target_object_class and cls_name == target_object_class:
-                                # 獲取物件區域
-                                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                                obj_region = frame[int(y1):int(y2), int(x1):int(x2)]
-
-                                if obj_region.size > 0:  # 確保區域有效
-                                    # 提取物件特徵
-                                    obj_features = self.extract_object_features(obj_region)
-
-                                    # 比較與目標物件的相似度
-                                    similarity = self.compare_features(
-                                        app.target_object_features,
-                                        obj_features
-                                    )
-
-                                    if similarity > target_similarity_threshold:
-                                        target_object_detected = True
+        # 抽樣幀累積成批次後一次送入模型 (追蹤模式逐幀處理)
+        detector = BatchDetector(app.object_model, self.detection_batch_size, track=tracker_active,
+                                 profiler=self.profiler, copy_frames=self._reuses_buffers(cap), rotation=rotation,
+                                 classes=self._detection_class_ids(app.object_model, target_object_class))
+
+        # 逐幀掃描時依檢測排程決定檢測幀 (快速掃描只看得到取樣幀，使用固定間隔)
+        scheduler = FixedScheduler(detection_interval) if fast_scan else \
+            self._detection_scheduler(detection_interval, fps, frame_count, threshold)
+
+        # 目標物件的顏色特徵比對，每個追蹤 ID 的相似度快取在整個掃描中沿用
+        matcher = TargetMatcher(app.target_object_features, target_similarity_threshold) \
+            if target_object_class else None
+
+        def to_records(outputs, final=False):
+            """將檢測和追蹤結果整理為加上權重的檢測紀錄 (final 為最後一個批次)"""
+            with self.profiler.stage("postprocess"):
+                return scheduler.resolve(detection_records(outputs, app.object_model.names, target_object_class,
+                                                           app.target_object_features, target_similarity_threshold,
+                                                           matcher=matcher), final)
+
+        def handle_detections(records):
+            """依幀順序處理檢測紀錄，更新物件統計與目標物件出現段落"""
+            nonlocal target_object_tracking, target_object_start_frame
+
+            for det_frame_idx, timestamp, classes, target_object_detected, track_ids, weight in records:
+                # 更新物件統計
+                for cls_name in classes:
+                    target_objects.add(cls_name, timestamp, weight)
+                target_object_track_ids.update(track_ids)
+                frame_detections.append((det_frame_idx, set(classes)))
+
+                # 記錄目標物件時間戳
+                if target_object_detected:
+                    target_object_timestamps.append(timestamp)
 
-                                        # 如果有追蹤ID，記錄它
-                                        if hasattr(box, 'id') and box.id is not None:
-                                            track_id = int(box.id)
-                                            app.target_object_track_ids.add(track_id)
+                # 混合追蹤時目標物件段落由追蹤器逐幀判斷
+                if hybrid is not None:
+                    continue
 
                 # 更新目標物件追蹤狀態
                 if target_object_detected:
-                    # 記錄目標物件時間戳
-                    app.target_object_timestamps.append(timestamp)
 
                     # 如果之前沒有追蹤，開始新的追蹤段落
                     if not target_object_tracking:
                         target_object_tracking = True
-                        target_object_start_frame = frame_idx
+                        target_object_start_frame = det_frame_idx
                 else:
                     # 如果之前在追蹤，結束追蹤段落
                     if target_object_tracking:
                         target_object_tracking = False
                         if target_object_start_frame is not None:
                             target_object_occurrences.append(
-                                (target_object_start_frame, frame_idx)
+                                (target_object_start_frame, det_frame_idx)
                             )
                             target_object_start_frame = None
 
-                # 更新當前場景物件
-                for obj in frame_objects:
-                    current_scene_objects.add(obj)
-
-            # 場景變化檢測
-            if prev_frame is None:
-                prev_frame = gray
-                frame_idx += 1
-                continue
-
-            # 計算兩幀間的差異
-            diff = cv2.absdiff(prev_frame, gray)
-            _, diff = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
-
-            # 計算差異百分比
-            change_percentage = (np.count_nonzero(diff) * 100) / diff.size
-
-            # 記錄所有潛在的場景變化點及其變化強度
-            if change_percentage > threshold / 2:
-                scene_changes.append((frame_idx, change_percentage))
-
-                # 如果變化強度足夠大，考慮結束當前場景並開始新場景
-                if change_percentage > threshold:
-                    # 確保場景足夠長
-                    if frame_idx - current_scene_start > fps * 0.5:
-                        # 存儲當前場景信息
-                        if current_scene_objects:
-                            object_scenes.append((current_scene_start, frame_idx, list(current_scene_objects)))
+        # 影片夠長且設定了多個進程時分段平行分析 (快速掃描除外)
+        chunk_result = None
+        analyzer = None if fast_scan else self._chunked_analyzer(app, frame_count, fps)
+
+        # 逐幀掃描時以檢測器加輕量追蹤器判斷目標物件 (分段與快速掃描只有檢測幀的結果)
+        hybrid = None
+        self.last_tracking_stats = {}
+        if tracker_active and target_object_class and self.hybrid_tracking and analyzer is None and not fast_scan:
+            # 重新檢測只做單幀推論，不經過 model.track，不影響追蹤器的 ID 狀態
+            redetector = BatchDetector(app.object_model, 1, profiler=self.profiler, rotation=rotation,
+                                       classes=self._detection_class_ids(app.object_model, target_object_class))
+
+            def redetect(idx, frame):
+                """追蹤可信度下降時在該幀重新檢測目標物件 (不計入物件統計)"""
+                for _, _, det_frame, results in redetector.add(idx, idx / fps, frame):
+                    found = find_target_box(det_frame, results, app.object_model.names, target_object_class,
+                                            app.target_object_features, target_similarity_threshold,
+                                            frame_idx=idx)
+                    return found[0] if found else None
+                return None
+
+            # 重新檢測最多每半個檢測間隔一次 (與檢測排程的最短間隔相同)
+            hybrid = HybridTargetTracker(redetect, rotation, min_interval=max(1, detection_interval // 2))
+        if analyzer is not None:
+            chunk_result = self._run_chunked(
+                app, "apply", analyzer, video_path, fps, frame_count,
+                change_threshold=threshold / 2, detection_interval=detection_interval,
+                rotation=app.target_rotation, track=tracker_active, target_class=target_object_class,
+                target_features=app.target_object_features, similarity_threshold=target_similarity_threshold,
+                schedule=self._schedule_options(threshold),
+                classes=self._detection_class_ids(app.object_model, target_object_class)
+            )
 
-                        # 開始新場景
-                        current_scene_start = frame_idx
-                        current_scene_objects = set()
+        if chunk_result is not None:
+            # 合併後依幀號順序整理，跨越區間邊界的目標物件段落與逐幀處理相同
+            scene_changes, records, frames_read = chunk_result
+            handle_detections(records)
+        elif fast_scan:
+            # 兩階段掃描: 取樣幀用於物件檢測和粗略比較，只回到候選區間逐幀計算
+            def on_sample(sample_idx, frame):
+                handle_detections(to_records(detector.add(sample_idx, sample_idx / fps, frame)))
+
+            def on_progress(sample_idx):
+                progress = (sample_idx / frame_count) * 100
+                self._report(app, "apply", sample_idx / frame_count,
+                             f"快速掃描進度: {progress:.1f}%, 檢測物件中...", done=sample_idx)
+
+            scanner = CoarseToFineScanner(detection_interval, threshold, self.scene_diff_size, rotation,
+                                          profiler=self.profiler)
+            scene_changes, frames_read = scanner.scan(cap, on_sample, on_progress)
+            self.last_scan_stats = scanner.stats
+
+            decoded_percent = scanner.stats["decoded_fraction"] * 100
+            elapsed = scanner.stats["elapsed"]
+            self._report(app, "apply", 1.0,
+                         f"快速掃描完成: 完整處理 {decoded_percent:.1f}% 的幀，耗時 {elapsed:.1f} 秒")
+        else:
+            # 解碼與場景差異在獨立線程中進行，與物件檢測重疊執行
+            frame_idx = -1
+            with FramePipeline(cap, rotation, self.pipeline_queue_size,
+                               self.scene_diff_size, profiler=self.profiler) as pipeline:
+                for frame_idx, frame, change_percentage in pipeline:
+                    if frame_idx % detection_interval == 0:
+                        # 更新進度
+                        progress = (frame_idx / frame_count) * 100
+                        self._report(app, "apply", frame_idx / frame_count,
+                                     f"分析進度: {progress:.1f}%, 檢測物件中...", done=frame_idx)
+
+                    # 物件檢測和追蹤 (依檢測排程)
+                    if scheduler.decide(frame_idx, change_percentage) == DETECT:
+                        # 加入批次，批次已滿時處理檢測結果
+                        outputs = detector.add(frame_idx, frame_idx / fps, frame)
+                        handle_detections(to_records(outputs))
+
+                        # 追蹤模式每幀立即返回結果，以檢測到的目標物件重新初始化追蹤器
+                        if hybrid is not None:
+                            with self.profiler.stage("tracking"):
+                                for det_idx, _, det_frame, results in outputs:
+                                    found = find_target_box(det_frame, results, app.object_model.names,
+                                                            target_object_class, app.target_object_features,
+                                                            target_similarity_threshold, matcher=matcher,
+                                                            frame_idx=det_idx)
+                                    hybrid.keyframe(frame_idx, frame, found[0] if found else None)
+                    elif hybrid is not None:
+                        with self.profiler.stage("tracking"):
+                            hybrid.track(frame_idx, frame)
+
+                    # 記錄所有潛在的場景變化點及其變化強度 (第一幀沒有可比較的前一幀)
+                    if change_percentage is not None and change_percentage > threshold / 2:
+                        scene_changes.append((frame_idx, change_percentage))
+
+                    # 每50幀更新進度
+                    if (frame_idx + 1) % 50 == 0 and (frame_idx + 1) % detection_interval != 0:
+                        progress = ((frame_idx + 1) / frame_count) * 100
+                        self._report(app, "apply", (frame_idx + 1) / frame_count,
+                                     f"分析進度: {progress:.1f}%", done=frame_idx + 1)
+
+            self.last_pipeline_stats = pipeline.occupancy()
+
+            # 已讀取的總幀數
+            frames_read = frame_idx + 1
+
+        # 處理最後一個未滿的批次
+        handle_detections(to_records(detector.flush(), final=True))
+        if chunk_result is None and not fast_scan:
+            self.last_schedule_stats = scheduler.stats
+
+        # 處理最後一個目標物件片段
+        if hybrid is not None:
+            target_object_occurrences = hybrid.finish(frames_read)
+            self.last_tracking_stats = hybrid.stats
+        elif target_object_tracking and target_object_start_frame is not None:
+            target_object_occurrences.append((target_object_start_frame, frames_read))
+        if matcher is not None and chunk_result is None:
+            self.last_tracking_stats = dict(self.last_tracking_stats, matching=matcher.stats)
+
+        # 依場景邊界整理包含物件的場景 [(開始幀, 結束幀, 物件列表)]
+        scene_starts = self._find_scene_starts(scene_changes, threshold, fps)
+        object_scenes = self._build_object_scenes(scene_starts, frame_detections, frames_read)
 
-            prev_frame = gray
-            frame_idx += 1
+        cap.release()
 
-            # 每50幀更新進度
-            if frame_idx % 50 == 0 and frame_idx % detection_interval != 0:
-                progress = (frame_idx / frame_count) * 100
-                app.root.after(0, lambda p=progress: app.update_progress(f"分析進度: {p:.1f}%"))
+        scan = TargetScan(fps, frame_count, frames_read, scene_changes, object_scenes, target_object_occurrences,
+                          target_objects, target_object_timestamps, target_object_track_ids, tracker_active, key,
+                          video_path)
+        scan.apply_to(app)
+        self.last_target_scan = scan
 
-        # 基於物件和場景變化選擇剪輯點
-        app.root.after(0, lambda: app.update_progress("基於物件和場景變化選擇剪輯點..."))
-
-        # 排序場景變化點
-        scene_changes.sort(key=lambda x: x[0])
-
-        # 應用範例影片剪輯風格到物件場景
-        candidate_cuts = []
-
-        # 如果有特定目標物件，優先處理包含目標物件的片段
-        if tracker_active and target_object_occurrences:
-            app.root.after(0, lambda: app.update_progress(f"發現目標物件出現 {len(target_object_occurrences)} 次"))
-
-            # 處理每個目標物件出現的段落
-            for start_frame, end_frame in target_object_occurrences:
-                # 將段落起始和結束點加入候選剪輯點
-                candidate_cuts.append(start_frame)
-                candidate_cuts.append(end_frame)
-
-                # 如果段落較長，考慮在段落內部添加剪輯點
-                segment_duration = (end_frame - start_frame) / fps
-
-                if segment_duration > app.avg_segment_duration * 1.5:
-                    # 在段落中找適合的切點
-                    internal_changes = [
-                        (idx, score) for idx, score in scene_changes
-                        if start_frame < idx < end_frame
-                    ]
-
-                    # 選擇變化最顯著的點
-                    internal_changes.sort(key=lambda x: x[1], reverse=True)
-
-                    # 添加適當數量的內部剪輯點
-                    segments_needed = int(segment_duration / app.avg_segment_duration)
-
-                    if segments_needed > 1 and internal_changes:
-                        for i in range(min(segments_needed - 1, len(internal_changes))):
-                            candidate_cuts.append(internal_changes[i][0])
-
-        # 基於物件場景選擇剪輯點
-        for i, (start, end, objects) in enumerate(object_scenes):
-            # 檢查是否有重要物件
-            has_important = any(obj in app.important_objects for obj in objects)
-
-            if has_important:
-                # 保留包含重要物件的場景
-                # 計算該場景的理想展示時長 (基於範例影片)
-                ideal_duration = 0
-                for obj in objects:
-                    if obj in app.object_durations:
-                        ideal_duration = max(ideal_duration, app.object_durations[obj])
-
-                if ideal_duration == 0:
-                    # 使用範例影片的平均片段時長
-                    ideal_duration = app.avg_segment_duration
-
-                # 實際場景時長
-                actual_duration = (end - start) / fps
-
-                # 如果場景太長，考慮切分
-                if actual_duration > ideal_duration * 1.5:
-                    # 在場景中找適合的切點
-                    scene_internal_changes = [
-                        (idx, score) for idx, score in scene_changes
-                        if start < idx < end
-                    ]
-
-                    # 選擇變化最顯著的點
-                    scene_internal_changes.sort(key=lambda x: x[1], reverse=True)
-
-                    # 切分成適合長度的片段
-                    segments_needed = int(actual_duration / ideal_duration)
-
-                    if segments_needed > 1 and scene_internal_changes:
-                        # 選擇top n-1個變化點作為剪輯點
-                        for j in range(min(segments_needed - 1, len(scene_internal_changes))):
-                            candidate_cuts.append(scene_internal_changes[j][0])
-
-                # 場景結束是潛在剪輯點
-                candidate_cuts.append(end)
-            else:
-                # 不包含重要物件的場景，僅考慮剪輯密度
-                if i > 0:  # 不是第一個場景
-                    # 考慮剪輯密度
-                    candidate_cuts.append(end)
+        self._finish_profile("apply", video_path)
+        return scan
 
-        # 根據目標剪輯密度過濾剪輯點
-        target_density = app.cutting_density * density_factor
-        target_cuts_count = int((total_duration / 60) * target_density)
+    def cached_target_scan(self, video_path, app, fast_scan=False, key=None):
+        """最近一次的掃描結果仍然適用 (影片與設定相同) 時返回該結果，否則返回 None"""
+        scan = self.last_target_scan
+        if scan is None or scan.video_path != video_path:
+            return None
+        if scan.key != (key or self._target_scan_key(video_path, app, fast_scan)):
+            return None
+        return scan
+
+    def _target_scan_key(self, video_path, app, fast_scan):
+        """影響掃描結果的影片與設定，用於判斷能否沿用掃描結果"""
+        features = app.target_object_features
+        target = None
+        if features is not None:
+            target = (features.get("class"), self._hist_digest(features.get("color_hist")))
+        return json.dumps({
+            "fingerprint": self._video_fingerprint(video_path),
+            "path": os.path.abspath(video_path),
+            "rotation": app.target_rotation,
+            "fast_scan": bool(fast_scan),
+            "target": target,
+            "model": model_identity(app.object_model),
+            "scene_diff_size": self.scene_diff_size,
+            "decode": self._decode_identity(),
+            "workers": self.analysis_workers,
+            "schedule": self._schedule_identity(),
+            "classes": self.detection_classes,
+            "hybrid_tracking": self.hybrid_tracking
+        }, sort_keys=True, default=str)
+
+    def _video_fingerprint(self, video_path):
+        """影片的檔案指紋，大小與修改時間沒有改變時沿用上次的結果；檔案不存在時返回 None"""
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        path = os.path.abspath(video_path)
+        state = (stat.st_size, stat.st_mtime_ns)
+        cached = self._fingerprints.get(path)
+        if cached is None or cached[0] != state:
+            cached = (state, file_fingerprint(video_path))
+            self._fingerprints[path] = cached
+        return cached[1]
+
+    def _hist_digest(self, hist):
+        """目標物件色彩直方圖的雜湊，同一個直方圖物件只計算一次"""
+        if hist is None:
+            return None
+        cached_hist, digest = self._target_digest
+        if cached_hist is not hist:
+            digest = hashlib.sha1(np.ascontiguousarray(hist).tobytes()).hexdigest()
+            self._target_digest = (hist, digest)
+        return digest
+
+    def _find_scene_starts(self, scene_changes, threshold, fps):
+        """從場景變化點找出每個場景的起始幀 (變化足夠大且場景長度超過0.5秒)"""
+        scene_starts = [0]
+        current_scene_start = 0
 
-        # 確保至少有一個剪輯點
-        if target_cuts_count < 1:
-            target_cuts_count = 1
+        for frame_idx, change_percentage in scene_changes:
+            # 如果變化強度足夠大，考慮結束當前場景並開始新場景
+            if change_percentage > threshold and frame_idx - current_scene_start > fps * 0.5:
+                current_scene_start = frame_idx
+                scene_starts.append(frame_idx)
 
-        # 排序和過濾剪輯點
-        candidate_cuts.sort()
+        return scene_starts
 
-        # 移除太近的剪輯點
-        min_interval = fps * 1.0  # 最小間隔1秒
-        filtered_cuts = []
-        last_cut = -min_interval
+    def _build_object_scenes(self, scene_starts, frame_detections, frames_read):
+        """依場景起始幀將檢測到的物件歸入場景
 
-        for cut in candidate_cuts:
-            if cut - last_cut >= min_interval:
-                filtered_cuts.append(cut)
-                last_cut = cut
+        場景 i 包含 (起始幀, 下一場景起始幀] 範圍內的檢測結果，第一個場景也包含第 0 幀，
+        與逐幀處理時先檢測物件再判斷場景變化的順序一致。只返回有物件的場景。
+        """
+        object_scenes = []
+        det_i = 0
 
-        # 如果剪輯點太多，選擇間隔分布最均勻的點
-        if len(filtered_cuts) > target_cuts_count:
-            # 使用等距採樣
-            indices = np.linspace(0, len(filtered_cuts) - 1, target_cuts_count, dtype=int)
-            filtered_cuts = [filtered_cuts[i] for i in indices]
+        for i, start in enumerate(scene_starts):
+            is_last = i == len(scene_starts) - 1
+            end = frames_read if is_last else scene_starts[i + 1]
 
-        # 轉換為秒
-        app.suggested_cuts = [cut / fps for cut in filtered_cuts]
+            scene_objects = set()
+            while det_i < len(frame_detections) and frame_detections[det_i][0] <= end:
+                scene_objects.update(frame_detections[det_i][1])
+                det_i += 1
 
-        # 設置為最終剪輯點
-        app.final_cuts = app.suggested_cuts.copy()
+            if scene_objects and (not is_last or end > start):
+                object_scenes.append((start, end, list(scene_objects)))
 
-        cap.release()
+        return object_scenes
 
     def compare_features(self, features1, features2):
         """比較兩個物件特徵的相似度"""
-        if features1 is None or features2 is None:
-            return 0
-
-        # 比較顏色直方圖
-        if 'color_hist' in features1 and 'color_hist' in features2:
-            similarity = cv2.compareHist(
-                features1['color_hist'],
-                features2['color_hist'],
-                cv2.HISTCMP_CORREL
-            )
-            return max(0, similarity)  # 確保相似度非負
-
-        return 0
+        return compare_features(features1, features2)
 
     def extract_object_features(self, image):
         """從物件圖像中提取特徵"""
-        if image.size == 0 or image.shape[0] == 0 or image.shape[1] == 0:
-            return None
-
-        # 轉換到HSV色彩空間
-        try:
-            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        except:
-            return None
+        return extract_object_features(image)
 
-        # 計算直方圖
-        hist = cv2.calcHist([hsv], [0, 1], None, [30, 32], [0, 180, 0, 256])
+    def _build_segments(self, cut_points, fps, frame_count):
+        """將剪輯點 (秒) 轉換為保留片段 [(開始幀, 結束幀)]，偶數段保留、奇數段剪掉"""
+        cut_frames = [int(cut * fps) for cut in cut_points]
+        cut_frames = [0] + cut_frames + [frame_count]
 
-        # 歸一化直方圖
-        cv2.normalize(hist, hist, 0, 1, cv2.NORM_MINMAX)
-
-        return {'color_hist': hist}
+        segments = []
+        for i in range(len(cut_frames) - 1):
+            if i % 2 == 0:
+                segments.append((cut_frames[i], cut_frames[i+1]))
+        return segments
 
     # 完整替換 export_video 函數，徹底避免 lambda 作用域問題
 
     def export_video(self, input_path, output_path, cut_points, app, progress_window, progress_var, percent_label):
         """導出最終剪輯影片，包含原始音頻"""
+        from tkinter import messagebox
 
         # 定義所有需要的回調函數，避免使用 lambda
         def show_error(message):
@@ -565,224 +856,289 @@ class VideoProcessor:
             """更新狀態欄"""
             app.status_var.set(message)
 
-        def update_progress(value):
-            """更新進度條"""
-            progress_var.set(value)
-            percent_label.config(text=f"{value}%")
+        def on_progress_event(event):
+            """在主線程更新進度條、剩餘時間與狀態欄"""
+            if event.fraction is not None:
+                value = int(event.fraction * 100)
+                progress_var.set(value)
+                text = f"{value}%"
+                if event.eta is not None:
+                    minutes, seconds = divmod(int(event.eta), 60)
+                    text += f" (剩餘 {minutes}:{seconds:02d})"
+                percent_label.config(text=text)
+            if event.message:
+                update_status(event.message)
+
+        # 工作線程只發佈事件，由主線程定期取出更新介面
+        bridge = ProgressBridge()
+        pump = TkProgressPump(app.root, bridge, on_progress_event)
+        pump.start()
 
         def finish_with_error(message):
             """錯誤完成處理"""
+            pump.stop()
             app.root.after(0, lambda: show_error(message))
 
         def finish_with_success(message, final_path):
             """成功完成處理"""
+            pump.stop()
             app.root.after(0, lambda: show_success(message))
             app.root.after(0, lambda: update_status(f"影片已導出至: {final_path}"))
 
-        # 正式執行導出
         try:
-            import os
-            import subprocess
-            import shutil
+            final_path = self.render_output(
+                input_path, output_path, cut_points, app.target_rotation,
+                progress_callback=lambda value: bridge.publish("export", value / 100),
+                status_callback=lambda message: bridge.publish("export", message=message, force=True)
+            )
+        except ExportError as e:
+            return finish_with_error(str(e))
+        except Exception as e:
+            return finish_with_error(f"導出過程中發生錯誤: {str(e)}")
 
-            # 檢查輸出目錄
-            output_dir = os.path.dirname(output_path)
-            if output_dir and not os.path.exists(output_dir):
-                try:
-                    os.makedirs(output_dir)
-                except Exception as e:
-                    return finish_with_error(f"無法創建輸出目錄: {str(e)}")
+        return finish_with_success("影片導出成功！", final_path)
 
-            # 確認可寫入
-            try:
-                temp_test_file = output_path + ".test"
-                with open(temp_test_file, 'w') as f:
-                    f.write("test")
-                os.remove(temp_test_file)
-            except Exception as e:
-                return finish_with_error(f"輸出路徑不可寫: {str(e)}")
+    def render_output(self, input_path, output_path, cut_points, rotation=0,
+                      progress_callback=None, status_callback=None, rotation_metadata=True):
+        """輸出剪輯影片，不依賴任何介面元件
 
-            # 檢查剪輯點
-            if not cut_points:
-                return finish_with_error("沒有設定剪輯點")
+        progress_callback(百分比) 接收 0 到 100 的整數，status_callback(訊息) 接收狀態文字。
+        rotation_metadata 為 True 且 ffmpeg 可用時，旋轉以顯示矩陣寫入輸出檔，不逐幀旋轉。
+        失敗時拋出 ExportError，成功時返回輸出路徑。
+        """
+        import subprocess
+        import shutil
 
-            # 打開影片
-            cap = cv2.VideoCapture(input_path)
-            if not cap.isOpened():
-                return finish_with_error("無法打開目標素材")
+        def update_status(message):
+            if status_callback:
+                status_callback(message)
 
-            # 獲取影片信息
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        def update_progress(value):
+            if progress_callback:
+                progress_callback(value)
 
-            # 創建臨時檔案
-            temp_output = output_path + ".temp.mp4"
-            if os.path.exists(temp_output):
-                try:
-                    os.remove(temp_output)
-                except Exception as e:
-                    return finish_with_error(f"無法刪除已存在的臨時文件: {str(e)}")
-
-            # 建立檔案寫入器
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(temp_output, fourcc, fps, (width, height))
-            if not out.isOpened():
-                return finish_with_error("無法創建輸出視頻文件")
-
-            # 處理剪輯點
-            cut_frames = [int(cut * fps) for cut in cut_points]
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            cut_frames = [0] + cut_frames + [frame_count]
-
-            # 建立片段
-            segments = []
-            for i in range(len(cut_frames) - 1):
-                if i % 2 == 0:
-                    segments.append((cut_frames[i], cut_frames[i+1]))
-
-            # 計算總幀數
-            total_frames_to_process = sum(end - start for start, end in segments)
-            if total_frames_to_process <= 0:
-                cap.release()
-                return finish_with_error("沒有要處理的視頻幀")
-
-            # 處理視頻
-            app.root.after(0, lambda: update_status("正在處理視頻幀..."))
-            processed_frames = 0
-
-            for start, end in segments:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, start)
-                for frame_idx in range(start, end):
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
-
-                    # 應用旋轉
-                    if app.target_rotation != 0:
-                        if app.target_rotation == 90:
-                            frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-                        elif app.target_rotation == 180:
-                            frame = cv2.rotate(frame, cv2.ROTATE_180)
-                        elif app.target_rotation == 270:
-                            frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
-
-                    # 寫入幀
-                    out.write(frame)
-
-                    # 更新進度
-                    processed_frames += 1
-                    progress = int((processed_frames / total_frames_to_process) * 80)
-                    app.root.after(0, lambda p=progress: update_progress(p))
-
-                    # 更新UI
-                    if processed_frames % 10 == 0:
-                        app.root.update_idletasks()
-
-            # 釋放資源
-            cap.release()
-            out.release()
+        # 檢查輸出目錄
+        output_dir = os.path.dirname(output_path)
+        if output_dir and not os.path.exists(output_dir):
+            try:
+                os.makedirs(output_dir)
+            except Exception as e:
+                raise ExportError(f"無法創建輸出目錄: {str(e)}")
 
-            # 檢查臨時檔案
-            if not os.path.exists(temp_output) or os.path.getsize(temp_output) == 0:
-                return finish_with_error("視頻處理失敗，臨時文件創建失敗")
+        # 確認可寫入
+        try:
+            temp_test_file = output_path + ".test"
+            with open(temp_test_file, 'w') as f:
+                f.write("test")
+            os.remove(temp_test_file)
+        except Exception as e:
+            raise ExportError(f"輸出路徑不可寫: {str(e)}")
+
+        # 檢查剪輯點
+        if not cut_points:
+            raise ExportError("沒有設定剪輯點")
+
+        # 先輸出未旋轉的影片 (可以直接複製完整 GOP)，再以串流複製寫入顯示旋轉資訊
+        if rotation != 0 and rotation_metadata:
+            renderer = SmartRenderer()
+            if renderer.is_available():
+                base, ext = os.path.splitext(output_path)
+                unrotated_path = f"{base}.unrotated{ext or '.mp4'}"
+                self.render_output(input_path, unrotated_path, cut_points, 0, progress_callback, status_callback)
+                try:
+                    # 智慧輸出保留來源的顯示旋轉，與使用者設定的旋轉疊加
+                    base_rotation = renderer.display_rotation(unrotated_path)
+                    renderer.set_display_rotation(unrotated_path, output_path, (base_rotation + rotation) % 360)
+                    return output_path
+                except SmartRenderError as e:
+                    print(f"無法寫入旋轉資訊，改為逐幀旋轉: {str(e)}")
+                finally:
+                    if os.path.exists(unrotated_path):
+                        os.remove(unrotated_path)
 
-            # 處理音頻
-            app.root.after(0, lambda: update_status("處理音頻中..."))
-            app.root.after(0, lambda: update_progress(80))
+        # 打開影片
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            raise ExportError("無法打開目標素材")
 
-            # 確保輸出路徑不存在
-            if os.path.exists(output_path):
-                try:
-                    os.remove(output_path)
-                except Exception as e:
-                    return finish_with_error(f"無法刪除已存在的輸出文件: {str(e)}")
+        # 獲取影片信息
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-            # 檢查 ffmpeg
-            try:
-                subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            except (subprocess.SubprocessError, FileNotFoundError):
-                app.root.after(0, lambda: update_status("未檢測到ffmpeg，將輸出無聲影片"))
-                shutil.copy(temp_output, output_path)
+        # 建立要保留的片段
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        segments = self._build_segments(cut_points, fps, frame_count)
 
-                if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                    if os.path.exists(temp_output):
-                        try:
-                            os.remove(temp_output)
-                        except:
-                            pass
+        # 計算總幀數
+        total_frames_to_process = sum(end - start for start, end in segments)
+        if total_frames_to_process <= 0:
+            cap.release()
+            raise ExportError("沒有要處理的視頻幀")
 
-                    app.root.after(0, lambda: update_progress(100))
-                    return finish_with_success("影片導出成功！", output_path)
-                else:
-                    return finish_with_error("影片輸出失敗")
-
-            # 創建音頻處理命令
-            audio_filter = ""
-            for i, (start, end) in enumerate(segments):
-                if i > 0:
-                    audio_filter += ";"
-                start_time = start / fps
-                end_time = end / fps
-                if i == 0:
-                    audio_filter += f"[0:a]atrim=start={start_time}:end={end_time},asetpts=PTS-STARTPTS[a{i}]"
-                else:
-                    audio_filter += f"[0:a]atrim=start={start_time}:end={end_time},asetpts=PTS-STARTPTS[a{i}]"
-
-            # 連接音頻片段
-            if segments:
-                for i in range(len(segments)):
-                    audio_filter += f"[a{i}]"
-                audio_filter += f"concat=n={len(segments)}:v=0:a=1[outa]"
-
-                # FFmpeg 命令
-                cmd = [
-                    "ffmpeg",
-                    "-i", temp_output,
-                    "-i", input_path,
-                    "-filter_complex", audio_filter,
-                    "-map", "0:v",
-                    "-map", "[outa]",
-                    "-c:v", "copy",
-                    "-c:a", "aac",
-                    "-shortest",
-                    "-y",
-                    output_path
-                ]
-
-                # 執行 FFmpeg
+        # 優先使用智慧輸出: 直接複製完整 GOP，只重新編碼剪輯點附近的幀 (逐幀旋轉時無法直接複製)
+        if rotation == 0:
+            renderer = SmartRenderer()
+            if renderer.is_available():
                 try:
-                    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    stdout, stderr = process.communicate()
+                    renderer.render(
+                        input_path, output_path, segments,
+                        progress_callback=lambda fraction: update_progress(int(fraction * 95)),
+                        status_callback=update_status
+                    )
+                    cap.release()
+                    update_progress(100)
+                    return output_path
+                except SmartRenderError as e:
+                    print(f"智慧輸出失敗，改為逐幀重新編碼: {str(e)}")
+
+        # 其次將片段分配給多個進程平行重新編碼
+        exporter = ParallelExporter()
+        if exporter.is_available() and exporter.max_workers > 1:
+            try:
+                update_status("正在處理視頻幀...")
+                exporter.export(
+                    input_path, output_path, segments, fps, rotation,
+                    progress_callback=lambda fraction: update_progress(int(fraction * 95)),
+                    status_callback=update_status
+                )
+                cap.release()
+                update_progress(100)
+                return output_path
+            except (ParallelExportError, OSError) as e:
+                print(f"平行輸出失敗，改為單一進程輸出: {str(e)}")
+
+        # 創建臨時檔案
+        temp_output = output_path + ".temp.mp4"
+        if os.path.exists(temp_output):
+            try:
+                os.remove(temp_output)
+            except Exception as e:
+                cap.release()
+                raise ExportError(f"無法刪除已存在的臨時文件: {str(e)}")
+
+        # 建立檔案寫入器
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        # 旋轉 90/270 度時輸出寬高對調，否則寫入器會丟棄所有幀
+        if rotation in (90, 270):
+            width, height = height, width
+        out = cv2.VideoWriter(temp_output, fourcc, fps, (width, height))
+        if not out.isOpened():
+            cap.release()
+            raise ExportError("無法創建輸出視頻文件")
+
+        # 處理視頻
+        update_status("正在處理視頻幀...")
+        processed_frames = 0
+        last_progress = -1
+
+        for start, end in segments:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            for frame_idx in range(start, end):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                # 應用旋轉
+                if rotation != 0:
+                    frame = rotate_frame(frame, rotation)
+
+                # 寫入幀
+                out.write(frame)
+
+                # 更新進度 (百分比改變時才回報)
+                processed_frames += 1
+                progress = int((processed_frames / total_frames_to_process) * 80)
+                if progress != last_progress:
+                    update_progress(progress)
+                    last_progress = progress
+
+        # 釋放資源
+        cap.release()
+        out.release()
 
-                    if process.returncode != 0:
-                        app.root.after(0, lambda: update_status("音頻處理出錯，將輸出無聲影片"))
-                        print(f"FFmpeg錯誤: {stderr.decode('utf-8', errors='replace')}")
-                        shutil.copy(temp_output, output_path)
+        # 檢查臨時檔案
+        if not os.path.exists(temp_output) or os.path.getsize(temp_output) == 0:
+            raise ExportError("視頻處理失敗，臨時文件創建失敗")
 
-                    # 檢查輸出
-                    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-                        shutil.copy(temp_output, output_path)
+        # 處理音頻
+        update_status("處理音頻中...")
+        update_progress(80)
 
-                except Exception as e:
-                    app.root.after(0, lambda: update_status(f"音頻處理出錯: {str(e)}"))
-                    print(f"音頻處理錯誤: {str(e)}")
-                    shutil.copy(temp_output, output_path)
+        # 確保輸出路徑不存在
+        if os.path.exists(output_path):
+            try:
+                os.remove(output_path)
+            except Exception as e:
+                raise ExportError(f"無法刪除已存在的輸出文件: {str(e)}")
 
-            # 最終檢查
-            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                app.root.after(0, lambda: update_progress(100))
+        # 檢查 ffmpeg
+        try:
+            subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        except (subprocess.SubprocessError, FileNotFoundError):
+            update_status("未檢測到ffmpeg，將輸出無聲影片")
+            shutil.copy(temp_output, output_path)
 
-                # 清理臨時文件
+            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
                 if os.path.exists(temp_output):
                     try:
                         os.remove(temp_output)
-                    except Exception as e:
-                        print(f"刪除臨時文件失敗: {str(e)}")
+                    except:
+                        pass
 
-                return finish_with_success("影片導出成功！", output_path)
+                update_progress(100)
+                return output_path
             else:
-                return finish_with_error("影片輸出失敗")
+                raise ExportError("影片輸出失敗")
+
+        # 創建音頻處理命令 (音頻取自第二個輸入，即原始影片)
+        audio_filter = build_audio_filter(segments, fps, input_index=1)
+
+        # FFmpeg 命令
+        cmd = [
+            "ffmpeg",
+            "-i", temp_output,
+            "-i", input_path,
+            "-filter_complex", audio_filter,
+            "-map", "0:v",
+            "-map", "[outa]",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            "-shortest",
+            "-y",
+            output_path
+        ]
+
+        # 執行 FFmpeg
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            stdout, stderr = process.communicate()
+
+            if process.returncode != 0:
+                update_status("音頻處理出錯，將輸出無聲影片")
+                print(f"FFmpeg錯誤: {stderr.decode('utf-8', errors='replace')}")
+                shutil.copy(temp_output, output_path)
+
+            # 檢查輸出
+            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+                shutil.copy(temp_output, output_path)
 
         except Exception as e:
-            return finish_with_error(f"導出過程中發生錯誤: {str(e)}")
\ No newline at end of file
+            update_status(f"音頻處理出錯: {str(e)}")
+            print(f"音頻處理錯誤: {str(e)}")
+            shutil.copy(temp_output, output_path)
+
+        # 最終檢查
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            update_progress(100)
+
+            # 清理臨時文件
+            if os.path.exists(temp_output):
+                try:
+                    os.remove(temp_output)
+                except Exception as e:
+                    print(f"刪除臨時文件失敗: {str(e)}")
+
+            return output_path
+        else:
+            raise ExportError("影片輸出失敗")
@@ -4,11 +4,16 @@ from tkinter import filedialog, messagebox, ttk
 import threading
 import cv2
 
-from utils.image_utils import display_frame
+from core.style_library import StyleLibrary
+from core.style_profile import StyleProfile
 
 class AnalysisPage:
     def __init__(self, parent, app):
         self.app = app
+        # 範例影片資料夾的風格庫，保留各影片的分析結果，資料夾更新後只重新分析有變動的影片
+        self.style_library = StyleLibrary(app.video_processor)
+        # 預覽區顯示的範例影片幀號 (第一個有效幀)
+        self.example_preview_frame = 0
         self.frame = ttk.Frame(parent)
         self.setup_ui()
 
@@ -30,6 +35,9 @@ class AnalysisPage:
         self.example_video_label = ttk.Label(upload_frame, text="尚未選擇影片")
         self.example_video_label.grid(row=0, column=1, padx=5, pady=5, sticky="w")
 
+        self.folder_btn = ttk.Button(upload_frame, text="分析範例資料夾", command=self.analyze_example_folder)
+        self.folder_btn.grid(row=0, column=2, padx=5, pady=5, sticky="e")
+
         # 範例影片預覽區域
         preview_frame = ttk.LabelFrame(self.frame, text="範例影片預覽")
         preview_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
@@ -61,6 +69,13 @@ class AnalysisPage:
         )
         obj_checkbox.grid(row=0, column=1, padx=5, pady=5, sticky="w")
 
+        # 剪輯風格儲存與載入
+        self.save_style_btn = ttk.Button(control_frame, text="儲存風格", command=self.save_style_profile)
+        self.save_style_btn.grid(row=0, column=2, padx=5, pady=5, sticky="e")
+
+        self.load_style_btn = ttk.Button(control_frame, text="載入風格", command=self.load_style_profile)
+        self.load_style_btn.grid(row=0, column=3, padx=5, pady=5, sticky="e")
+
         # 分析結果區域
         result_frame = ttk.LabelFrame(self.frame, text="分析結果")
         result_frame.grid(row=3, column=0, sticky="ew", padx=10, pady=5)
@@ -110,16 +125,10 @@ class AnalysisPage:
         # 刷新框架，確保變更生效
         self.frame.update_idletasks()
 
-        # 如果有影片幀，重新顯示
-        if hasattr(self.app, 'example_cap') and self.app.example_cap is not None and self.app.example_cap.isOpened():
-            current_pos = self.app.example_cap.get(cv2.CAP_PROP_POS_FRAMES)
-            self.app.example_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, frame = self.app.example_cap.read()
-            if ret:
-                from utils.image_utils import display_frame
-                display_frame(frame, self.example_canvas, self.app.example_rotation)
-            # 恢復原來的播放位置
-            self.app.example_cap.set(cv2.CAP_PROP_POS_FRAMES, current_pos)
+        # 如果有影片幀，以預覽快取重新顯示 (不需要重新解碼)
+        if self.app.example_video_path:
+            self.app.preview_cache.show(self.example_canvas, self.app.example_video_path,
+                                        self.example_preview_frame, self.app.example_rotation, self.app.example_cap)
 
     def on_frame_configure(self, event):
         """處理框架大小變化事件"""
@@ -149,12 +158,18 @@ class AnalysisPage:
     def disable_buttons(self):
         """禁用頁面按鈕"""
         self.upload_btn.config(state=tk.DISABLED)
+        self.folder_btn.config(state=tk.DISABLED)
         self.analyze_btn.config(state=tk.DISABLED)
+        self.save_style_btn.config(state=tk.DISABLED)
+        self.load_style_btn.config(state=tk.DISABLED)
 
     def enable_buttons(self):
         """啟用頁面按鈕"""
         self.upload_btn.config(state=tk.NORMAL)
+        self.folder_btn.config(state=tk.NORMAL)
         self.analyze_btn.config(state=tk.NORMAL)
+        self.save_style_btn.config(state=tk.NORMAL)
+        self.load_style_btn.config(state=tk.NORMAL)
 
     def select_example_video(self):
         """選擇範例影片"""
@@ -169,15 +184,20 @@ class AnalysisPage:
             self.app.status_var.set(f"已選擇範例影片: {os.path.basename(file_path)}")
 
             # 嘗試打開影片並顯示第一幀
-            self.app.example_cap = cv2.VideoCapture(file_path)
+            if self.app.example_cap is not None:
+                self.app.example_cap.release()
+            self.app.example_cap = self.app.open_preview(file_path)
             if self.app.example_cap.isOpened():
                 # 循環嘗試獲取有效幀
                 valid_frame = False
-                for _ in range(10):  # 嘗試前10幀
+                for i in range(10):  # 嘗試前10幀
                     ret, frame = self.app.example_cap.read()
                     if ret and frame is not None and frame.size > 0:
                         valid_frame = True
-                        display_frame(frame, self.example_canvas)
+                        # 保存到預覽快取，之後縮放視窗時直接沿用
+                        self.example_preview_frame = i
+                        self.app.preview_cache.put(file_path, i, frame)
+                        self.app.preview_cache.show(self.example_canvas, file_path, i)
                         break
 
                 # 如果沒找到有效幀，顯示錯誤
@@ -190,10 +210,23 @@ class AnalysisPage:
                 fps = self.app.example_cap.get(cv2.CAP_PROP_FPS)
                 frame_count = int(self.app.example_cap.get(cv2.CAP_PROP_FRAME_COUNT))
                 self.app.example_duration = frame_count / fps if fps > 0 else 0
+
+                # 在背景建立預覽代理檔，完成後預覽改為讀取代理檔
+                self.app.example_proxy = None
+                self.app.request_proxy(file_path, self.on_proxy_ready)
             else:
                 messagebox.showerror("錯誤", "無法打開影片檔案")
                 self.app.status_var.set("無法打開影片檔案")
 
+    def on_proxy_ready(self, proxy):
+        """範例影片的預覽代理檔建立完成"""
+        if proxy.source_path != self.app.example_video_path:
+            return
+        if self.app.example_cap is not None:
+            self.app.example_cap.release()
+        self.app.example_cap = proxy.open()
+        self.app.example_proxy = proxy
+
     def analyze_example_video(self):
         """分析範例影片"""
         if not self.app.example_video_path:
@@ -226,7 +259,103 @@ class AnalysisPage:
             self.app.root.after(0, lambda: messagebox.showerror("錯誤", f"分析過程中發生錯誤: {str(e)}"))
         finally:
             self.app.root.after(0, lambda: self.app.enable_all_buttons())
-            self.app.root.after(0, lambda: self.app.status_var.set("分析完成"))
+            # 經由進度橋接發佈，確保不會被尚未取出的進度事件覆蓋
+            self.app.progress.publish("analyze", message="分析完成", force=True)
+
+    def analyze_example_folder(self):
+        """同時分析資料夾中的所有範例影片，合併為一個剪輯風格"""
+        folder = filedialog.askdirectory(title="選擇範例影片資料夾")
+        if not folder:
+            return
+
+        self.example_video_label.config(text=f"範例資料夾: {os.path.basename(folder)}")
+        self.app.status_var.set("正在分析範例影片資料夾...")
+        self.app.disable_all_buttons()
+
+        threading.Thread(target=self._analyze_folder_thread, args=(folder,)).start()
+
+    def _analyze_folder_thread(self, folder):
+        """在單獨線程中分析範例影片資料夾"""
+        # 各影片最近的完成比例，平均為整體進度
+        fractions = {}
+
+        def on_clip_progress(path, event):
+            if event.fraction is not None:
+                fractions[path] = event.fraction
+            fraction = sum(fractions.values()) / len(fractions) if fractions else None
+            self.app.progress.publish("analyze", fraction, f"{os.path.basename(path)}: {event.format()}")
+
+        try:
+            if self.app.object_model is None:
+                self.app.initialize_object_detection()
+
+            profile = self.style_library.analyze(
+                folder, self.app.object_model,
+                use_object_detection=self.object_analysis_var.get(),
+                rotation=self.app.example_rotation,
+                progress_callback=on_clip_progress
+            )
+            profile.apply_to(self.app)
+            self.app.style_profile = profile
+            self.app.root.after(0, self.update_analysis_results)
+
+            stats = self.style_library.stats
+            message = (f"已合併 {stats['clips'] - stats['failed']} 部範例影片的風格 "
+                       f"(重新分析 {stats['analyzed']} 部，沿用 {stats['reused']} 部)")
+            if self.style_library.errors:
+                failed = ", ".join(os.path.basename(path) for path in self.style_library.errors)
+                self.app.root.after(0, lambda: messagebox.showwarning("警告", f"以下範例影片分析失敗: {failed}"))
+        except Exception as e:
+            message = "分析範例影片資料夾失敗"
+            error = str(e)
+            self.app.root.after(0, lambda: messagebox.showerror("錯誤", f"分析過程中發生錯誤: {error}"))
+        finally:
+            self.app.root.after(0, lambda: self.app.enable_all_buttons())
+
+        self.app.progress.publish("analyze", message=message, force=True)
+
+    def save_style_profile(self):
+        """將目前的剪輯風格 (包含已選擇的重要物件) 儲存為風格檔"""
+        profile = self.app.style_profile
+        if profile is None:
+            messagebox.showerror("錯誤", "請先分析範例影片或載入風格")
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            title="儲存剪輯風格",
+            defaultextension=".npz",
+            filetypes=(("風格檔", "*.npz"), ("JSON", "*.json"), ("所有檔案", "*.*"))
+        )
+        if not file_path:
+            return
+
+        try:
+            profile = StyleProfile.from_app(self.app, profile.fps, profile.frame_count)
+            profile.save(file_path)
+            self.app.style_profile = profile
+            self.app.status_var.set(f"已儲存剪輯風格: {os.path.basename(file_path)}")
+        except Exception as e:
+            messagebox.showerror("錯誤", f"儲存風格失敗: {str(e)}")
+
+    def load_style_profile(self):
+        """載入風格檔，取代範例影片分析結果"""
+        file_path = filedialog.askopenfilename(
+            title="載入剪輯風格",
+            filetypes=(("風格檔", "*.npz *.json"), ("所有檔案", "*.*"))
+        )
+        if not file_path:
+            return
+
+        try:
+            profile = StyleProfile.load(file_path)
+        except Exception as e:
+            messagebox.showerror("錯誤", f"載入風格失敗: {str(e)}")
+            return
+
+        profile.apply_to(self.app)
+        self.app.style_profile = profile
+        self.update_analysis_results()
+        self.app.status_var.set(f"已載入剪輯風格: {os.path.basename(file_path)}")
 
     def update_analysis_results(self):
         """更新分析結果顯示"""
@@ -380,4 +509,7 @@ class AnalysisPage:
             selected_text = "已選擇: " + ", ".join([self.app.get_chinese_name(obj) for obj in self.app.important_objects])
             self.selected_label.config(text=selected_text)
 
-            self.app.status_var.set(f"使用默認重要物件: {', '.join([self.app.get_chinese_name(obj) for obj in self.app.important_objects])}")
\ No newline at end of file
+            self.app.status_var.set(f"使用默認重要物件: {', '.join([self.app.get_chinese_name(obj) for obj in self.app.important_objects])}")
+
+        # 已掃描過目標素材時立即以新的重要物件重新選擇剪輯點
+        self.app.application_page.replan_cuts()
\ No newline at end of file
@@ -5,9 +5,16 @@ import threading
 
 from ui.analysis_page import AnalysisPage
 from ui.application_page import ApplicationPage
+from ui.diagnostics import DiagnosticsWindow
 from ui.output_page import OutputPage
+from core.detection import load_object_model
+from core.frame_source import open_frame_source
+from core.object_index import ObjectIndex
+from core.progress import ProgressBridge, TkProgressPump
+from core.proxy import ProxyBuilder
 from core.video_processor import VideoProcessor
 from utils.dialog import simpledialog
+from utils.frame_cache import PreviewCache
 
 class IntelligentVideoEditor:
     def __init__(self, root):
@@ -27,6 +34,12 @@ class IntelligentVideoEditor:
         self.example_cap = None
         self.target_cap = None
 
+        # 預覽代理檔 (VideoProxy)，建立完成後預覽改為讀取代理檔
+        self.example_proxy = None
+        self.target_proxy = None
+        # 目標素材預覽目前顯示的幀號 (原始影片的幀號)
+        self.target_preview_frame = 0
+
         self.example_duration = 0
         self.target_duration = 0
 
@@ -36,10 +49,13 @@ class IntelligentVideoEditor:
 
         # 初始化影片處理器
         self.video_processor = VideoProcessor()
+        self.proxy_builder = ProxyBuilder()
+        # 預覽區已顯示過的幀，縮放視窗或切換分頁時不需要重新解碼
+        self.preview_cache = PreviewCache()
 
         # 物件分析相關
-        self.example_objects = {}  # 存儲範例影片中的物件 {物件類別: [出現次數, 總時長, [時間戳列表]]}
-        self.target_objects = {}   # 存儲目標影片中的物件
+        self.example_objects = ObjectIndex()  # 存儲範例影片中的物件 {物件類別: (出現次數, 總時長, 時間戳陣列)}
+        self.target_objects = ObjectIndex()   # 存儲目標影片中的物件
         self.important_objects = []  # 使用者選定的重要物件
         self.object_model = None  # 物件檢測模型
 
@@ -56,15 +72,23 @@ class IntelligentVideoEditor:
         # 分析結果
         self.cut_points = []  # 範例影片的剪輯點
         self.segment_durations = []  # 範例影片的片段時長列表
+        self.segment_weights = None  # 片段時長的權重 (合併多部範例影片時使用)
         self.avg_segment_duration = 0  # 平均片段時長
         self.cutting_density = 0  # 剪輯密度 (每分鐘剪輯次數)
+        self.style_profile = None  # 分析或載入的剪輯風格 (StyleProfile)
 
         # 自動剪輯結果
         self.suggested_cuts = []  # 建議的剪輯點
         self.final_cuts = []  # 最終的剪輯點
+        self.final_cuts_edited = False  # 使用者是否在輸出頁修改過最終剪輯點
 
         # 設置UI
         self.create_ui()
+
+        # 工作線程的進度事件由主線程定期取出並顯示在狀態欄
+        self.progress = ProgressBridge()
+        self.progress_pump = TkProgressPump(root, self.progress, self.on_progress_event)
+        self.progress_pump.start()
         # 在短暫延遲後觸發一次佈局更新，確保所有分頁都正確初始化
         root.after(100, self.initialize_all_layouts)
 
@@ -129,6 +153,23 @@ class IntelligentVideoEditor:
         main_container.columnconfigure(0, weight=1)
         main_container.rowconfigure(0, weight=1)  # Notebook 可以擴展
         main_container.rowconfigure(1, weight=0)  # 狀態欄固定高度
+
+        # 選單列
+        menu_bar = tk.Menu(self.root)
+        tools_menu = tk.Menu(menu_bar, tearoff=0)
+        tools_menu.add_command(label="效能診斷", command=self.show_diagnostics)
+
+        # 解碼後端 (分析、套用與預覽共用)
+        self.decode_backend_var = tk.StringVar(value=self.video_processor.decode_backend)
+        decode_menu = tk.Menu(tools_menu, tearoff=0)
+        decode_menu.add_radiobutton(label="OpenCV", value="opencv", variable=self.decode_backend_var,
+                                    command=self.on_decode_backend_changed)
+        decode_menu.add_radiobutton(label="FFmpeg (解碼端縮放)", value="ffmpeg", variable=self.decode_backend_var,
+                                    command=self.on_decode_backend_changed)
+        tools_menu.add_cascade(label="解碼器", menu=decode_menu)
+        menu_bar.add_cascade(label="工具", menu=tools_menu)
+        self.root.config(menu=menu_bar)
+
         # 主框架
         main_frame = ttk.Notebook(self.root)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -213,23 +254,47 @@ class IntelligentVideoEditor:
         """更新進度信息"""
         self.status_var.set(message)
 
+    def on_progress_event(self, event):
+        """在主線程顯示進度事件"""
+        with self.video_processor.profiler.stage("ui_progress"):
+            self.status_var.set(event.format())
+
+    def on_decode_backend_changed(self):
+        """切換解碼後端，下次打開影片時生效"""
+        self.video_processor.decode_backend = self.decode_backend_var.get()
+        self.status_var.set(f"解碼器: {self.decode_backend_var.get()}")
+
+    def open_preview(self, path):
+        """以目前的解碼後端打開預覽用的影片"""
+        return open_frame_source(path, self.video_processor.decode_backend,
+                                 max_size=self.video_processor.decode_max_size, buffers=2)
+
+    def request_proxy(self, path, on_ready):
+        """在背景建立預覽代理檔，完成後在主線程呼叫 on_ready(VideoProxy)"""
+        proxy = self.proxy_builder.get(path)
+        if proxy is not None:
+            on_ready(proxy)
+            return
+
+        def done(proxy):
+            if proxy is not None:
+                self.root.after(0, lambda: on_ready(proxy))
+
+        self.proxy_builder.build_async(
+            path, done,
+            lambda fraction: self.progress.publish("proxy", fraction, f"建立預覽代理檔: {fraction * 100:.0f}%")
+        )
+
+    def show_diagnostics(self):
+        """打開效能診斷視窗"""
+        DiagnosticsWindow(self)
+
     def initialize_object_detection(self):
         """初始化物件檢測模型"""
         try:
             self.status_var.set("正在加載物件檢測模型...")
 
-            # 禁用自動更新檢查
-            import os
-            os.environ['ULTRALYTICS_SKIP_VERSION_CHECK'] = '1'
-            os.environ['YOLO_VERBOSE'] = 'False'
-
-            # 使用YOLOv5
-            from ultralytics import YOLO
-            # 禁用自動更新檢查
-            YOLO.checks = lambda *args, **kwargs: None
-            self.object_model = YOLO("yolov8n.pt")  # 使用較小的模型確保速度
-            # 禁用日誌輸出
-            self.object_model.verbose = False
+            self.object_model = load_object_model("yolov8n.pt")  # 使用較小的模型確保速度
 
             self.status_var.set("物件檢測模型加載完成")
         except Exception as e:
@@ -5,7 +5,6 @@ from tkinter import filedialog, messagebox, ttk
 
 import cv2
 from ui.target_selection import ObjectSelectionTool
-from utils.image_utils import display_frame
 
 
 class ApplicationPage:
@@ -59,6 +58,20 @@ class ApplicationPage:
         self.target_canvas = tk.Canvas(preview_frame, bg="black")
         self.target_canvas.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
 
+        # 拖動瀏覽素材 (代理檔建立完成後每一幀都可以直接跳轉)
+        scrub_frame = ttk.Frame(preview_frame)
+        scrub_frame.grid(row=1, column=0, sticky="ew", padx=5)
+        scrub_frame.columnconfigure(0, weight=1)
+
+        self.scrub_var = tk.DoubleVar(value=0)
+        self.scrub_scale = ttk.Scale(scrub_frame, from_=0, to=1, orient=tk.HORIZONTAL,
+                                     variable=self.scrub_var, command=self.on_scrub)
+        self.scrub_scale.grid(row=0, column=0, sticky="ew")
+
+        self.scrub_label = ttk.Label(scrub_frame, text="00:00.00")
+        self.scrub_label.grid(row=0, column=1, padx=5)
+        self._scrub_pending = False
+
         # ==== 應用剪輯風格區域 ====
         apply_frame = ttk.LabelFrame(self.content_frame, text="應用剪輯風格")
         apply_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=5)
@@ -121,7 +134,7 @@ class ApplicationPage:
             to=1.5,
             orient=tk.HORIZONTAL,
             variable=self.density_var,
-            command=self.update_estimated_duration
+            command=self.on_cut_settings_changed
         )
         self.density_scale.grid(row=0, column=1, padx=10, sticky="ew")
 
@@ -131,9 +144,18 @@ class ApplicationPage:
         self.estimated_time_label = ttk.Label(density_frame, text="預估輸出長度: 計算中...")
         self.estimated_time_label.grid(row=0, column=2, padx=10, sticky="e")
 
+        # --- 快速掃描選項 ---
+        self.fast_scan_var = tk.BooleanVar(value=False)
+        self.fast_scan_checkbox = ttk.Checkbutton(
+            apply_frame,
+            text="快速掃描 (適合長時間素材)",
+            variable=self.fast_scan_var
+        )
+        self.fast_scan_checkbox.grid(row=2, column=0, padx=10, pady=(5, 0), sticky="w")
+
         # --- 套用按鈕 ---
         self.apply_btn = ttk.Button(apply_frame, text="套用剪輯風格", command=self.apply_cutting_style)
-        self.apply_btn.grid(row=2, column=0, padx=5, pady=10)
+        self.apply_btn.grid(row=3, column=0, padx=5, pady=10)
 
         # --- 結果預覽 ---
         result_frame = ttk.LabelFrame(self.content_frame, text="剪輯預覽")
@@ -179,15 +201,7 @@ class ApplicationPage:
         self.frame.update_idletasks()
 
         # 如果有影片幀，重新顯示
-        if hasattr(self.app, 'target_cap') and self.app.target_cap is not None and self.app.target_cap.isOpened():
-            current_pos = self.app.target_cap.get(cv2.CAP_PROP_POS_FRAMES)
-            self.app.target_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, frame = self.app.target_cap.read()
-            if ret:
-                from utils.image_utils import display_frame
-                display_frame(frame, self.target_canvas, self.app.target_rotation)
-            # 恢復原來的播放位置
-            self.app.target_cap.set(cv2.CAP_PROP_POS_FRAMES, current_pos)
+        self.show_preview_frame(self.app.target_preview_frame)
 
     def update_estimated_duration(self, *args):
         """更新估計的輸出影片長度"""
@@ -208,6 +222,30 @@ class ApplicationPage:
 
         self.estimated_time_label.config(text=f"預估輸出長度: {minutes:02d}:{seconds:02d}")
 
+    def on_cut_settings_changed(self, *args):
+        """拖動滑桿時更新預估長度，並立即重新選擇剪輯點"""
+        self.update_estimated_duration()
+        self.replan_cuts()
+
+    def replan_cuts(self):
+        """以目前的剪輯參數在已掃描的目標素材上重新選擇剪輯點 (不需要重新解碼)"""
+        if not self.app.target_video_path or not self.app.cut_points:
+            return
+        # 套用中 (滑桿已禁用) 由套用流程產生剪輯點
+        if self.density_scale.instate(["disabled"]):
+            return
+
+        # 目標素材、目標物件或掃描設定改變後需要重新套用
+        scan = self.app.video_processor.cached_target_scan(
+            self.app.target_video_path, self.app, self.fast_scan_var.get())
+        if scan is None:
+            return
+
+        self.app.video_processor.plan_target_cuts(self.app, scan, self.density_var.get())
+        self.update_cuts_preview()
+        if self.app.final_cuts_edited:
+            self.app.status_var.set("已更新建議剪輯點，保留手動修改的最終剪輯點")
+
     def toggle_rotation(self):
         """切換影片旋轉角度"""
         if self.rotation_angle == 0:
@@ -220,14 +258,9 @@ class ApplicationPage:
 
         # 重新顯示影片幀
         if self.app.target_cap and self.app.target_cap.isOpened():
-            # 先將影片指針設置到開頭
-            self.app.target_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, frame = self.app.target_cap.read()
-            if ret:
-                display_frame(frame, self.target_canvas, self.rotation_angle)
-
             # 記錄旋轉狀態到app
             self.app.target_rotation = self.rotation_angle
+            self.show_preview_frame(self.app.target_preview_frame)
 
     def disable_buttons(self):
         """禁用頁面按鈕"""
@@ -235,6 +268,7 @@ class ApplicationPage:
         self.apply_btn.config(state=tk.DISABLED)
         self.object_scale.config(state=tk.DISABLED)
         self.density_scale.config(state=tk.DISABLED)
+        self.fast_scan_checkbox.config(state=tk.DISABLED)
         self.rotate_btn.config(state=tk.DISABLED)
 
         # 如果已創建物件選擇工具，禁用其按鈕
@@ -248,6 +282,7 @@ class ApplicationPage:
         self.apply_btn.config(state=tk.NORMAL)
         self.object_scale.config(state=tk.NORMAL)
         self.density_scale.config(state=tk.NORMAL)
+        self.fast_scan_checkbox.config(state=tk.NORMAL)
 
         # 只有在有影片時才啟用旋轉按鈕
         if self.app.target_video_path:
@@ -268,21 +303,34 @@ class ApplicationPage:
 
         if file_path:
             self.app.target_video_path = file_path
+            # 之前手動修改的剪輯點屬於上一部素材
+            self.app.final_cuts_edited = False
             self.target_video_label.config(text=os.path.basename(file_path))
             self.app.status_var.set(f"已選擇目標素材: {os.path.basename(file_path)}")
 
             # 嘗試打開影片並顯示第一幀
-            self.app.target_cap = cv2.VideoCapture(file_path)
+            if self.app.target_cap is not None:
+                self.app.target_cap.release()
+            self.app.target_cap = self.app.open_preview(file_path)
             if self.app.target_cap.isOpened():
-                ret, frame = self.app.target_cap.read()
-                if ret:
-                    display_frame(frame, self.target_canvas, self.rotation_angle)
+                self.app.preview_cache.show(self.target_canvas, file_path, 0, self.rotation_angle,
+                                            self.app.target_cap)
 
                 # 獲取影片總時長
                 fps = self.app.target_cap.get(cv2.CAP_PROP_FPS)
                 frame_count = int(self.app.target_cap.get(cv2.CAP_PROP_FRAME_COUNT))
                 self.app.target_duration = frame_count / fps if fps > 0 else 0
 
+                # 拖動範圍為整部素材
+                self.app.target_preview_frame = 0
+                self.scrub_scale.config(to=max(frame_count - 1, 1))
+                self.scrub_var.set(0)
+                self.update_scrub_label(0)
+
+                # 在背景建立預覽代理檔，完成後預覽、拖動與目標物件選擇改為讀取代理檔
+                self.app.target_proxy = None
+                self.app.request_proxy(file_path, self.on_proxy_ready)
+
                 # 創建目標物件選擇工具
                 if self.object_selection_tool is None:
                     self.object_selection_tool = ObjectSelectionTool(self.frame, self.app, self.target_canvas)
@@ -293,6 +341,44 @@ class ApplicationPage:
                 # 存儲目前的旋轉角度到app
                 self.app.target_rotation = self.rotation_angle
 
+    def on_proxy_ready(self, proxy):
+        """目標素材的預覽代理檔建立完成"""
+        if proxy.source_path != self.app.target_video_path:
+            return
+        if self.app.target_cap is not None:
+            self.app.target_cap.release()
+        self.app.target_cap = proxy.open()
+        self.app.target_proxy = proxy
+        self.app.status_var.set(f"預覽代理檔已就緒: {os.path.basename(proxy.source_path)}")
+
+    def show_preview_frame(self, frame_idx):
+        """在預覽區顯示第 frame_idx 幀 (代理檔與原始影片的幀號相同)
+
+        已預覽過的幀從預覽快取取得，縮放視窗與旋轉都不需要重新解碼。
+        """
+        if not self.app.target_video_path:
+            return
+        self.app.preview_cache.show(self.target_canvas, self.app.target_video_path, frame_idx,
+                                    self.app.target_rotation, self.app.target_cap)
+
+    def on_scrub(self, value):
+        """拖動滑桿時顯示對應的幀，連續的拖動事件只處理最後一個"""
+        self.app.target_preview_frame = int(float(value))
+        self.update_scrub_label(self.app.target_preview_frame)
+        if not self._scrub_pending:
+            self._scrub_pending = True
+            self.frame.after_idle(self._render_scrub)
+
+    def _render_scrub(self):
+        self._scrub_pending = False
+        self.show_preview_frame(self.app.target_preview_frame)
+
+    def update_scrub_label(self, frame_idx):
+        """顯示拖動位置的時間"""
+        fps = self.app.target_cap.get(cv2.CAP_PROP_FPS) if self.app.target_cap is not None else 0
+        seconds = frame_idx / fps if fps > 0 else 0
+        self.scrub_label.config(text=f"{int(seconds // 60):02d}:{seconds % 60:05.2f}")
+
     def apply_cutting_style(self):
         """應用剪輯風格"""
         if not self.app.target_video_path:
@@ -303,6 +389,11 @@ class ApplicationPage:
             messagebox.showerror("錯誤", "請先分析範例影片")
             return
 
+        # 已手動修改剪輯點時詢問是否以新的建議剪輯點取代
+        if self.app.final_cuts_edited and messagebox.askyesno(
+                "剪輯點", "已手動修改剪輯點，是否以重新應用的建議剪輯點取代？\n選擇「否」將保留目前的剪輯點。"):
+            self.app.final_cuts_edited = False
+
         self.app.status_var.set("正在應用剪輯風格...")
         self.app.disable_all_buttons()
 
@@ -330,7 +421,8 @@ class ApplicationPage:
                 self.app.target_video_path,
                 self.app,
                 self.object_priority_var.get(),
-                self.density_var.get()
+                self.density_var.get(),
+                self.fast_scan_var.get()
             )
 
             # 更新UI
@@ -341,7 +433,8 @@ class ApplicationPage:
             self.app.root.after(0, lambda msg=error_msg: messagebox.showerror("錯誤", f"錯誤: {msg}"))
         finally:
             self.app.root.after(0, lambda: self.app.enable_all_buttons())
-            self.app.root.after(0, lambda: self.app.status_var.set("應用完成"))
+            # 經由進度橋接發佈，確保不會被尚未取出的進度事件覆蓋
+            self.app.progress.publish("apply", message="應用完成", force=True)
 
     def update_cuts_preview(self):
         """更新剪輯預覽"""
@@ -370,11 +463,6 @@ class ApplicationPage:
         self.cut_preview_text.insert(tk.END, "\n".join(preview))
         self.cut_preview_text.config(state=tk.DISABLED)
 
-        # 更新剪輯點列表
-        self.app.output_page.cuts_listbox.delete(0, tk.END)
-        for i, cut in enumerate(self.app.final_cuts):
-            mins = int(cut / 60)
-            secs = int(cut % 60)
-            msec = int((cut - int(cut)) * 100)
-            self.app.output_page.cuts_listbox.insert(tk.END, f"剪輯點 {i+1}: {mins:02d}:{secs:02d}.{msec:02d}")
+        # 更新剪輯點列表與縮圖膠卷
+        self.app.output_page.refresh_cuts()
 
@@ -0,0 +1,102 @@
+import json
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+
+
+class DiagnosticsWindow:
+    """效能診斷視窗: 啟用分階段計時並顯示最近一次執行的統計"""
+
+    COLUMNS = (
+        ("count", "次數", 70),
+        ("total_ms", "總計 ms", 100),
+        ("p50_ms", "p50 ms", 80),
+        ("p95_ms", "p95 ms", 80),
+        ("max_ms", "max ms", 80)
+    )
+
+    def __init__(self, app):
+        self.app = app
+        self.profiler = app.video_processor.profiler
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("效能診斷")
+        self.window.geometry("560x360")
+        self.window.transient(app.root)
+
+        self.create_ui()
+        self.refresh()
+
+    def create_ui(self):
+        control_frame = ttk.Frame(self.window)
+        control_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        self.enabled_var = tk.BooleanVar(value=self.profiler.enabled)
+        ttk.Checkbutton(control_frame, text="啟用分階段計時", variable=self.enabled_var,
+                        command=self.toggle).pack(side=tk.LEFT)
+
+        ttk.Button(control_frame, text="匯出 JSON", command=self.export_report).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(control_frame, text="清除", command=self.clear).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(control_frame, text="重新整理", command=self.refresh).pack(side=tk.RIGHT, padx=5)
+
+        # 階段統計表
+        tree_frame = ttk.Frame(self.window)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.tree = ttk.Treeview(tree_frame, columns=[key for key, _, _ in self.COLUMNS])
+        self.tree.heading("#0", text="階段")
+        self.tree.column("#0", width=120)
+        for key, title, width in self.COLUMNS:
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=width, anchor=tk.E)
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.info_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.info_var, anchor=tk.W).pack(fill=tk.X, padx=10, pady=5)
+
+    def toggle(self):
+        """切換計時"""
+        self.profiler.enabled = self.enabled_var.get()
+        if self.profiler.enabled:
+            self.profiler.reset()
+        self.refresh()
+
+    def clear(self):
+        """清除目前的統計"""
+        self.profiler.reset()
+        self.app.video_processor.last_profile_report = {}
+        self.refresh()
+
+    def refresh(self):
+        """重新讀取統計並更新表格"""
+        self.tree.delete(*self.tree.get_children())
+        for name, stats in self.profiler.summary().items():
+            self.tree.insert("", tk.END, text=name, values=[stats[key] for key, _, _ in self.COLUMNS])
+
+        last = self.app.video_processor.last_profile_report
+        if last:
+            self.info_var.set(f"最近一次: {last.get('run', '')}，耗時 {last.get('wall_seconds', 0):.1f} 秒")
+        elif not self.profiler.enabled:
+            self.info_var.set("計時已停用，啟用後執行分析或套用即可收集統計")
+        else:
+            self.info_var.set("尚無統計資料")
+
+    def export_report(self):
+        """匯出報告: 有最近一次執行的報告時匯出該報告，否則匯出目前的統計"""
+        path = filedialog.asksaveasfilename(
+            parent=self.window, title="匯出效能報告", defaultextension=".json",
+            filetypes=[("JSON", "*.json")]
+        )
+        if not path:
+            return
+
+        try:
+            report = self.app.video_processor.last_profile_report or self.profiler.report()
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.app.status_var.set(f"效能報告已匯出: {path}")
+        except Exception as e:
+            messagebox.showerror("錯誤", f"匯出效能報告失敗: {str(e)}", parent=self.window)
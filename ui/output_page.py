@@ -2,12 +2,29 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
 import os
+
+import cv2
+from PIL import Image, ImageTk
 from utils.dialog import simpledialog
+from utils.frame_cache import FrameCache, ThumbnailLoader
+from utils.image_utils import display_frame
+
+# 縮圖膠卷中每張縮圖的尺寸 (寬, 高) 與剪輯點之間的間距
+THUMB_SIZE = (96, 54)
+FILMSTRIP_GAP = 12
+
 
 class OutputPage:
     def __init__(self, parent, app):
         self.app = app
         self.frame = ttk.Frame(parent)
+
+        # 縮圖在背景線程解碼，存入以 (影片, 幀號, 旋轉角度, 尺寸) 為鍵的 LRU 快取
+        self.thumbnail_loader = ThumbnailLoader(FrameCache())
+        self._thumb_images = {}  # 膠卷上顯示中的縮圖 {幀號: PhotoImage}
+        self._thumb_context = None  # 縮圖對應的 (影片路徑, 旋轉角度)
+        self._filmstrip_pending = False
+
         self.setup_ui()
 
     def setup_ui(self):
@@ -55,6 +72,7 @@ class OutputPage:
         cuts_scroll.grid(row=0, column=1, sticky="ns")
 
         self.cuts_listbox.config(yscrollcommand=cuts_scroll.set)
+        self.cuts_listbox.bind("<<ListboxSelect>>", self.on_cut_selected)
 
         # 剪輯點操作按鈕
         cuts_btn_frame = ttk.Frame(cuts_frame)
@@ -74,6 +92,20 @@ class OutputPage:
         )
         self.detail_btn.grid(row=0, column=2, padx=5, pady=5, sticky="w")
 
+        # 剪輯點縮圖膠卷 (每個剪輯點顯示剪輯前、後各一幀)
+        filmstrip_frame = ttk.Frame(cuts_frame)
+        filmstrip_frame.grid(row=2, column=0, sticky="ew", padx=5, pady=5)
+        filmstrip_frame.columnconfigure(0, weight=1)
+
+        self.filmstrip_canvas = tk.Canvas(filmstrip_frame, bg="black", height=THUMB_SIZE[1] + 24)
+        self.filmstrip_canvas.grid(row=0, column=0, sticky="ew")
+
+        filmstrip_scroll = ttk.Scrollbar(filmstrip_frame, orient=tk.HORIZONTAL, command=self.filmstrip_canvas.xview)
+        filmstrip_scroll.grid(row=1, column=0, sticky="ew")
+
+        self.filmstrip_canvas.config(xscrollcommand=filmstrip_scroll.set)
+        self.filmstrip_canvas.bind("<Button-1>", self.on_filmstrip_click)
+
         # 剪輯點詳情顯示區
         self.cut_details_frame = ttk.LabelFrame(self.content_frame, text="剪輯點詳情")
         self.cut_details_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=5)
@@ -86,6 +118,10 @@ class OutputPage:
         self.cut_details_text.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
         self.cut_details_text.config(state=tk.DISABLED)
 
+        # 剪輯點畫面 (讀取目標素材的預覽代理檔)
+        self.cut_canvas = tk.Canvas(self.cut_details_frame, bg="black", width=240, height=135)
+        self.cut_canvas.grid(row=0, column=1, padx=5, pady=5)
+
         # 導出按鈕
         export_frame = ttk.LabelFrame(self.content_frame, text="輸出設置")
         export_frame.grid(row=3, column=0, sticky="ew", padx=10, pady=5)
@@ -119,6 +155,10 @@ class OutputPage:
         text_height = max(4, min(8, int(frame_height / 100)))
         self.cut_details_text.config(height=text_height)
 
+        # 目標素材或旋轉角度改變後重新產生縮圖
+        if self._thumb_context != (self.app.target_video_path, self.app.target_rotation):
+            self.update_filmstrip()
+
         # 刷新框架，確保變更生效
         self.frame.update_idletasks()
     def disable_buttons(self):
@@ -155,8 +195,10 @@ class OutputPage:
         selected = self.cuts_listbox.curselection()
         if selected:
             index = selected[0]
-            self.cuts_listbox.delete(index)
             self.app.final_cuts.pop(index)
+            self.app.final_cuts_edited = True
+            # 重新編號列表並更新縮圖膠卷 (其餘剪輯點的縮圖沿用)
+            self.refresh_cuts()
 
             # 更新介面
             self.app.status_var.set(f"已移除剪輯點 {index+1}")
@@ -184,20 +226,153 @@ class OutputPage:
             # 添加到列表並排序
             self.app.final_cuts.append(time_point)
             self.app.final_cuts.sort()
+            self.app.final_cuts_edited = True
 
-            # 更新列表框
-            self.cuts_listbox.delete(0, tk.END)
-            for i, cut in enumerate(self.app.final_cuts):
-                mins = int(cut / 60)
-                secs = int(cut % 60)
-                msec = int((cut - int(cut)) * 100)
-                self.cuts_listbox.insert(tk.END, f"剪輯點 {i+1}: {mins:02d}:{secs:02d}.{msec:02d}")
+            # 更新列表框與縮圖膠卷
+            self.refresh_cuts()
 
+            mins = int(time_point / 60)
+            secs = int(time_point % 60)
             self.app.status_var.set(f"已添加剪輯點: {mins:02d}:{secs:02d}")
 
         except ValueError:
             messagebox.showerror("錯誤", "無效的時間格式。請使用 分:秒 或 秒數")
 
+    def on_cut_selected(self, event=None):
+        """選擇剪輯點時顯示該位置的畫面"""
+        selected = self.cuts_listbox.curselection()
+        if selected and selected[0] < len(self.app.final_cuts):
+            self.show_cut_frame(self.app.final_cuts[selected[0]])
+            self.select_filmstrip_cut(selected[0])
+
+    def target_fps(self):
+        """目標素材的幀率，尚未打開時返回 0"""
+        cap = self.app.target_cap
+        if cap is None or not cap.isOpened():
+            return 0
+        return cap.get(cv2.CAP_PROP_FPS)
+
+    def show_cut_frame(self, cut_time):
+        """顯示剪輯點所在的幀 (與導出時相同，取 int(秒數 * 幀率))"""
+        fps = self.target_fps()
+        if fps <= 0:
+            return
+        cap = self.app.target_cap
+        frame_idx = int(cut_time * fps)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = cap.read()
+        if ret:
+            display_frame(frame, self.cut_canvas, self.app.target_rotation)
+
+    def refresh_cuts(self):
+        """依 app.final_cuts 重新填入剪輯點列表並更新縮圖膠卷"""
+        self.cuts_listbox.delete(0, tk.END)
+        for i, cut in enumerate(self.app.final_cuts):
+            mins = int(cut / 60)
+            secs = int(cut % 60)
+            msec = int((cut - int(cut)) * 100)
+            self.cuts_listbox.insert(tk.END, f"剪輯點 {i+1}: {mins:02d}:{secs:02d}.{msec:02d}")
+        self.update_filmstrip()
+
+    def update_filmstrip(self):
+        """剪輯點改變後更新縮圖膠卷，連續的更新只處理最後一次"""
+        if not self._filmstrip_pending:
+            self._filmstrip_pending = True
+            self.frame.after_idle(self._render_filmstrip)
+
+    def _render_filmstrip(self):
+        """重新排列膠卷，沿用已產生的縮圖，只請求新出現的幀"""
+        self._filmstrip_pending = False
+        canvas = self.filmstrip_canvas
+        canvas.delete("all")
+
+        video_path = self.app.target_video_path
+        rotation = self.app.target_rotation
+        fps = self.target_fps()
+        context = (video_path, rotation)
+        if context != self._thumb_context:
+            self._thumb_images = {}
+            self._thumb_context = context
+        if not video_path or fps <= 0 or not self.app.final_cuts:
+            self.thumbnail_loader.cancel()
+            self._thumb_images = {}
+            canvas.config(scrollregion=(0, 0, 0, 0))
+            return
+
+        width, height = THUMB_SIZE
+        slot_width = 2 * width + 2 + FILMSTRIP_GAP
+        frames = set()
+        for i, cut in enumerate(self.app.final_cuts):
+            x = i * slot_width + FILMSTRIP_GAP // 2
+            cut_frame = int(cut * fps)
+            # 剪輯前的最後一幀與剪輯後的第一幀
+            for j, frame_idx in enumerate((max(0, cut_frame - 1), cut_frame)):
+                frames.add(frame_idx)
+                left = x + j * (width + 2)
+                canvas.create_rectangle(left, 2, left + width, 2 + height, outline="gray30")
+                canvas.create_image(left + width // 2, 2 + height // 2, tags=(f"frame_{frame_idx}",))
+            mins = int(cut / 60)
+            secs = int(cut % 60)
+            msec = int((cut - int(cut)) * 100)
+            canvas.create_text(x + width + 1, height + 13, text=f"{i+1}. {mins:02d}:{secs:02d}.{msec:02d}",
+                               fill="white", font=("Arial", 8))
+        canvas.config(scrollregion=(0, 0, len(self.app.final_cuts) * slot_width, height + 24))
+
+        # 只保留仍在膠卷上的縮圖，其餘幀從快取取得或交給背景線程解碼
+        self._thumb_images = {idx: image for idx, image in self._thumb_images.items() if idx in frames}
+        for frame_idx, image in self._thumb_images.items():
+            canvas.itemconfig(f"frame_{frame_idx}", image=image)
+
+        # 代理檔與原始影片的幀號相同，有代理檔時從代理檔解碼
+        proxy = self.app.target_proxy
+        decode_path = proxy.path if proxy is not None and proxy.source_path == video_path else video_path
+        cached = self.thumbnail_loader.request(
+            video_path, [idx for idx in frames if idx not in self._thumb_images], rotation, THUMB_SIZE,
+            lambda frame_idx, image: self.app.root.after(0, lambda: self._show_thumbnail(context, frame_idx, image)),
+            decode_path
+        )
+        for frame_idx, image in cached.items():
+            self._show_thumbnail(context, frame_idx, image)
+
+        selected = self.cuts_listbox.curselection()
+        if selected:
+            self.select_filmstrip_cut(selected[0], scroll=False)
+
+    def _show_thumbnail(self, context, frame_idx, image):
+        """在膠卷上顯示一張縮圖 (主線程)"""
+        if context != self._thumb_context:
+            return
+        tk_img = ImageTk.PhotoImage(image=Image.fromarray(image))
+        self._thumb_images[frame_idx] = tk_img
+        self.filmstrip_canvas.itemconfig(f"frame_{frame_idx}", image=tk_img)
+
+    def select_filmstrip_cut(self, index, scroll=True):
+        """在膠卷上標示第 index 個剪輯點，需要時捲動到該位置"""
+        canvas = self.filmstrip_canvas
+        canvas.delete("selection")
+        if index >= len(self.app.final_cuts):
+            return
+        width, height = THUMB_SIZE
+        slot_width = 2 * width + 2 + FILMSTRIP_GAP
+        x = index * slot_width + FILMSTRIP_GAP // 2
+        canvas.create_rectangle(x - 3, 0, x + 2 * width + 5, height + 4, outline="yellow", width=2,
+                                tags=("selection",))
+        if scroll:
+            total = len(self.app.final_cuts) * slot_width
+            visible = max(1, canvas.winfo_width())
+            canvas.xview_moveto(max(0, x + width - visible / 2) / total)
+
+    def on_filmstrip_click(self, event):
+        """點擊膠卷上的剪輯點時選取該剪輯點"""
+        slot_width = 2 * THUMB_SIZE[0] + 2 + FILMSTRIP_GAP
+        index = int(self.filmstrip_canvas.canvasx(event.x) // slot_width)
+        if 0 <= index < len(self.app.final_cuts):
+            self.cuts_listbox.selection_clear(0, tk.END)
+            self.cuts_listbox.selection_set(index)
+            self.cuts_listbox.see(index)
+            self.show_cut_frame(self.app.final_cuts[index])
+            self.select_filmstrip_cut(index, scroll=False)
+
     def show_cut_details(self):
         """顯示剪輯點詳情"""
         # 獲取選中的剪輯點
@@ -208,18 +383,14 @@ class OutputPage:
 
         index = selected[0]
         cut_time = self.app.final_cuts[index]
+        self.show_cut_frame(cut_time)
 
         # 尋找該時間點附近的物件
         nearby_objects = {}
 
         # 搜索目標影片中該時間點前後1秒的物件
-        for obj, (_, _, timestamps) in self.app.target_objects.items():
-            for ts in timestamps:
-                if abs(ts - cut_time) <= 1.0:  # 1秒內
-                    if obj not in nearby_objects:
-                        nearby_objects[obj] = 1
-                    else:
-                        nearby_objects[obj] += 1
+        if self.app.target_objects:
+            nearby_objects = self.app.target_objects.counts_in_range(cut_time - 1.0, cut_time + 1.0)
 
         # 更新詳情顯示
         self.cut_details_text.config(state=tk.NORMAL)
@@ -1,9 +1,13 @@
+import threading
 import tkinter as tk
 from tkinter import ttk
 import cv2
 import numpy as np
 from PIL import Image, ImageTk
 
+from core.detection import MIN_CONFIDENCE, box_arrays
+from core.proxy import map_rect, read_source_frame
+
 class ObjectSelectionTool:
     """用於在影片幀上選擇特定目標物件的工具"""
 
@@ -17,6 +21,9 @@ class ObjectSelectionTool:
         self.current_rectangle = None
         self.selected_roi = None
         self.original_frame = None
+        self.frame_index = 0
+        # 每次選擇遞增，背景讀取的原始幀只套用到最近一次選擇
+        self._selection_generation = 0
 
         # 創建控制界面
         self.create_controls()
@@ -58,8 +65,9 @@ class ObjectSelectionTool:
     def start_selection(self):
         """開始選擇目標物件"""
         if self.app.target_cap and self.app.target_cap.isOpened():
-            # 重置影片到第一幀
-            self.app.target_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            # 在預覽目前顯示的幀上選擇 (預覽可能讀取代理檔，幀號與原始影片相同)
+            self.frame_index = self.app.target_preview_frame
+            self.app.target_cap.set(cv2.CAP_PROP_POS_FRAMES, self.frame_index)
             ret, frame = self.app.target_cap.read()
 
             if ret:
@@ -139,20 +147,51 @@ class ObjectSelectionTool:
 
         # 存儲選擇的ROI
         self.selected_roi = (x1_frame, y1_frame, x2_frame - x1_frame, y2_frame - y1_frame)
+
+        # 結束選擇模式
+        self.selection_active = False
+        self._selection_generation += 1
+
+        # 預覽幀來自縮小的代理檔時，在背景讀取原始解析度的同一幀，換算座標後再提取特徵
+        proxy = self.app.target_proxy
+        if proxy is not None and tuple(proxy.size) != tuple(proxy.source_size):
+            self.status_label.config(text="正在讀取原始解析度的畫面...")
+            threading.Thread(
+                target=self._load_source_frame,
+                args=(self._selection_generation, proxy.source_path, self.frame_index),
+                daemon=True
+            ).start()
+        else:
+            self.finish_selection()
+
+    def _load_source_frame(self, generation, path, frame_idx):
+        """在背景線程讀取原始影片的幀，完成後在主線程完成選擇"""
+        source_frame = read_source_frame(path, frame_idx)
+        self.app.root.after(0, lambda: self.finish_selection(source_frame, generation))
+
+    def finish_selection(self, source_frame=None, generation=None):
+        """以選擇區域提取目標物件特徵 (source_frame 為原始解析度的同一幀時先換算座標)"""
+        # 讀取期間已重新選擇或清除選擇
+        if generation is not None and (generation != self._selection_generation or self.selected_roi is None):
+            return
+
+        frame_height, frame_width = self.original_frame.shape[:2]
+        if source_frame is not None and source_frame.shape[:2] != (frame_height, frame_width):
+            self.selected_roi = map_rect(self.selected_roi, (frame_width, frame_height),
+                                         (source_frame.shape[1], source_frame.shape[0]))
+            self.original_frame = source_frame
         self.app.target_object_roi = self.selected_roi
 
         # 從ROI區域提取目標物件特徵
         self.extract_target_features()
 
         # 更新標籤
-        self.status_label.config(text=f"目標物件已選擇 [{x1_frame},{y1_frame},{x2_frame},{y2_frame}]")
+        x, y, w, h = self.selected_roi
+        self.status_label.config(text=f"目標物件已選擇 [{x},{y},{x + w},{y + h}]")
 
         # 啟用清除按鈕
         self.clear_btn.config(state=tk.NORMAL)
 
-        # 結束選擇模式
-        self.selection_active = False
-
     def extract_target_features(self):
         """從選擇區域提取目標物件特徵"""
         if self.original_frame is None or self.selected_roi is None:
@@ -161,35 +200,29 @@ class ObjectSelectionTool:
         x, y, w, h = self.selected_roi
         roi = self.original_frame[y:y+h, x:x+w]
 
-        # 使用物件檢測模型檢測目標物件
-        results = self.app.object_model(roi)
+        # 使用物件檢測模型檢測目標物件 (只保留高置信度的檢測結果)
+        results = self.app.object_model(roi, conf=MIN_CONFIDENCE)
 
         # 找出檢測框最大的物件作為目標
         best_target = None
         max_area = 0
 
         for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                # 獲取類別、置信度和座標
-                cls_id = int(box.cls[0])
-                cls_name = self.app.object_model.names[cls_id]
-                conf = float(box.conf[0])
-
-                # 只考慮高置信度的檢測結果
-                if conf > 0.5:
-                    # 獲取框的座標
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    area = (x2 - x1) * (y2 - y1)
-
-                    if area > max_area:
-                        max_area = area
-                        best_target = {
-                            'class': cls_name,
-                            'confidence': conf,
-                            'bbox': (x1, y1, x2, y2),
-                            'color_hist': self.calculate_color_histogram(roi)
-                        }
+            cls, conf, xyxy, _ = box_arrays(r)
+            if len(cls) == 0:
+                continue
+            areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+            i = int(np.argmax(areas))
+
+            if areas[i] > max_area:
+                max_area = areas[i]
+                x1, y1, x2, y2 = xyxy[i]
+                best_target = {
+                    'class': self.app.object_model.names[int(cls[i])],
+                    'confidence': float(conf[i]),
+                    'bbox': (x1, y1, x2, y2),
+                    'color_hist': self.calculate_color_histogram(roi)
+                }
 
         # 如果找到目標，存儲其特徵
         if best_target:
@@ -231,6 +264,7 @@ class ObjectSelectionTool:
             self.current_rectangle = None
 
         self.selected_roi = None
+        self._selection_generation += 1
         self.app.target_object_roi = None
         self.app.target_object_features = None
 
@@ -0,0 +1,231 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from utils.image_utils import canvas_size, fit_frame, show_image, thumbnail_image
+
+
+# 預覽快取中幀的長邊上限 (預覽區最大為 640x360，保留足夠的解析度填滿預覽區)
+DEFAULT_PREVIEW_SIZE = 960
+
+
+class FrameCache:
+    """以佔用位元組數限制大小的 LRU 影像快取 (線程安全)
+
+    鍵由呼叫端決定，例如 (影片路徑, 幀號, 旋轉角度, 縮圖尺寸)；
+    超過 max_bytes 時移除最久未使用的影像。
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 統計資訊
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def get(self, key):
+        """取得影像並標記為最近使用，不存在時返回 None"""
+        with self._lock:
+            image = self._items.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        """加入影像，必要時移除最久未使用的影像"""
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            self._items[key] = image
+            self.bytes += image.nbytes
+            while self.bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+
+class ThumbnailLoader:
+    """在背景線程解碼影片幀並產生縮圖，結果存入 FrameCache
+
+    request() 先從快取取得已有的縮圖，其餘幀號交給背景線程依幀號順序解碼
+    (相近的幀以 grab() 往前跳過，不需要每幀重新定位)；新的請求會取代尚未處理完的請求。
+    背景線程自己打開影片，不與介面共用 VideoCapture。
+    """
+
+    # 向前跳過不超過此幀數時以 grab() 讀取，否則重新定位
+    MAX_GRAB = 8
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else FrameCache()
+
+        self._condition = threading.Condition()
+        self._job = None
+        self._generation = 0
+        self._thread = None
+
+    def request(self, video_path, frame_indices, rotation, size, callback, decode_path=None):
+        """請求一組幀的縮圖，返回快取中已有的 {幀號: 縮圖}
+
+        其餘縮圖解碼完成後在背景線程呼叫 callback(幀號, 縮圖)。縮圖為 RGB 陣列，
+        快取鍵為 (video_path, 幀號, rotation, size)；decode_path 為實際讀取的影片
+        (例如幀號相同的預覽代理檔)，預設為 video_path。
+        """
+        cached = {}
+        missing = []
+        for frame_idx in sorted(set(frame_indices)):
+            image = self.cache.get((video_path, frame_idx, rotation, size))
+            if image is not None:
+                cached[frame_idx] = image
+            else:
+                missing.append(frame_idx)
+
+        with self._condition:
+            self._generation += 1
+            self._job = (self._generation, video_path, decode_path or video_path, missing, rotation, size, callback) \
+                if missing else None
+            if self._job is not None and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._worker, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return cached
+
+    def cancel(self):
+        """取消尚未處理完的請求"""
+        with self._condition:
+            self._generation += 1
+            self._job = None
+
+    def _worker(self):
+        cap = None
+        opened_path = None
+        try:
+            while True:
+                with self._condition:
+                    if self._job is None:
+                        self._condition.wait(timeout=5.0)
+                        if self._job is None:
+                            # 一段時間沒有請求時結束線程並釋放影片
+                            self._thread = None
+                            return
+                    job = self._job
+                    self._job = None
+                generation, video_path, decode_path, frame_indices, rotation, size, callback = job
+
+                if decode_path != opened_path:
+                    if cap is not None:
+                        cap.release()
+                    cap = cv2.VideoCapture(decode_path)
+                    opened_path = decode_path
+                if not cap.isOpened():
+                    print(f"無法打開影片: {decode_path}")
+                    continue
+
+                position = None
+                for frame_idx in frame_indices:
+                    # 已有新的請求時放棄剩下的幀
+                    if generation != self._generation:
+                        break
+                    key = (video_path, frame_idx, rotation, size)
+                    image = self.cache.get(key)
+                    if image is None:
+                        if position is None or not 0 <= frame_idx - position <= self.MAX_GRAB:
+                            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+                        else:
+                            for _ in range(frame_idx - position):
+                                cap.grab()
+                        ret, frame = cap.read()
+                        position = frame_idx + 1
+                        if not ret:
+                            position = None
+                            continue
+                        image = thumbnail_image(frame, size, rotation)
+                        self.cache.put(key, image)
+                    callback(frame_idx, image)
+        finally:
+            if cap is not None:
+                cap.release()
+
+
+class PreviewCache:
+    """預覽區的畫面快取
+
+    保存每部影片已預覽過的幀 (縮小到長邊不超過 max_size 的 RGB 影像，未旋轉)，
+    鍵為 (影片路徑, 幀號)。視窗縮放或切換分頁時只以快取的影像重新產生顯示尺寸的
+    PhotoImage，不需要重新定位和解碼；Canvas 尺寸和旋轉角度都沒有改變時直接沿用
+    目前顯示的影像。每部影片目前顯示的幀另外保存在 LRU 之外，拖動其他影片時不會被移除。
+    """
+
+    # 向前跳過不超過此幀數時以 grab() 讀取，否則重新定位
+    MAX_GRAB = 8
+
+    def __init__(self, max_size=DEFAULT_PREVIEW_SIZE, max_bytes=48 * 1024 * 1024):
+        self.max_size = max_size
+        self.frames = FrameCache(max_bytes)
+        self.current = {}   # 每部影片目前顯示的幀 {影片路徑: (幀號, 影像)}
+
+    def put(self, video_path, frame_idx, frame):
+        """保存一幀 (BGR)，返回快取的 RGB 影像"""
+        height, width = frame.shape[:2]
+        scale = self.max_size / max(width, height)
+        if scale < 1:
+            frame = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self.frames.put((video_path, frame_idx), image)
+        return image
+
+    def get(self, video_path, frame_idx):
+        current = self.current.get(video_path)
+        if current is not None and current[0] == frame_idx:
+            return current[1]
+        return self.frames.get((video_path, frame_idx))
+
+    def show(self, canvas, video_path, frame_idx, rotation=0, cap=None):
+        """在 canvas 顯示影片的第 frame_idx 幀，返回是否成功顯示
+
+        快取中沒有該幀時，若提供 cap 則從 cap 讀取並保存 (cap 的下一幀就是該幀時不重新定位，
+        稍微落後時以 grab() 往前跳過，連續往後拖動時可以依序解碼)。
+        """
+        image = self.get(video_path, frame_idx)
+        if image is None:
+            if cap is None or not cap.isOpened():
+                return False
+            # read() 之後的位置是下一幀 (frame_idx + 1)
+            skip = frame_idx - int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            if 0 <= skip <= self.MAX_GRAB:
+                for _ in range(skip):
+                    cap.grab()
+            else:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if not ret:
+                return False
+            image = self.put(video_path, frame_idx, frame)
+        self.current[video_path] = (frame_idx, image)
+
+        width, height = canvas_size(canvas)
+        key = (video_path, frame_idx, rotation, width, height)
+        if getattr(canvas, "preview_key", None) == key:
+            return True
+        show_image(canvas, fit_frame(image, width, height, rotation))
+        canvas.preview_key = key
+        return True